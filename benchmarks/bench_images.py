@@ -0,0 +1,86 @@
+"""
+benchmark of the decoding of card scans, as done by the gui.
+
+usage: python benchmarks/bench_images.py [folder of img files]
+
+without folder, jpeg scans of 4000x6000 are generated in a temporary folder
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+from PIL import Image
+
+
+from pycards.images import load_image
+
+
+NSCANS = 8
+SCAN_SIZE = (4000, 6000)
+# sizes of a table slot, the top card and the inspector on a 1920x1080 screen
+MAXSIZES = ((298, 648), (178, 216), (357, 432))
+
+
+def make_scans(folder: Path) -> list[Path]:
+    """write jpeg scans with some content, so that they are not trivial to
+    decode"""
+    paths = list()
+    for i in range(NSCANS):
+        img = Image.radial_gradient('L').resize(SCAN_SIZE)
+        img = Image.merge('RGB', (img, img.rotate(90 * i), img))
+        path = folder / f'scan_{i}.jpg'
+        img.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def load_image_full_decode(path, maxsize, rotated):
+    """full decode, then resampling"""
+    img = Image.open(path)
+    img.load()
+    img.thumbnail(maxsize)
+    if rotated:
+        img = img.rotate(180)
+    return img
+
+
+def load_image_thumbnail(path, maxsize, rotated):
+    """previous way of loading in the gui"""
+    img = Image.open(path)
+    img.thumbnail(maxsize)
+    if rotated:
+        img = img.rotate(180)
+    return img
+
+
+def bench(loader, paths: list[Path]) -> float:
+    """mean time to load a card image, in ms"""
+    start = time.perf_counter()
+    count = 0
+    for path in paths:
+        for maxsize in MAXSIZES:
+            loader(path, maxsize, True)
+            count += 1
+    return (time.perf_counter() - start) / count * 1000
+
+
+def main(paths: list[Path]):
+    print(f'{len(paths)} img files, {len(MAXSIZES)} sizes, rotated')
+    for name, loader in (
+            ('full decode + rotate', load_image_full_decode),
+            ('thumbnail + rotate', load_image_thumbnail),
+            ('draft + transpose', load_image),
+            ):
+        print(f'{name:>22}: {bench(loader, paths):8.1f} ms per image')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        folder = Path(sys.argv[1])
+        main(sorted(fp for fp in folder.iterdir() if fp.is_file()))
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            main(make_scans(Path(folder)))
@@ -0,0 +1,97 @@
+"""
+benchmark of the start of pycards, checked against time budgets:
+
+* import of pycards.game, measured with python -X importtime
+* time to first window: a new python process that creates the app and
+  draws its window once. skipped without a display
+
+usage: python benchmarks/bench_startup.py
+
+exits with status 1 if a budget is exceeded. the data of pycards are kept in
+a temporary folder.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+NRUNS = 5
+IMPORT_BUDGET_MS = 150
+WINDOW_BUDGET_MS = 1500
+# must not be loaded by import pycards.game
+HEAVY_MODULES = ('tkinter', 'PIL', 'filetype')
+
+FIRST_WINDOW_SCRIPT = """
+from pycards.apps import PycarApp
+app = PycarApp()
+app._gui.update()
+app._gui.destroy()
+"""
+HEAVY_MODULES_SCRIPT = f"""
+import sys
+import pycards.game
+print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+"""
+
+
+def run_python(env: dict, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+            [sys.executable, *args],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+            )
+
+
+def get_import_time(env: dict, module: str) -> float:
+    """cumulative import time of a module in a new process, in ms"""
+    result = run_python(env, '-X', 'importtime', '-c', f'import {module}')
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f'{module} not found in the output of importtime')
+
+
+def get_first_window_time(env: dict) -> float:
+    """time from the start of python to the first window drawn, in ms"""
+    start = time.perf_counter()
+    run_python(env, '-c', FIRST_WINDOW_SCRIPT)
+    return (time.perf_counter() - start) * 1000
+
+
+def main(env: dict) -> bool:
+    """
+    :returns: True if the budgets are respected
+
+    """
+    ok = True
+    heavy = run_python(env, '-c', HEAVY_MODULES_SCRIPT).stdout.split()
+    if heavy:
+        print(f'import pycards.game loads {", ".join(heavy)}')
+        ok = False
+    import_time = min(
+            get_import_time(env, 'pycards.game') for _ in range(NRUNS))
+    print(
+            f'import pycards.game: {import_time:8.1f} ms'
+            f' (budget {IMPORT_BUDGET_MS} ms)')
+    ok &= import_time <= IMPORT_BUDGET_MS
+    if 'DISPLAY' in env or sys.platform != 'linux':
+        window_time = min(get_first_window_time(env) for _ in range(NRUNS))
+        print(
+                f'first window: {window_time:8.1f} ms'
+                f' (budget {WINDOW_BUDGET_MS} ms)')
+        ok &= window_time <= WINDOW_BUDGET_MS
+    else:
+        print('first window: skipped, no display')
+    return ok
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as folder:
+        env = dict(os.environ, XDG_DATA_HOME=folder)
+        sys.exit(0 if main(env) else 1)
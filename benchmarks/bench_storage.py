@@ -0,0 +1,121 @@
+"""
+benchmark of the storages of the game state, for each durability policy:
+
+* latency of a card moved to another pile, saved as the game does it
+* latency of Game.play_first_card, the draw of the card on top of the draw
+  pile, with all the cards of the deck in the draw pile
+
+usage: python benchmarks/bench_storage.py
+
+the games are saved in a temporary folder, also the varbox files.
+"""
+
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+
+NCARDS = (100, 1000, 10000)
+NOPERATIONS = 200
+PILES = ('draw', 'in_play', 'discard', 'permanent')
+
+
+def make_state(ncards: int, piles: tuple[str] = PILES) -> dict:
+    """a game with half of the cards in the box, half in the deck
+
+    :piles: where the cards of the deck are, chosen at random
+
+    """
+    from pycards.storage import get_default_state
+    from pycards.game import LAYOUT_VERSION
+    state = get_default_state()
+    state['layout_version'] = LAYOUT_VERSION
+    state['draw_cards_next_id'] = 0
+    for i in range(ncards):
+        card = dict(
+                recto_path=f'/data/pycards/game/cards/card_{i}_recto.png',
+                verso_path=f'/data/pycards/game/cards/card_{i}_verso.png',
+                orientation=0,
+                )
+        if i % 2:
+            card['pile'] = random.choice(piles)
+            if card['pile'] == 'draw':
+                card['draw_position'] = i
+                card['draw_name'] = str(state['draw_cards_next_id'])
+                state['draw_cards_next_id'] += 1
+            state['deck'][f'card_{i}'] = card
+        else:
+            state['box'][f'card_{i}'] = card
+    return state
+
+
+def save_all(storage, state: dict):
+    from pycards.storage import STATE_KEYS
+    card_names = list(state['deck']) + list(state['box'])
+    storage.save(state, card_names, STATE_KEYS)
+
+
+def bench_move(storage, state: dict) -> float:
+    """mean time of a card move, in ms"""
+    card_names = list(state['deck'])
+    save_all(storage, state)
+    start = time.perf_counter()
+    for _ in range(NOPERATIONS):
+        card_name = random.choice(card_names)
+        state['deck'][card_name]['pile'] = random.choice(PILES)
+        storage.save(state, [card_name], [])
+    return (time.perf_counter() - start) / NOPERATIONS * 1000
+
+
+def bench_draw(game) -> float:
+    """mean time of a draw, in ms. the card drawn is put back at the bottom
+    of the draw pile, out of the measure"""
+    elapsed = 0
+    for _ in range(NOPERATIONS):
+        start = time.perf_counter()
+        card_name = game.play_first_card()
+        elapsed += time.perf_counter() - start
+        game.put_card_in_draw_pile(card_name, top=False)
+    return elapsed / NOPERATIONS * 1000
+
+
+def main(folder: Path):
+    # imported once XDG_DATA_HOME is set: the data folder of pycards is
+    # found when pycards.config is imported
+    from pycards.config import DATA_FOLDER
+    from pycards.game import Game
+    from pycards.storage import SqliteStorage, VarBoxStorage, JournalStorage
+    from pycards.storage import DURABILITIES
+    print(f'mean latency over {NOPERATIONS} operations')
+    for ncards in NCARDS:
+        for storage_class in (VarBoxStorage, SqliteStorage, JournalStorage):
+            for durability in DURABILITIES:
+                name = f'bench_{ncards}'
+                class_name = storage_class.__name__
+                game_folder = folder / f'{class_name}_{ncards}_{durability}'
+                game_folder.mkdir()
+                storage = storage_class(name, game_folder, durability)
+                move_latency = bench_move(storage, make_state(ncards))
+                storage.delete()
+
+                game_folder = DATA_FOLDER / name
+                game_folder.mkdir(parents=True)
+                storage = storage_class(name, game_folder, durability)
+                save_all(storage, make_state(ncards, piles=('draw',)))
+                storage.close()
+                game = Game(name, storage_class, durability)
+                draw_latency = bench_draw(game)
+                game.delete_game()
+                print(
+                        f'{ncards:>6} cards, {class_name:>14},'
+                        f' {durability:>8}: move {move_latency:8.2f} ms,'
+                        f' draw {draw_latency:8.2f} ms')
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as folder:
+        # the games and the varbox files are written in the xdg data folder
+        os.environ['XDG_DATA_HOME'] = folder
+        main(Path(folder))
@@ -12,6 +12,7 @@ class PycarApp(object):
         self._gui:  GUI | TkinterGUI = TkinterGUI()
         table: BaseTable = Table(self._gui)
         self._gui.table = table
+        self._table = table
         self._gui.place_card_on_table
 
     def start(self):
@@ -19,3 +20,4 @@ class PycarApp(object):
 
         """
         self._gui.run()
+        self._table.close()
@@ -0,0 +1,179 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+
+ASSETS_FOLDER = 'assets'
+
+
+class AssetStore(object):
+
+    """store of img files shared by all games. each file is saved once,
+    named by the hash of its content, and games get hard links to it. the
+    number of links of a stored file is its reference count. the thumbnails
+    of a stored file are kept next to it, and are linked the same way"""
+
+    _CHUNK_SIZE = 1 << 20
+
+    def __init__(self, folder: Path):
+        """
+
+        :folder: where the stored files are kept
+
+        """
+        self._folder = Path(folder)
+        self._folder.mkdir(parents=True, exist_ok=True)
+        # one per stored file, so that its thumbnails are made only once
+        # when it is imported by several threads
+        self._thumbnail_locks: dict[str, threading.Lock] = dict()
+
+    def _get_path(self, asset_id: str) -> Path:
+        """path of a stored file. files are spread in subfolders named by the
+        first characters of the hash
+
+        :asset_id: hash and suffix of the file
+
+        """
+        return self._folder / asset_id[:2] / asset_id
+
+    def add(self, src: Path) -> str:
+        """store a file if its content is not already present
+
+        :src: file to store
+        :returns: id of the stored file
+
+        """
+        src = Path(src)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(
+                dir=self._folder, delete=False) as tmp_file:
+            with open(src, 'rb') as src_file:
+                while chunk := src_file.read(self._CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+        tmp_path = Path(tmp_file.name)
+        asset_id = digest.hexdigest() + src.suffix.lower()
+        path = self._get_path(asset_id)
+        path.parent.mkdir(exist_ok=True)
+        try:
+            # fails if the same content was already stored, also by another
+            # thread, so that there is never two copies of it
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            tmp_path.unlink()
+        return asset_id
+
+    def link(self, asset_id: str, dst: Path):
+        """make a stored file available at dst. it is a hard link when
+        possible, else a copy
+
+        :asset_id: id of the stored file
+        :dst: path of the new file, must not exist
+
+        """
+        self._link(self._get_path(asset_id), dst)
+
+    def _link(self, path: Path, dst: Path):
+        try:
+            os.link(path, dst)
+        except FileExistsError:
+            raise
+        except OSError:
+            shutil.copy(path, dst)
+
+    def link_thumbnails(self, asset_id: str, dst: Path) -> list[Path]:
+        """make the thumbnails of a stored img file, unless it already has
+        them, and make them available as the thumbnails of dst
+
+        :asset_id: id of the stored file
+        :dst: img file of a game, linked to the stored file
+        :returns: paths of the thumbnails of dst
+
+        """
+        from pycards.images import THUMBNAIL_SIZES, get_thumbnail_path
+        from pycards.images import has_thumbnails, make_thumbnails
+        path = self._get_path(asset_id)
+        lock = self._thumbnail_locks.setdefault(asset_id, threading.Lock())
+        with lock:
+            if not has_thumbnails(path):
+                make_thumbnails(path)
+        thumbnail_paths = list()
+        for size in THUMBNAIL_SIZES:
+            src = get_thumbnail_path(path, size)
+            if src.exists():
+                thumbnail_path = get_thumbnail_path(dst, size)
+                thumbnail_path.parent.mkdir(exist_ok=True)
+                thumbnail_path.unlink(missing_ok=True)
+                self._link(src, thumbnail_path)
+                thumbnail_paths.append(thumbnail_path)
+        return thumbnail_paths
+
+    def import_file(self, src: Path, dst: Path) -> str:
+        """store a file and make it available at dst
+
+        :src: file to import
+        :dst: path of the new file, must not exist
+        :returns: id of the stored file
+
+        """
+        asset_id = self.add(src)
+        self.link(asset_id, dst)
+        return asset_id
+
+    def release(self, asset_id: str):
+        """remove a stored file if no game refers to it anymore
+
+        :asset_id: id of the stored file
+
+        """
+        from pycards.images import remove_thumbnails
+        path = self._get_path(asset_id)
+        try:
+            if path.stat().st_nlink <= 1:
+                path.unlink()
+                remove_thumbnails(path)
+        except FileNotFoundError:
+            pass
+
+    def remove(self, path: Path, asset_id: str | None = None):
+        """remove a file of a game and the stored file it links to, if it
+        was the last reference
+
+        :path: file of a game
+        :asset_id: id of the stored file. if None, it is found from the
+        content of the file
+
+        """
+        path = Path(path)
+        if asset_id is None:
+            asset_id = self.get_id(path)
+        path.unlink()
+        self.release(asset_id)
+
+    def get_id(self, path: Path) -> str:
+        """compute the id a file has (or would have) in the store
+
+        :path: any file
+
+        """
+        path = Path(path)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            while chunk := file.read(self._CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest() + path.suffix.lower()
+
+    def collect(self):
+        """remove all stored files and thumbnails that no game refers to
+
+        """
+        for subfolder in self._folder.iterdir():
+            if subfolder.is_dir():
+                for path in subfolder.rglob('*'):
+                    if path.is_file() and path.stat().st_nlink <= 1:
+                        path.unlink()
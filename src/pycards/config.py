@@ -1,13 +1,8 @@
-import os
-from pathlib import Path
-
-
 import xdg
 
 
 APP = 'pycards'
 
 
+# created by the first game that is saved
 DATA_FOLDER = xdg.xdg_data_home() / APP
-if not DATA_FOLDER.exists():
-    DATA_FOLDER.mkdir()
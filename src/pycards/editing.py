@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import Iterable, NamedTuple, TYPE_CHECKING
+
+
+# Pillow is imported when edits are drawn, so that the game model does not
+# load it
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+# kinds of edit operations. an operation is a dict that can be saved as
+# json, with coordinates in pixels of the img file (not rotated)
+LINE_OP = 'line'
+STICKER_OP = 'sticker'
+OP_TYPES = (LINE_OP, STICKER_OP)
+LINE_COLOR = 'black'
+
+
+class Overlay(NamedTuple):
+
+    """edits of a side of a card, drawn over its img file when it is shown
+
+    :version: changes each time the edits change
+    :ops: edit operations, in the order they were made
+
+    """
+
+    version: int
+    ops: tuple[dict, ...]
+
+
+def line_op(points: list[float], width: int = 1) -> dict:
+    """a line drawn on the card
+
+    :points: x1, y1, x2, y2...
+    :width: in pixels
+
+    """
+    return dict(type=LINE_OP, points=list(points), width=width)
+
+
+def sticker_op(
+        sticker_path: Path | str,
+        box: list[float],
+        rotated: bool = False,
+        ) -> dict:
+    """a sticker pasted on the card
+
+    :sticker_path: img file of the sticker
+    :box: x1, y1, x2, y2 where the sticker is pasted, resized to fit
+    :rotated: True to paste it rotated by 180 deg
+
+    """
+    return dict(
+            type=STICKER_OP,
+            path=Path(sticker_path).as_posix(),
+            box=list(box),
+            rotated=rotated,
+            )
+
+
+def draw_ops(
+        img: 'Image.Image',
+        ops: Iterable[dict],
+        scale: float = 1,
+        ) -> 'Image.Image':
+    """draw edit operations on an image
+
+    :img: image of the card (not rotated)
+    :ops: operations in the order they were made
+    :scale: size of img relative to the img file the operations refer to
+    :returns: a new image
+
+    """
+    from PIL import Image, ImageDraw
+    bands = img.getbands()
+    has_alpha = 'A' in bands or 'transparency' in img.info
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+    draw = ImageDraw.Draw(img)
+    for op in ops:
+        if op['type'] == LINE_OP:
+            points = [value * scale for value in op['points']]
+            width = max(1, round(op['width'] * scale))
+            draw.line(points, fill=LINE_COLOR, width=width)
+        elif op['type'] == STICKER_OP:
+            x1, y1, x2, y2 = (round(value * scale) for value in op['box'])
+            with Image.open(op['path']) as sticker:
+                sticker = sticker.convert('RGBA')
+            sticker = sticker.resize((max(1, x2 - x1), max(1, y2 - y1)))
+            if op['rotated']:
+                sticker = sticker.transpose(Image.Transpose.ROTATE_180)
+            img.paste(sticker, (x1, y1), sticker)
+        else:
+            raise ValueError(f'unknown edit operation: {op["type"]}')
+    return img
@@ -0,0 +1,74 @@
+from typing import Callable, NamedTuple
+
+
+# kinds of events
+CARD_MOVED = 'card_moved'
+CARD_TURNED = 'card_turned'
+CARD_EDITED = 'card_edited'
+CARD_MARKED = 'card_marked'
+PILE_SHUFFLED = 'pile_shuffled'
+# rows of the list of an ordered pile (box, draw or discard) to delete and
+# to insert
+PILE_CHANGED = 'pile_changed'
+GAME_CHANGED = 'game_changed'
+
+
+class Event(NamedTuple):
+
+    """something that changed in a game
+
+    :kind: one of the kinds above
+    :card_name: card concerned, if any
+    :old_pile: pile (or box) the card was in. None if it was not in the
+    game
+    :pile: pile (or box) the card is in. None if it left the game. for
+    PILE_SHUFFLED and PILE_CHANGED, the pile concerned
+    :removed: for PILE_CHANGED, names of the rows that left the pile
+    (obfuscated for the draw pile)
+    :added: for PILE_CHANGED, (position, name) of the rows that entered the
+    pile, by increasing position in the pile after the change (from the top
+    for the draw pile). they are inserted once the removed rows are deleted
+
+    """
+
+    kind: str
+    card_name: str | None = None
+    old_pile: str | None = None
+    pile: str | None = None
+    removed: tuple[str, ...] = ()
+    added: tuple[tuple[int, str], ...] = ()
+
+
+class EventBus(object):
+
+    """deliver the events of a game to the front-ends. events are delivered
+    in batches, one per transaction of the game"""
+
+    def __init__(self):
+        self._subscribers: list[Callable[[list[Event]], None]] = list()
+
+    def subscribe(self, callback: Callable[[list[Event]], None]):
+        """
+
+        :callback: called with each batch of events
+
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[list[Event]], None]):
+        """
+
+        :callback: a subscribed callback
+
+        """
+        self._subscribers.remove(callback)
+
+    def publish(self, events: list[Event]):
+        """send a batch of events to all subscribers
+
+        :events: nothing is sent if empty
+
+        """
+        if events:
+            for callback in tuple(self._subscribers):
+                callback(events)
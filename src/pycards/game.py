@@ -1,10 +1,12 @@
 import shutil
 from pathlib import Path
-import random
-from typing import Literal
+from typing import Literal, Iterable, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from copy import deepcopy
+import bisect
 
 
-import filetype
 from varboxes import VarBox
 
 
@@ -13,12 +15,69 @@ from pycards import config
 from pycards.interfaces import BaseCard
 from pycards.interfaces import PERMANENT_PILE_NAME, IN_PLAY_PILE_NAME
 from pycards.interfaces import DRAW_PILE_NAME, DISCARD_PILE_NAME
+from pycards.interfaces import BOX_PILE_NAME
+from pycards.events import EventBus, Event
+from pycards.events import CARD_MOVED, CARD_TURNED, CARD_MARKED
+from pycards.events import CARD_EDITED
+from pycards.events import PILE_SHUFFLED, PILE_CHANGED, GAME_CHANGED
+from pycards.piles import DrawPile
+from pycards.assets import AssetStore, ASSETS_FOLDER
+from pycards.editing import Overlay, OP_TYPES, STICKER_OP
+from pycards.storage import GameStorage, VarBoxStorage
+from pycards.storage import INTERVAL, STATE_KEYS
+from pycards.storage import read_storage_class, write_storage_class
+from pycards.storage import find_storage_class
 
 
-SAVED_GAME_FILE_SUFFIX = 'json'
 BOX_FOLDER = 'box'
 DECK_FOLDER = 'deck'
+CARDS_FOLDER = 'cards'
+# stickers used in the edits of the cards, inside CARDS_FOLDER
+OVERLAYS_FOLDER = 'overlays'
+RECTO = 'recto'
+VERSO = 'verso'
+# version 1: img files of the cards are all in CARDS_FOLDER
+LAYOUT_VERSION = 1
 TEMP_NAME = 'tmp'
+IMPORT_WORKERS = 8
+
+
+def _get_side(orientation: int) -> str:
+    """visible side of a card
+
+    :orientation: of the card, see Card
+
+    """
+    return RECTO if orientation in (0, 1) else VERSO
+
+
+def _is_image(path: Path | str) -> bool:
+    """check from its content that a file is an image. filetype is imported
+    at the first check, not with the module"""
+    import filetype
+    return filetype.is_image(path)
+
+
+def _import_files(
+        assets: AssetStore,
+        *src_dst: tuple[Path, Path],
+        ) -> list[tuple[str, tuple[int, int] | None]]:
+    """import img files in the asset store, link their thumbnails (made
+    only for a file that is not yet in the store) and read their size, to be
+    run in a worker thread
+
+    :assets: store shared by the games
+    :src_dst: (source, destination) for each file
+    :returns: asset id and size of each file
+
+    """
+    from pycards.images import get_image_size
+    imported = list()
+    for src, dst in src_dst:
+        asset_id = assets.import_file(src, dst)
+        assets.link_thumbnails(asset_id, dst)
+        imported.append((asset_id, get_image_size(dst)))
+    return imported
 
 
 class Card(BaseCard):
@@ -40,6 +99,17 @@ class Card(BaseCard):
         """specify if img need to be rotated by 180 deg"""
         return self._rotate
 
+    @property
+    def overlay(self) -> Overlay | None:
+        """edits to draw over the img file, None if there is none"""
+        return self._overlay
+
+    @property
+    def size(self) -> tuple[int, int] | None:
+        """(width, height) of the img file, saved when it was imported. None
+        for cards imported by older versions"""
+        return self._size
+
     def __init__(
             self,
             card_name: str,
@@ -58,14 +128,23 @@ class Card(BaseCard):
 
         """
         self._name = card_name
-        if (orientation == 0) | (orientation == 1):
+        side = _get_side(orientation)
+        if side == RECTO:
             self._path = recto_path
         else:
             self._path = verso_path
+        size = others.get(f'{side}_size')
+        self._size = tuple(size) if size else None
         if (orientation == 1) | (orientation == 2):
             self._rotate = True
         else:
             self._rotate = False
+        overlay = others.get('overlays', dict()).get(side)
+        if overlay and overlay['edits']:
+            ops = tuple(op for edit in overlay['edits'] for op in edit)
+            self._overlay = Overlay(overlay['version'], ops)
+        else:
+            self._overlay = None
 
 
 class GameError(Exception):
@@ -76,9 +155,21 @@ class Game(object):
 
     """Game class to handle the deck and the cards box"""
 
-    _saved_games = VarBox(project_name=config.APP, app_name='saved_games')
-    if not hasattr(_saved_games, 'names'):
-        _saved_games.names = list()
+    _saved_games: VarBox | None = None
+
+    @classmethod
+    def _get_saved_games(cls) -> VarBox:
+        """varbox with the names of the saved games. it is loaded at the
+        first use, not when the module is imported
+
+        """
+        if cls._saved_games is None:
+            saved_games = VarBox(
+                    project_name=config.APP, app_name='saved_games')
+            if not hasattr(saved_games, 'names'):
+                saved_games.names = list()
+            cls._saved_games = saved_games
+        return cls._saved_games
 
     @classmethod
     def get_saved_game(cls) -> (str):
@@ -86,7 +177,7 @@ class Game(object):
         :returns: list of saved games names
 
         """
-        saved_games = tuple(cls._saved_games.names)
+        saved_games = tuple(cls._get_saved_games().names)
         return saved_games
 
     @property
@@ -95,14 +186,30 @@ class Game(object):
         return self._name
 
     @property
-    def box_card_names(self) -> list:
-        """return an ordered list of the card names in the box"""
-        return sorted(self._box.keys())
+    def box_card_names(self) -> tuple[str]:
+        """return an ordered tuple of the card names in the box"""
+        return tuple(self._sorted_names['box'])
 
     @property
-    def deck_card_names(self) -> list:
-        """return an ordered list of the card names in the deck"""
-        return sorted(self._deck.keys())
+    def deck_card_names(self) -> tuple[str]:
+        """return an ordered tuple of the card names in the deck"""
+        return tuple(self._sorted_names['deck'])
+
+    def is_card_in_box(self, card_name: str) -> bool:
+        """check if a card is in the box
+
+        :card_name: identify card
+
+        """
+        return card_name in self._box
+
+    def is_card_in_deck(self, card_name: str) -> bool:
+        """check if a card is in the deck
+
+        :card_name: identify card
+
+        """
+        return card_name in self._deck
 
     @property
     def stickers(self) -> dict[str, Path]:
@@ -114,8 +221,7 @@ class Game(object):
         """get a dict of permanent cards from the deck"""
         permanent_cards = {
                 card_name: self.get_card(card_name)
-                for card_name, card in self._deck.items()
-                if card.get('pile') == self._PERMANENT_PILE}
+                for card_name in self._piles[self._PERMANENT_PILE]}
         return permanent_cards
 
     @property
@@ -123,8 +229,7 @@ class Game(object):
         """get a list of in-play cards from the deck"""
         in_play = {
                 card_name: self.get_card(card_name)
-                for card_name, card in self._deck.items()
-                if card.get('pile') == self._IN_PLAY_PILE}
+                for card_name in self._piles[self._IN_PLAY_PILE]}
         return in_play
 
     @property
@@ -132,15 +237,42 @@ class Game(object):
         """get a list of discarded cards from the deck"""
         discarded = {
                 card_name: self.get_card(card_name)
-                for card_name, card in self._deck.items()
-                if card.get('pile') == self._DISCARD_PILE}
+                for card_name in self._piles[self._DISCARD_PILE]}
         return discarded
 
+    @property
+    def discarded_card_names(self) -> tuple[str]:
+        """get the names of the discarded cards, without creating Card
+        objects"""
+        return tuple(self._piles[self._DISCARD_PILE])
+
+    def is_card_permanent(self, card_name: str) -> bool:
+        """check if a card is in the permanent pile
+
+        :card_name: identify card
+        :returns: False also if the card is not in the deck
+
+        """
+        return card_name in self._piles[self._PERMANENT_PILE]
+
     @property
     def draw_pile_cards(self) -> list[str]:
         """get a tuple of the draw pile. names are obfuscated"""
         return tuple(self._draw_pile)
 
+    def get_draw_pile_position(self, card_name: str) -> int:
+        """find where a card is in the draw pile
+
+        :card_name: real name of the card
+        :returns: position counted from the top (0)
+
+        """
+        obfuscated = self._draw_cards_obfuscate_name.get(card_name)
+        if obfuscated is None:
+            raise GameError('card is not in the draw pile')
+        position = self._draw_pile.index(obfuscated)
+        return len(self._draw_pile) - 1 - position
+
     def get_real_card_name(self, obfuscated_card_name: str) -> str:
         """reveal the card name when hidden in the draw pile
 
@@ -158,9 +290,35 @@ class Game(object):
     _DISCARD_PILE = DISCARD_PILE_NAME
     _PERMANENT_PILE = PERMANENT_PILE_NAME
     _ALWAYS_VISIBLE = 'always_visible'
+    # kept in the dict of a card while it is in the draw pile
+    _DRAW_POSITION = 'draw_position'
+    _DRAW_NAME = 'draw_name'
+    # rank of a card in the other piles, for example the order in which the
+    # cards were discarded
+    _PILE_ORDER = 'pile_order'
+    # shown as lists by the front-ends, see PILE_CHANGED
+    _ORDERED_PILES = (BOX_PILE_NAME, DRAW_PILE_NAME, DISCARD_PILE_NAME)
+
+    def __init__(
+            self,
+            name: str = TEMP_NAME,
+            storage_class: type[GameStorage] = VarBoxStorage,
+            durability: str = INTERVAL,
+            ):
+        """
 
-    def __init__(self, name: str = TEMP_NAME):
-        if name in self._saved_games.names:
+        :name: of the game to load, created if there is none
+        :storage_class: backend where the new games are saved. a saved game
+        is loaded from the backend it was saved in, whatever this one. see
+        migrate_storage to move a game to another backend
+        :durability: when the saves are synced on disk (see pycards.storage)
+
+        """
+        self.events = EventBus()
+        self._storage_class = storage_class
+        self._durability = durability
+        self._storage: GameStorage | None = None
+        if name in self._get_saved_games().names:
             self.load(name)
         else:
             self.new(name)
@@ -171,10 +329,12 @@ class Game(object):
         :name: should not be already present, else will raise error
 
         """
-        if name not in self._saved_games.names:
+        if name == ASSETS_FOLDER:
+            raise GameError('this name is reserved')
+        if name not in self._get_saved_games().names:
             if name != TEMP_NAME:
-                self._saved_games.names.append(name)
-                self._saved_games.save()
+                self._get_saved_games().names.append(name)
+                self._get_saved_games().save()
             self._change_name(name)
         else:
             raise GameError('there is already a saved game with this name')
@@ -185,7 +345,7 @@ class Game(object):
         :name: there must be a game that was saved with that name
 
         """
-        if name in self._saved_games.names:
+        if name in self._get_saved_games().names:
             self._change_name(name)
         else:
             raise GameError('there is no saved game with this name')
@@ -198,57 +358,570 @@ class Game(object):
         """
         self._name = name
         self._game_data_folder = DATA_FOLDER / self.name
-        self._game_data_folder.mkdir(exist_ok=True)
+        self._game_data_folder.mkdir(parents=True, exist_ok=True)
         self._box_folder = self._game_data_folder / BOX_FOLDER
         self._box_folder.mkdir(exist_ok=True)
-        self._deck_folder = self._game_data_folder / DECK_FOLDER
-        self._deck_folder.mkdir(exist_ok=True)
-
-        self._varbox = self._create_varbox(name)
-
-        self._box = self._varbox.box
-        self._deck = self._varbox.deck
-        self._stickers = self._varbox.stickers
-        self._draw_pile = self._varbox.draw_pile
-        self._draw_cards_real_name = self._varbox.draw_cards_real_name
-        varboxobf = self._varbox.draw_cards_obfuscate_name
-        self._draw_cards_obfuscate_name = varboxobf
+        self._cards_folder = self._game_data_folder / CARDS_FOLDER
+        self._cards_folder.mkdir(exist_ok=True)
+        self._overlays_folder = self._cards_folder / OVERLAYS_FOLDER
+        self._overlays_folder.mkdir(exist_ok=True)
+        self._assets = AssetStore(DATA_FOLDER / ASSETS_FOLDER)
+
+        self._open_storage(name)
+
+        state = self._state
+        self._box = state['box']
+        self._deck = state['deck']
+        self._stickers = state['stickers']
+        self._next_obfuscated_id = state['draw_cards_next_id']
         self._all_cards = dict(box=self._box, deck=self._deck)
 
-    def _create_varbox(self, name) -> VarBox:
-        """create varbox or load an existing one and add
-        attributes (if not presents) to store permanent data
+        self._transaction: dict | None = None
+        self._dirty = False
+        # what changed since the last write, so that only that is saved
+        self._dirty_cards: set[str] = set()
+        self._dirty_keys: set[str] = set()
+        self._rebuild_indexes()
+        if state['draw_pile']:
+            self._migrate_draw_pile()
+        if self._next_obfuscated_id is None:
+            self.compact_obfuscated_names()
+        if state['layout_version'] < LAYOUT_VERSION:
+            self._migrate_layout()
+        self.events.publish([Event(GAME_CHANGED)])
+
+    def _open_storage(self, name: str):
+        """open the storage of a game and load its state. a game is loaded
+        from the backend it was saved in, the backend of the game is used
+        for a new game
 
         :name: game
-        :returns: varbox
 
         """
-        varbox = VarBox(project_name=config.APP, app_name=name)
+        if self._storage is not None:
+            self._storage.close()
+        folder = self._game_data_folder
+        storage_class = read_storage_class(folder)
+        if storage_class is None:
+            storage_class = find_storage_class(name, folder)
+            if storage_class is None:
+                storage_class = self._storage_class
+        storage = storage_class(name, folder, durability=self._durability)
+        write_storage_class(folder, storage_class)
+        self._storage = storage
+        self._state = storage.load()
+
+    def migrate_storage(self, storage_class: type[GameStorage]):
+        """save the game in another backend, from which it is loaded from
+        then on. the files of the former backend are removed once the copy
+        is synced on disk: a game moved out of its varbox cannot be opened
+        by older versions anymore
+
+        :storage_class: new backend
 
-        if not hasattr(varbox, 'box'):
-            varbox.box = dict()
-        if not hasattr(varbox, 'deck'):
-            varbox.deck = dict()
-        if not hasattr(varbox, 'draw_pile'):
-            varbox.draw_pile = list()
-        if not hasattr(varbox, 'draw_cards_real_name'):
-            varbox.draw_cards_real_name = dict()
-        if not hasattr(varbox, 'draw_cards_obfuscate_name'):
-            varbox.draw_cards_obfuscate_name = dict()
-        if not hasattr(varbox, 'stickers'):
-            varbox.stickers = dict()
-        return varbox
+        """
+        if isinstance(self._storage, storage_class):
+            raise GameError('the game is already saved in this storage')
+        folder = self._game_data_folder
+        storage = storage_class(
+                self.name, folder, durability=self._durability)
+        if storage.exists:
+            # left by a former migration
+            storage.delete()
+            storage = storage_class(
+                    self.name, folder, durability=self._durability)
+        card_names = [
+                card_name
+                for cards in self._all_cards.values()
+                for card_name in cards]
+        storage.save(self._state, card_names, STATE_KEYS, 'migrate_storage')
+        # else a crash could lose both
+        storage.flush()
+        write_storage_class(folder, storage_class)
+        self._storage.delete()
+        self._storage = storage
+
+    def _migrate_layout(self):
+        """update the img files of a game saved by an older version.
+        (before version 1, img files were moved between a box and a deck
+        folder)
+
+        """
+        with self.transaction('migrate_layout'):
+            for cards in self._all_cards.values():
+                for card_name, card in cards.items():
+                    self._touch_card(card_name)
+                    for key in ('recto_path', 'verso_path'):
+                        path = Path(card[key])
+                        if path.parent != self._cards_folder:
+                            if path.exists():
+                                path = shutil.move(path, self._cards_folder)
+                            else:
+                                path = self._cards_folder / path.name
+                            card[key] = Path(path).as_posix()
+            self._dirty = True
+            self._dirty_keys.add('layout_version')
+            self._state['layout_version'] = LAYOUT_VERSION
+        deck_folder = self._game_data_folder / DECK_FOLDER
+        if deck_folder.exists() and not any(deck_folder.iterdir()):
+            deck_folder.rmdir()
+
+    def _migrate_draw_pile(self):
+        """give to the cards of the draw pile their position and obfuscated
+        name, for a game saved by an older version with the draw pile as
+        lists
+
+        """
+        state = self._state
+        real_names = state['draw_cards_real_name']
+        with self.transaction('migrate_draw_pile'):
+            for position, obfuscated in enumerate(state['draw_pile']):
+                card_name = real_names.get(obfuscated, obfuscated)
+                card = self._deck.get(card_name)
+                if card is None or card.get('pile') != self._DRAW_PILE:
+                    continue
+                self._touch_card(card_name)
+                card[self._DRAW_POSITION] = position
+                card[self._DRAW_NAME] = obfuscated
+            for key in (
+                    'draw_pile',
+                    'draw_cards_real_name',
+                    'draw_cards_obfuscate_name',
+                    ):
+                state[key] = type(state[key])()
+                self._dirty_keys.add(key)
+            self._rebuild_draw_pile()
+
+    @contextmanager
+    def transaction(self, operation: str | None = None):
+        """group several mutations of the game. the state is written on disk
+        only once, when the outermost transaction ends. if a GameError is
+        raised inside, the in-memory state is restored as it was before.
+        (img files that were copied, moved or removed are not restored)
+
+        :operation: name of what is done, saved with the changes. the name
+        of the outermost transaction is kept
+
+        """
+        if self._transaction is not None:
+            yield
+            return
+        self._transaction = dict(
+                cards=dict(),
+                stickers=None,
+                dirty=self._dirty,
+                # order of the piles and of the deck before they changed
+                piles=dict(),
+                deck_order=None,
+                events=list(),
+                operation=operation,
+                )
+        try:
+            yield
+        except GameError:
+            self._rollback()
+            raise
+        else:
+            if self._dirty:
+                self._write(self._transaction['operation'])
+            events = (
+                    self._get_card_events()
+                    + self._get_pile_events()
+                    + self._transaction['events'])
+        finally:
+            self._transaction = None
+        self.events.publish(events)
+
+    def _emit(self, kind: str, **data):
+        """add an event that cannot be found from the touched cards. it is
+        published at the end of the transaction
+
+        :kind: of event
+        :data: other fields of the event
 
-    def _reset_varbox(self):
-        """reset all the data of the current varbox
+        """
+        self._transaction['events'].append(Event(kind, **data))
+
+    def _get_card_events(self) -> list[Event]:
+        """compare the cards touched in the current transaction with their
+        backups to find what happened to them
 
         """
-        varbox = self._varbox
-        varbox.box = dict()
-        varbox.deck = dict()
-        varbox.draw_pile = list()
-        varbox.draw_cards_real_name = dict()
-        varbox.draw_obfuscate_real_name = dict()
+        events = list()
+        for card_name, backup in self._transaction['cards'].items():
+            if backup is None:
+                old_card, old_pile = dict(), None
+            else:
+                cards, old_card = backup
+                old_pile = self._get_event_pile(cards, old_card)
+            cards = self._check_card_in_game(card_name)
+            if cards:
+                card = cards[card_name]
+                pile = self._get_event_pile(cards, card)
+            else:
+                card, pile = dict(), None
+            if pile != old_pile or pile == self._DRAW_PILE:
+                events.append(Event(CARD_MOVED, card_name, old_pile, pile))
+            if not card or not old_card:
+                continue
+            if card['orientation'] != old_card['orientation']:
+                events.append(Event(CARD_TURNED, card_name, pile, pile))
+            always_visible = card.get(self._ALWAYS_VISIBLE)
+            if always_visible != old_card.get(self._ALWAYS_VISIBLE):
+                events.append(Event(CARD_MARKED, card_name, pile, pile))
+            if card.get('overlays') != old_card.get('overlays'):
+                events.append(Event(CARD_EDITED, card_name, pile, pile))
+        return events
+
+    def _get_event_pile(self, cards: dict, card: dict) -> str:
+        if cards is self._box:
+            return BOX_PILE_NAME
+        return card.get('pile')
+
+    def _get_pile_events(self) -> list[Event]:
+        """compare the cards touched in the current transaction with their
+        backups to find the rows to delete and to insert in the ordered
+        piles
+
+        """
+        removed = {pile: list() for pile in self._ORDERED_PILES}
+        added = {pile: list() for pile in self._ORDERED_PILES}
+        for card_name, backup in self._transaction['cards'].items():
+            if backup is None:
+                old_row = None
+            else:
+                old_row = self._get_pile_row(card_name, *backup)
+            cards = self._check_card_in_game(card_name)
+            if cards:
+                row = self._get_pile_row(card_name, cards, cards[card_name])
+            else:
+                row = None
+            if row == old_row:
+                continue
+            if old_row is not None and old_row[0] in removed:
+                removed[old_row[0]].append(old_row[1])
+            if row is not None and row[0] in added:
+                added[row[0]].append(row[1])
+        events = list()
+        for pile in self._ORDERED_PILES:
+            if removed[pile] or added[pile]:
+                events.append(Event(
+                    PILE_CHANGED,
+                    pile=pile,
+                    removed=tuple(removed[pile]),
+                    added=self._get_row_positions(pile, added[pile]),
+                    ))
+        return events
+
+    def _get_pile_row(
+            self,
+            card_name: str,
+            cards: dict,
+            card: dict,
+            ) -> tuple[str, str, int | None]:
+        """row of a card in the list of its pile
+
+        :card_name: identify card
+        :cards: box or deck
+        :card: card data
+        :returns: pile, name shown (obfuscated in the draw pile) and
+        position in the draw pile
+
+        """
+        pile = self._get_event_pile(cards, card)
+        if pile == self._DRAW_PILE:
+            return (
+                    pile,
+                    card.get(self._DRAW_NAME, card_name),
+                    card.get(self._DRAW_POSITION),
+                    )
+        return pile, card_name, None
+
+    def _get_row_positions(
+            self,
+            pile: str,
+            names: list[str],
+            ) -> tuple[tuple[int, str], ...]:
+        """positions of rows in the list of an ordered pile: the box is
+        sorted by name, the draw pile goes from the top, and the discard
+        pile follows the order in which the cards were discarded
+
+        :pile: one of _ORDERED_PILES
+        :names: of rows in the pile, obfuscated for the draw pile
+        :returns: (position, name), by increasing position
+
+        """
+        if pile == BOX_PILE_NAME:
+            sorted_names = self._sorted_names['box']
+            positions = [
+                    (bisect.bisect_left(sorted_names, name), name)
+                    for name in names]
+        elif pile == self._DRAW_PILE:
+            top = len(self._draw_pile) - 1
+            positions = [
+                    (top - self._draw_pile.index(name), name)
+                    for name in names]
+        else:
+            # the cards discarded last are at the end
+            discarded = self._piles[pile]
+            wanted = set(names)
+            positions = list()
+            for position, name in zip(
+                    range(len(discarded) - 1, -1, -1), reversed(discarded)):
+                if name in wanted:
+                    positions.append((position, name))
+                    if len(positions) == len(wanted):
+                        break
+        return tuple(sorted(positions))
+
+    def _rollback(self):
+        """restore the state saved by the _touch methods in the current
+        transaction
+
+        """
+        transaction = self._transaction
+        for card_name, backup in transaction['cards'].items():
+            if backup is None:
+                self._box.pop(card_name, None)
+                self._deck.pop(card_name, None)
+                continue
+            cards, card = backup
+            other_cards = self._deck if cards is self._box else self._box
+            other_cards.pop(card_name, None)
+            # in place if the card is still there, so that it keeps its rank
+            cards[card_name] = card
+        if transaction['deck_order'] is not None:
+            deck = dict(self._deck)
+            self._deck.clear()
+            self._deck.update(
+                    (card_name, deck[card_name])
+                    for card_name in transaction['deck_order'])
+        if 'next_obfuscated_id' in transaction:
+            self._next_obfuscated_id = transaction['next_obfuscated_id']
+        if transaction['stickers'] is not None:
+            self._stickers.clear()
+            self._stickers.update(transaction['stickers'])
+        self._dirty = transaction['dirty']
+        self._rebuild_sorted_names()
+        for pile, card_names in transaction['piles'].items():
+            self._piles[pile] = dict.fromkeys(card_names)
+        self._rebuild_draw_pile()
+        self._piles[self._DRAW_PILE] = dict.fromkeys(
+                self._draw_cards_obfuscate_name)
+
+    def _rebuild_indexes(self):
+        """build all the data derived from the box and the deck: sorted card
+        names, pile index and draw pile
+
+        """
+        self._rebuild_sorted_names()
+        self._rebuild_pile_index()
+        self._rebuild_draw_pile()
+
+    def _rebuild_sorted_names(self):
+        # keyed like _all_cards
+        self._sorted_names: dict[str, list[str]] = {
+                location: sorted(cards)
+                for location, cards in self._all_cards.items()}
+
+    def _rebuild_draw_pile(self):
+        """build the draw pile and the obfuscated names from the position
+        and the obfuscated name saved in each card of the pile
+
+        """
+        draw_cards = sorted(
+                (card.get(self._DRAW_POSITION, 0), card_name)
+                for card_name, card in self._deck.items()
+                if card.get('pile') == self._DRAW_PILE)
+        self._draw_cards_real_name: dict[str, str] = dict()
+        self._draw_cards_obfuscate_name: dict[str, str] = dict()
+        for _, card_name in draw_cards:
+            obfuscated = self._deck[card_name].get(self._DRAW_NAME, card_name)
+            self._draw_cards_real_name[obfuscated] = card_name
+            self._draw_cards_obfuscate_name[card_name] = obfuscated
+        self._draw_pile = DrawPile(self._draw_cards_real_name)
+
+    def _get_location(self, cards: dict) -> str:
+        """key of the box or the deck in _all_cards"""
+        return 'box' if cards is self._box else 'deck'
+
+    def _insert_card(self, cards: dict, card_name: str, card: dict):
+        """put a card in the box or the deck and keep the sorted names up to
+        date
+
+        :cards: box or deck
+        :card_name: identify card
+        :card: card data
+
+        """
+        self._touch_deck_order(cards)
+        cards[card_name] = card
+        bisect.insort(
+                self._sorted_names[self._get_location(cards)], card_name)
+
+    def _pop_card(self, cards: dict, card_name: str) -> dict:
+        """remove a card from the box or the deck and keep the sorted names
+        up to date
+
+        :cards: box or deck
+        :card_name: identify card
+        :returns: card data
+
+        """
+        self._touch_deck_order(cards)
+        card = cards.pop(card_name)
+        sorted_names = self._sorted_names[self._get_location(cards)]
+        index = bisect.bisect_left(sorted_names, card_name)
+        del sorted_names[index]
+        return card
+
+    def _rebuild_pile_index(self):
+        """build the index of the card names in each pile from the deck, in
+        the order saved in the cards. cards saved by older versions without
+        order come first, by name
+
+        """
+        self._piles: dict[str, dict[str, None]] = {
+                pile: dict() for pile in (
+                    self._DRAW_PILE,
+                    self._IN_PLAY_PILE,
+                    self._DISCARD_PILE,
+                    self._PERMANENT_PILE,
+                    )}
+        ordered = sorted(
+                (card.get(self._PILE_ORDER, -1), card_name)
+                for card_name, card in self._deck.items())
+        for _, card_name in ordered:
+            pile = self._deck[card_name].get('pile')
+            if pile in self._piles:
+                self._piles[pile][card_name] = None
+
+    def check_pile_index(self) -> bool:
+        """verify that the pile index is consistent with the deck. if not,
+        the index is rebuilt
+
+        :returns: True if the index was consistent
+
+        """
+        consistent = True
+        indexed = dict()
+        for pile, card_names in self._piles.items():
+            for card_name in card_names:
+                if card_name in indexed:
+                    consistent = False
+                indexed[card_name] = pile
+        for card_name, card in self._deck.items():
+            if indexed.pop(card_name, None) != card.get('pile'):
+                consistent = False
+        if indexed:
+            consistent = False
+        if not consistent:
+            self._rebuild_pile_index()
+        return consistent
+
+    def _set_pile(self, card_name: str, pile: str | None):
+        """change the pile of a card from the deck and keep the index in sync.
+        the card must already be in the deck, and be touched before. it gets
+        the rank after the last card of its new pile
+
+        :card_name: identify card
+        :pile: new pile. None if the card is leaving the deck
+
+        """
+        card = self._deck[card_name]
+        old_pile = card.get('pile')
+        transaction = self._transaction
+        if transaction is not None:
+            for changed in (old_pile, pile):
+                # the order of the draw pile is in its cards, not in the index
+                if (changed in self._piles
+                        and changed != self._DRAW_PILE
+                        and changed not in transaction['piles']):
+                    transaction['piles'][changed] = tuple(self._piles[changed])
+        if old_pile in self._piles:
+            self._piles[old_pile].pop(card_name, None)
+        card.pop(self._PILE_ORDER, None)
+        if pile is not None:
+            if pile != self._DRAW_PILE:
+                last = next(reversed(self._piles[pile]), None)
+                if last is None:
+                    order = 0
+                else:
+                    order = self._deck[last].get(self._PILE_ORDER, -1) + 1
+                card[self._PILE_ORDER] = order
+            card['pile'] = pile
+            self._piles[pile][card_name] = None
+
+    def _touch_card(self, card_name: str):
+        """to be called before a card is modified, added or removed. keep a
+        copy of it for a rollback and mark the game as modified
+
+        :card_name: identify card
+
+        """
+        self._dirty = True
+        self._dirty_cards.add(card_name)
+        transaction = self._transaction
+        if transaction is not None and card_name not in transaction['cards']:
+            cards = self._check_card_in_game(card_name)
+            if cards:
+                backup = (cards, deepcopy(cards[card_name]))
+            else:
+                backup = None
+            transaction['cards'][card_name] = backup
+
+    def _touch_deck_order(self, cards: dict):
+        """to be called before a card is added to or removed from the box or
+        the deck. keep the order of the deck for a rollback
+
+        :cards: box or deck
+
+        """
+        transaction = self._transaction
+        if (cards is self._deck
+                and transaction is not None
+                and transaction['deck_order'] is None):
+            transaction['deck_order'] = tuple(self._deck)
+
+    def _touch_obfuscated_id(self):
+        """to be called before the counter of the obfuscated names is
+        modified. the draw pile itself is saved in its cards
+
+        """
+        self._dirty = True
+        self._dirty_keys.add('draw_cards_next_id')
+        transaction = self._transaction
+        if (transaction is not None
+                and 'next_obfuscated_id' not in transaction):
+            transaction['next_obfuscated_id'] = self._next_obfuscated_id
+
+    def _touch_stickers(self):
+        """to be called before the stickers are modified
+
+        """
+        self._dirty = True
+        self._dirty_keys.add('stickers')
+        transaction = self._transaction
+        if transaction is not None and transaction['stickers'] is None:
+            transaction['stickers'] = dict(self._stickers)
+
+    def _write(self, operation: str | None = None):
+        """write on disk what changed in the game since the last write
+
+        :operation: that made the changes
+
+        """
+        state = self._state
+        state['draw_cards_next_id'] = self._next_obfuscated_id
+        self._storage.save(
+                state,
+                self._dirty_cards,
+                self._dirty_keys,
+                operation,
+                )
+        self._dirty_cards.clear()
+        self._dirty_keys.clear()
+        self._dirty = False
 
     def get_card_pile(self, card_name) -> Literal[
             'draw', 'discard', 'permanent', 'in_play']:
@@ -258,66 +931,103 @@ class Game(object):
         :returns: on of [draw, in_play, permanent, discard]
 
         """
-        if card_name in self.deck_card_names:
-            card = self._deck.get(card_name)
+        card = self._deck.get(card_name)
+        if card is not None:
             return card.get('pile')
         else:
             raise GameError('card is not in the deck')
 
-    def delete_game(self) -> str:
-        """remove all saved cards and folders from disk. a config file will
-        still be present.
-        :return: path of the empty config file
+    def close(self):
+        """release the storage of the game, to be called when the app
+        exits. the game must not be modified after, until new or load
 
         """
+        self._storage.close()
+
+    def delete_game(self):
+        """remove the storage, the folder and the unused assets of the game
+        from disk, and forget its name. the game becomes the temporary game
+
+        """
+        self._storage.delete()
+        self._storage = None
         path = self._game_data_folder
         if path.exists():
             shutil.rmtree(path)
-        self._reset_varbox()
-        varbox_path = self._varbox.get_path()
-        Path(varbox_path).unlink()
-        saved_games: list = self._saved_games.names
+        self._assets.collect()
+        saved_games: list = self._get_saved_games().names
         if self.name != TEMP_NAME:
             saved_games.remove(self.name)
-            self._saved_games.save()
+            self._get_saved_games().save()
         self._change_name(TEMP_NAME)
 
-    def import_sticker(self, img_path: Path, sticker_name: str = None):
-        """import image of a sticker, put in game folder and store in object
+    def _prepare_sticker_import(
+            self,
+            img_path: Path,
+            sticker_name: str,
+            ) -> Path:
+        """check that a sticker can be imported and find where its img file
+        will be copied
 
         :img_path: path to img file
-        :sticker_name: name. should be different from others. if none, take fn
+        :sticker_name: name of the new sticker
+        :returns: destination of the img file
 
         """
-        if not filetype.is_image(img_path):
-            raise GameError('sticker file is not an image')
-
-        if sticker_name is None:
-            sticker_name = img_path.stem
-
         if sticker_name in self._stickers:
             raise GameError('there is already a sticker with that name')
 
-        src = img_path
         dst_fn = sticker_name + img_path.suffix
         dst = self._box_folder / dst_fn
         if dst.exists():
             raise GameError('there is already an img file for this sticker')
-        dst.write_bytes(src.read_bytes())
+        return dst
+
+    def _add_imported_sticker(self, sticker_name: str, dst: Path):
+        with self.transaction('import_sticker'):
+            self._touch_stickers()
+            self._stickers[sticker_name] = dst.as_posix()
+
+    def import_sticker(self, img_path: Path, sticker_name: str = None):
+        """import image of a sticker, put in game folder and store in object
 
-        self._stickers[sticker_name] = dst.as_posix()
-        self._varbox.save()
+        :img_path: path to img file
+        :sticker_name: name. should be different from others. if none, take fn
+
+        """
+        if not _is_image(img_path):
+            raise GameError('sticker file is not an image')
+
+        if sticker_name is None:
+            sticker_name = img_path.stem
+
+        dst = self._prepare_sticker_import(img_path, sticker_name)
+        self._assets.import_file(img_path, dst)
+        self._add_imported_sticker(sticker_name, dst)
 
     def import_sticker_folders(self, folder_path: Path):
         """import all stickers present in the folder. name will be same as
-        filenames, without suffixes
+        filenames, without suffixes. names are all validated before any
+        import, so that no file is copied if one of them is refused
 
         :folder_path: path to folder containing sticker images
 
         """
-        for fp in folder_path.iterdir():
-            if filetype.is_image(fp):
-                self.import_sticker(fp)
+        imports = list()
+        sticker_names = set()
+        for fp in sorted(folder_path.iterdir()):
+            if _is_image(fp):
+                sticker_name = fp.stem
+                if sticker_name in sticker_names:
+                    raise GameError(
+                            f'sticker {sticker_name} is twice in the folder')
+                sticker_names.add(sticker_name)
+                dst = self._prepare_sticker_import(fp, sticker_name)
+                imports.append((fp, sticker_name, dst))
+        with self.transaction('import_sticker_folders'):
+            for fp, sticker_name, dst in imports:
+                self._assets.import_file(fp, dst)
+                self._add_imported_sticker(sticker_name, dst)
 
     def delete_sticker(self, sticker_name):
         """remove img file of sticker. will not be present in property of
@@ -327,12 +1037,71 @@ class Game(object):
 
         """
         if sticker_name in self._stickers:
-            img_path = self.stickers.pop(sticker_name)
-            Path(img_path).unlink()
-            self._varbox.save()
+            with self.transaction('delete_sticker'):
+                self._touch_stickers()
+                img_path = self.stickers.pop(sticker_name)
+                self._assets.remove(img_path)
         else:
             raise GameError('sticker not present in game')
 
+    def _prepare_card_import(
+            self,
+            recto_path: str,
+            card_name: str,
+            ) -> tuple[Path, Path]:
+        """check that a card can be imported and find where its img files
+        will be copied
+
+        :recto_path: img file of recto
+        :card_name: name of the new card
+        :returns: destination of recto and verso img files
+
+        """
+        if self._check_card_in_game(card_name):
+            raise GameError(f'card {card_name} already in box or in deck')
+
+        ext = Path(recto_path).suffix
+        recto_name = f'{card_name}_recto{ext}'
+        verso_name = f'{card_name}_verso{ext}'
+        dst_recto = self._cards_folder / recto_name
+        dst_verso = self._cards_folder / verso_name
+        if dst_recto.exists() | dst_verso.exists():
+            raise GameError(
+                    f'there is already an img file for card {card_name}')
+        return dst_recto, dst_verso
+
+    def _add_imported_card(
+            self,
+            card_name: str,
+            dst_recto: Path,
+            dst_verso: Path,
+            recto: tuple[str, tuple[int, int] | None],
+            verso: tuple[str, tuple[int, int] | None],
+            ):
+        """put a card whose img files were imported in the box
+
+        :card_name: name of the new card
+        :dst_recto: img file of recto, in the game folder
+        :dst_verso: img file of verso, in the game folder
+        :recto: id in the asset store and size of the recto
+        :verso: id in the asset store and size of the verso
+
+        """
+        recto_asset, recto_size = recto
+        verso_asset, verso_size = verso
+        card = dict(recto_path=dst_recto.as_posix(),
+                    verso_path=dst_verso.as_posix(),
+                    orientation=0,
+                    card_name=card_name,
+                    recto_asset=recto_asset,
+                    verso_asset=verso_asset,
+                    recto_size=recto_size,
+                    verso_size=verso_size,
+                    )
+        with self.transaction('import_card'):
+            self._touch_card(card_name)
+            self._insert_card(self._box, card_name, card)
+
     def import_card(
             self,
             recto_path: str,
@@ -346,36 +1115,22 @@ class Game(object):
         :card_name: if None take value of recto filename
         """
 
-        if not filetype.is_image(recto_path):
+        if not _is_image(recto_path):
             raise GameError('recto file is not an image')
-        if not filetype.is_image(verso_path):
+        if not _is_image(verso_path):
             raise GameError('recto file is not an image')
 
-        ext = Path(recto_path).suffix
         if card_name is None:
             card_name = Path(recto_path).stem
 
-        if self._check_card_in_game(card_name):
-            raise GameError('card already in box or in deck')
-
-        recto_name = f'{card_name}_recto{ext}'
-        verso_name = f'{card_name}_verso{ext}'
-        src_recto = recto_path
-        dst_recto = self._box_folder / recto_name
-        src_verso = verso_path
-        dst_verso = self._box_folder / verso_name
-        if dst_recto.exists() | dst_verso.exists():
-            raise GameError('there is already an img file for this card')
-        shutil.copy(src_recto, dst_recto)
-        shutil.copy(src_verso, dst_verso)
-
-        card = dict(recto_path=dst_recto.as_posix(),
-                    verso_path=dst_verso.as_posix(),
-                    orientation=0,
-                    card_name=card_name,
-                    )
-        self._box[card_name] = card
-        self._varbox.save()
+        dst_recto, dst_verso = self._prepare_card_import(
+                recto_path, card_name)
+        recto, verso = _import_files(
+                self._assets,
+                (recto_path, dst_recto),
+                (verso_path, dst_verso),
+                )
+        self._add_imported_card(card_name, dst_recto, dst_verso, recto, verso)
 
     def _check_card_in_game(self, card_name) -> dict:
         """look in deck or box if card present
@@ -389,21 +1144,167 @@ class Game(object):
                 return cards
         return False
 
-    def import_cards_folder(self, folder_path: Path):
+    def import_cards_folder(
+            self,
+            folder_path: Path,
+            progress: Callable[[int, int], None] | None = None,
+            ):
         """import all img file in the folder as cards. Every two file
-        (in alhabetic order) will be the verso of the precedent card
+        (in alhabetic order) will be the verso of the precedent card.
+        files are checked and imported in parallel. names are all validated
+        before any import, and the game is saved once at the end
+
+        :folder_path: point to a folder of img file
+        :progress: called with (number of cards imported, total) after each
+        card
+
+        """
+        imports = self.copy_cards_folder(folder_path, progress)
+        self.add_copied_cards(imports)
+
+    def copy_cards_folder(
+            self,
+            folder_path: Path,
+            progress: Callable[[int, int], None] | None = None,
+            ) -> list[tuple]:
+        """first step of import_cards_folder: copy the img files of the
+        cards in the game folder, without changing the game. it can run out
+        of the thread of the game, which must not change meanwhile. on
+        error, the files already copied are removed
 
         :folder_path: point to a folder of img file
+        :progress: called with (number of cards imported, total) after each
+        card, from the thread of copy_cards_folder
+        :returns: cards to give to add_copied_cards
 
         """
-        img_files = [
-                fp for fp in folder_path.iterdir() if filetype.is_image(fp)]
-        img_files.sort()
+        files = sorted(fp for fp in folder_path.iterdir() if fp.is_file())
         cardlot_name = folder_path.name
-        for recto_fp, verso_fp in zip(img_files[::2], img_files[1::2]):
-            cardname = recto_fp.stem
-            full_card_name = f'{cardlot_name}_{cardname}'
-            self.import_card(recto_fp, verso_fp, full_card_name)
+        with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as executor:
+            is_image = executor.map(_is_image, files)
+            img_files = [fp for fp, image in zip(files, is_image) if image]
+
+            imports = list()
+            card_names = set()
+            for recto_fp, verso_fp in zip(img_files[::2], img_files[1::2]):
+                cardname = recto_fp.stem
+                full_card_name = f'{cardlot_name}_{cardname}'
+                if full_card_name in card_names:
+                    raise GameError(
+                            f'card {full_card_name} is twice in the folder')
+                card_names.add(full_card_name)
+                dst_recto, dst_verso = self._prepare_card_import(
+                        recto_fp, full_card_name)
+                imports.append(
+                        (full_card_name, recto_fp, verso_fp,
+                         dst_recto, dst_verso))
+
+            futures = [
+                    executor.submit(
+                        _import_files,
+                        self._assets,
+                        (recto_fp, dst_recto),
+                        (verso_fp, dst_verso))
+                    for _, recto_fp, verso_fp, dst_recto, dst_verso
+                    in imports]
+            total = len(futures)
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress is not None:
+                        progress(done, total)
+            except Exception as e:
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                self._remove_copied_files(
+                        dst
+                        for _, _, _, dst_recto, dst_verso in imports
+                        for dst in (dst_recto, dst_verso))
+                raise GameError(f'could not import cards: {e}')
+
+        return [
+                (card_name, dst_recto, dst_verso, *future.result())
+                for (card_name, _, _, dst_recto, dst_verso), future
+                in zip(imports, futures)]
+
+    def _remove_copied_files(self, paths: Iterable[Path]):
+        """remove img files copied for an import that failed, with their
+        thumbnails and the stored files that no game uses anymore
+
+        :paths: img files in the folder of a game
+
+        """
+        from pycards.images import remove_thumbnails
+        for path in paths:
+            path.unlink(missing_ok=True)
+            remove_thumbnails(path)
+        self._assets.collect()
+
+    def add_copied_cards(self, imports: list[tuple]):
+        """second step of import_cards_folder: put the copied cards in the
+        box, in one transaction. if another game was loaded since the copy,
+        the copied files are removed
+
+        :imports: returned by copy_cards_folder, for the current game
+
+        """
+        for _, dst_recto, _, _, _ in imports:
+            if dst_recto.parent != self._cards_folder:
+                self._remove_copied_files(
+                        dst
+                        for _, dst_recto, dst_verso, _, _ in imports
+                        for dst in (dst_recto, dst_verso))
+                raise GameError('the game was changed during the import')
+        with self.transaction('import_cards_folder'):
+            for card_name, dst_recto, dst_verso, recto, verso in imports:
+                self._add_imported_card(
+                        card_name,
+                        dst_recto,
+                        dst_verso,
+                        recto,
+                        verso,
+                        )
+
+    def build_thumbnails(
+            self,
+            progress: Callable[[int, int], None] | None = None,
+            ) -> int:
+        """make the missing or outdated thumbnails of all the cards, for
+        games imported before thumbnails existed or img files edited outside
+        of pycards. the missing sizes of the img files are also saved
+
+        :progress: called with (number of img files done, total) after
+        each one
+        :returns: number of img files whose thumbnails were made
+
+        """
+        from pycards.images import make_thumbnails, has_thumbnails
+        from pycards.images import get_image_size
+        with self.transaction('build_thumbnails'):
+            for cards in self._all_cards.values():
+                for card_name, card in cards.items():
+                    for side in (RECTO, VERSO):
+                        if card.get(f'{side}_size') is None:
+                            size = get_image_size(card[f'{side}_path'])
+                            if size is not None:
+                                self._touch_card(card_name)
+                                card[f'{side}_size'] = size
+        paths = [
+                Path(card[key])
+                for cards in self._all_cards.values()
+                for card in cards.values()
+                for key in ('recto_path', 'verso_path')]
+        paths = [path for path in paths if not has_thumbnails(path)]
+        total = len(paths)
+        with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as executor:
+            futures = [executor.submit(make_thumbnails, path)
+                       for path in paths]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if progress is not None:
+                    progress(done, total)
+        return total
 
     def get_card(self, card_name: str) -> Card:
         """get any card present in the game
@@ -426,8 +1327,8 @@ class Game(object):
         :returns:
 
         """
-        if self.draw_pile_cards:
-            obfuscated = self.draw_pile_cards[-1]
+        obfuscated = self._draw_pile.top()
+        if obfuscated is not None:
             card_name = self.get_real_card_name(obfuscated)
             card = self.get_card(card_name)
             return card
@@ -435,23 +1336,17 @@ class Game(object):
             return None
 
     def discover_card(self, card_name):
-        """move a card from box to the deck (also the img file)
+        """move a card from box to the deck. img files stay where they are
 
         :card_name:
 
         """
-        if card_name in self.box_card_names:
-            card = self._box.pop(card_name)
-            src = card['recto_path']
-            dst = self._deck_folder
-            new_recto_path = shutil.move(src, dst)
-            src = card['verso_path']
-            new_verso_path = shutil.move(src, dst)
-            card['recto_path'] = new_recto_path
-            card['verso_path'] = new_verso_path
-            card['pile'] = self._DISCARD_PILE
-            self._deck[card_name] = card
-            self._varbox.save()
+        if card_name in self._box:
+            with self.transaction('discover_card'):
+                self._touch_card(card_name)
+                card = self._pop_card(self._box, card_name)
+                self._insert_card(self._deck, card_name, card)
+                self._set_pile(card_name, self._DISCARD_PILE)
         else:
             raise GameError(f'card {card_name} is not present in the box')
 
@@ -465,10 +1360,11 @@ class Game(object):
         pile = self.get_card_pile(card_name)
         if not pile == self._PERMANENT_PILE:
             if not pile == self._IN_PLAY_PILE:
-                self._deck[card_name]['pile'] = self._IN_PLAY_PILE
-                if pile == self._DRAW_PILE:
-                    self._remove_from_draw(card_name)
-                self._varbox.save()
+                with self.transaction('play_card'):
+                    self._touch_card(card_name)
+                    self._set_pile(card_name, self._IN_PLAY_PILE)
+                    if pile == self._DRAW_PILE:
+                        self._remove_from_draw(card_name)
             else:
                 raise GameError('card is already in play')
         else:
@@ -481,8 +1377,8 @@ class Game(object):
         :returns:
 
         """
-        if self.draw_pile_cards:
-            obf = self.draw_pile_cards[-1]
+        obf = self._draw_pile.top()
+        if obf is not None:
             card_name = self.get_real_card_name(obf)
             self.play_card(card_name)
             return card_name
@@ -497,10 +1393,11 @@ class Game(object):
         """
         pile = self.get_card_pile(card_name)
         if not pile == self._PERMANENT_PILE:
-            self._deck[card_name]['pile'] = self._PERMANENT_PILE
-            if pile == self._DRAW_PILE:
-                self._remove_from_draw(card_name)
-            self._varbox.save()
+            with self.transaction('lock_card'):
+                self._touch_card(card_name)
+                self._set_pile(card_name, self._PERMANENT_PILE)
+                if pile == self._DRAW_PILE:
+                    self._remove_from_draw(card_name)
         else:
             raise GameError(
                     'card is already in permanent pile.')
@@ -515,8 +1412,9 @@ class Game(object):
 
         pile = self.get_card_pile(card_name)
         if pile == self._PERMANENT_PILE:
-            self._deck[card_name]['pile'] = self._DISCARD_PILE
-            self._varbox.save()
+            with self.transaction('unlock_card'):
+                self._touch_card(card_name)
+                self._set_pile(card_name, self._DISCARD_PILE)
         else:
             raise GameError(
                     'card is not in permanent pile.')
@@ -530,35 +1428,80 @@ class Game(object):
         pile = self.get_card_pile(card_name)
         if not pile == self._PERMANENT_PILE:
             if not pile == self._DISCARD_PILE:
-                self._deck[card_name]['pile'] = self._DISCARD_PILE
-                if pile == self._DRAW_PILE:
-                    self._remove_from_draw(card_name)
-                self._varbox.save()
+                with self.transaction('discard'):
+                    self._touch_card(card_name)
+                    self._set_pile(card_name, self._DISCARD_PILE)
+                    if pile == self._DRAW_PILE:
+                        self._remove_from_draw(card_name)
             else:
                 raise GameError('card is already discarded')
         else:
             raise GameError(
                     'permanent card cannot be discarded.')
 
-    def _get_obfuscated_name(self, card_name):
+    def _allocate_obfuscated_id(self) -> str:
+        """get a new obfuscated name from the counter
+
+        :returns: an unused obfuscated name
+
+        """
+        self._touch_obfuscated_id()
+        obfuscated = str(self._next_obfuscated_id)
+        self._next_obfuscated_id += 1
+        # only a marked card with a number as name can take an id
+        while obfuscated in self._draw_cards_real_name:
+            obfuscated = str(self._next_obfuscated_id)
+            self._next_obfuscated_id += 1
+        return obfuscated
+
+    def compact_obfuscated_names(self):
+        """renumber the obfuscated names and the positions of the draw pile
+        from the bottom to the top and restart the counter after them. ids
+        then follow the positions in the pile and tell nothing about the
+        cards
+
         """
+        with self.transaction('compact_obfuscated_names'):
+            self._touch_obfuscated_id()
+            real_names = dict(self._draw_cards_real_name)
+            self._draw_cards_real_name.clear()
+            self._draw_cards_obfuscate_name.clear()
+            self._next_obfuscated_id = 0
+            draw_pile = self._draw_pile.to_list()
+            # marked cards keep their name. ids must not collide with them
+            for obfuscated in draw_pile:
+                if real_names[obfuscated] == obfuscated:
+                    self._draw_cards_real_name[obfuscated] = obfuscated
+            new_draw_pile = list()
+            for position, obfuscated in enumerate(draw_pile):
+                card_name = real_names[obfuscated]
+                if obfuscated != card_name:
+                    obfuscated = self._allocate_obfuscated_id()
+                self._draw_cards_real_name[obfuscated] = card_name
+                self._draw_cards_obfuscate_name[card_name] = obfuscated
+                new_draw_pile.append(obfuscated)
+                self._touch_card(card_name)
+                card = self._deck[card_name]
+                card[self._DRAW_POSITION] = position
+                card[self._DRAW_NAME] = obfuscated
+            self._draw_pile = DrawPile(new_draw_pile)
+
+    def _get_obfuscated_name(self, card_name):
+        """get the name of a card inside the draw pile. a new one is
+        allocated if the card is not yet in it
 
-        :card_name: TODO
-        :returns: TODO
+        :card_name: real name
+        :returns: obfuscated name (real name if the card is always visible)
 
         """
         if card_name not in self._draw_cards_obfuscate_name:
             card = self._deck.get(card_name)
             if not card.get(self._ALWAYS_VISIBLE):
-                obfuscated = len(self._draw_cards_obfuscate_name)
-                while str(obfuscated) in self._draw_cards_real_name:
-                    obfuscated += 1
-                obfuscated = str(obfuscated)
+                obfuscated = self._allocate_obfuscated_id()
             else:
                 obfuscated = card_name
             self._draw_cards_real_name[obfuscated] = card_name
             self._draw_cards_obfuscate_name[card_name] = obfuscated
-            self._varbox.save()
         else:
             obfuscated = self._draw_cards_obfuscate_name[card_name]
         return obfuscated
@@ -575,7 +1518,9 @@ class Game(object):
         if cards:
             card = cards.get(card_name)
             if not card.get(self._ALWAYS_VISIBLE):
-                card[self._ALWAYS_VISIBLE] = True
+                with self.transaction('set_always_visible'):
+                    self._touch_card(card_name)
+                    card[self._ALWAYS_VISIBLE] = True
             else:
                 raise GameError('card is already always visible')
         else:
@@ -592,7 +1537,9 @@ class Game(object):
         if cards:
             card = cards.get(card_name)
             if card.get(self._ALWAYS_VISIBLE):
-                card[self._ALWAYS_VISIBLE] = False
+                with self.transaction('remove_always_visible'):
+                    self._touch_card(card_name)
+                    card[self._ALWAYS_VISIBLE] = False
             else:
                 raise GameError('card is already not always visible')
         else:
@@ -613,7 +1560,8 @@ class Game(object):
             raise GameError('card not found')
 
     def _remove_from_draw(self, card_name):
-        """ to be called when card is removed from draw pile
+        """ to be called when card is removed from draw pile. the card must
+        be touched before
 
         :card_name:
         :returns:
@@ -623,7 +1571,40 @@ class Game(object):
         self._draw_cards_obfuscate_name.pop(card_name)
         self._draw_cards_real_name.pop(obfuscated)
         self._draw_pile.remove(obfuscated)
-        self._varbox.save()
+        # not in the deck anymore when the card is destroyed
+        card = self._deck.get(card_name, dict())
+        card.pop(self._DRAW_POSITION, None)
+        card.pop(self._DRAW_NAME, None)
+        if not self._draw_pile:
+            self._touch_obfuscated_id()
+            self._next_obfuscated_id = 0
+
+    def _push_in_draw(self, card_name: str, top: bool = True):
+        """put a card of the deck on top or at the bottom of the draw pile.
+        the card must be touched before. its position is next to the card
+        that was on top or at the bottom, so that no other card changes
+
+        :card_name: identify card
+        :top: put card on top of the pile. bottom if false
+
+        """
+        obfuscated = self._get_obfuscated_name(card_name)
+        card = self._deck[card_name]
+        if top:
+            end, step = self._draw_pile.top(), 1
+        else:
+            end, step = self._draw_pile.bottom(), -1
+        if end is None:
+            position = 0
+        else:
+            end_card = self._deck[self._draw_cards_real_name[end]]
+            position = end_card[self._DRAW_POSITION] + step
+        if top:
+            self._draw_pile.push_top(obfuscated)
+        else:
+            self._draw_pile.push_bottom(obfuscated)
+        card[self._DRAW_POSITION] = position
+        card[self._DRAW_NAME] = obfuscated
 
     def put_card_in_draw_pile(self, card_name, top=True):
         """move card in the draw pile
@@ -634,13 +1615,10 @@ class Game(object):
         """
         pile = self.get_card_pile(card_name)
         if not pile == self._PERMANENT_PILE:
-            self._deck[card_name]['pile'] = self._DRAW_PILE
-            obfuscated = self._get_obfuscated_name(card_name)
-            if top:
-                self._draw_pile.append(obfuscated)
-            else:
-                self._draw_pile.insert(0, obfuscated)
-            self._varbox.save()
+            with self.transaction('put_card_in_draw_pile'):
+                self._touch_card(card_name)
+                self._set_pile(card_name, self._DRAW_PILE)
+                self._push_in_draw(card_name, top)
         else:
             raise GameError(
                     'permanent card cannot be in draw pile.')
@@ -649,45 +1627,86 @@ class Game(object):
         """shuffle cards in the draw pile
 
         """
-        random.shuffle(self._draw_pile)
+        with self.transaction('shuffle_draw_pile'):
+            self._draw_pile.shuffle()
+            self.compact_obfuscated_names()
+            self._emit(PILE_SHUFFLED, pile=self._DRAW_PILE)
+
+    def move_cards(
+            self,
+            card_names: Iterable[str],
+            pile: Literal['draw', 'discard', 'permanent', 'in_play'],
+            top: bool = True,
+            ) -> tuple[str]:
+        """move several cards of the deck to a pile at once. either all cards
+        are moved, or none of them if a GameError is raised
+
+        :card_names: identify the cards
+        :pile: destination
+        :top: for the draw pile, put the cards on top. bottom if false
+        :returns: names of the cards that changed pile (or position in the
+        draw pile)
 
-    def discard_all_cards_in_play(self):
         """
+        if pile not in self._piles:
+            raise GameError(f'unknown pile: {pile}')
+        moved = list()
+        with self.transaction('move_cards'):
+            for card_name in tuple(card_names):
+                old_pile = self.get_card_pile(card_name)
+                if old_pile == pile and pile != self._DRAW_PILE:
+                    continue
+                if old_pile == self._PERMANENT_PILE:
+                    raise GameError(
+                            'permanent card cannot be moved. '
+                            'make it first non permanent')
+                self._touch_card(card_name)
+                if old_pile == self._DRAW_PILE and pile != self._DRAW_PILE:
+                    self._remove_from_draw(card_name)
+                self._set_pile(card_name, pile)
+                if pile == self._DRAW_PILE:
+                    self._push_in_draw(card_name, top)
+                moved.append(card_name)
+        return tuple(moved)
+
+    def discard_all_cards_in_play(self) -> tuple[str]:
+        """put all the cards in play in the discard pile at once
+        :returns: names of the discarded cards
 
         """
-        for card_name in self.in_play_cards:
-            self.discard(card_name)
+        in_play = self._piles[self._IN_PLAY_PILE]
+        return self.move_cards(in_play, self._DISCARD_PILE)
 
     def shuffle_back_all_discarded(self):
-        """put all card from discarded pile into draw pile and shuffle
-        :returns: TODO
+        """put all card from discarded pile into draw pile and shuffle. all
+        cards are moved in one pass and the pile is shuffled once
+        :returns: names of the cards that were moved
 
         """
-        for card_name in self.discarded_cards:
-            self.put_card_in_draw_pile(card_name)
-        self.shuffle_draw_pile()
+        with self.transaction('shuffle_back_all_discarded'):
+            discarded = self._piles[self._DISCARD_PILE]
+            moved = self.move_cards(discarded, self._DRAW_PILE)
+            self._draw_pile.shuffle()
+            self.compact_obfuscated_names()
+            self._emit(PILE_SHUFFLED, pile=self._DRAW_PILE)
+        return moved
 
     def forget_card(self, card_name):
-        """move a card from deck to box
+        """move a card from deck to box. img files stay where they are
 
         :card_name:
 
         """
-        if card_name in self.deck_card_names:
-            pile = self.get_card_pile(card_name)
-            if pile == self._DRAW_PILE:
-                self._remove_from_draw(card_name)
-            card = self._deck.pop(card_name)
-            src = card['recto_path']
-            dst = self._box_folder
-            new_recto_path = shutil.move(src, dst)
-            src = card['verso_path']
-            new_verso_path = shutil.move(src, dst)
-            card['recto_path'] = new_recto_path
-            card['verso_path'] = new_verso_path
-            card['orientation'] = 0
-            self._box[card_name] = card
-            self._varbox.save()
+        if card_name in self._deck:
+            with self.transaction('forget_card'):
+                pile = self.get_card_pile(card_name)
+                self._touch_card(card_name)
+                if pile == self._DRAW_PILE:
+                    self._remove_from_draw(card_name)
+                self._set_pile(card_name, None)
+                card = self._pop_card(self._deck, card_name)
+                card['orientation'] = 0
+                self._insert_card(self._box, card_name, card)
         else:
             raise GameError(f'card {card_name} is not present in the deck')
 
@@ -697,20 +1716,95 @@ class Game(object):
         :card_name:
 
         """
+        from pycards.images import remove_thumbnails
         cards = self._check_card_in_game(card_name)
         if cards:
-            card = cards.pop(card_name)
-            pile = card.get('pile')
-            if pile == self._DRAW_PILE:
-                self._remove_from_draw(card_name)
-            path = card['recto_path']
-            Path(path).unlink()
-            path = card['verso_path']
-            Path(path).unlink()
-            self._varbox.save()
+            with self.transaction('destroy_card'):
+                self._touch_card(card_name)
+                if cards is self._deck:
+                    self._set_pile(card_name, None)
+                card = self._pop_card(cards, card_name)
+                pile = card.get('pile')
+                if pile == self._DRAW_PILE:
+                    self._remove_from_draw(card_name)
+                self._assets.remove(
+                        card['recto_path'], card.get('recto_asset'))
+                self._assets.remove(
+                        card['verso_path'], card.get('verso_asset'))
+                remove_thumbnails(card['recto_path'])
+                remove_thumbnails(card['verso_path'])
+                for overlay in card.get('overlays', dict()).values():
+                    for edit in overlay['edits']:
+                        self._remove_edit_files(edit)
         else:
             raise GameError('card is neither in deck, nor in box')
 
+    def _get_overlay(self, card_name: str) -> tuple[str, dict]:
+        """edits of the visible side of a card, created if missing. the card
+        must be touched before
+
+        :card_name: identify the card
+        :returns: side and its edits
+
+        """
+        cards = self._check_card_in_game(card_name)
+        if not cards:
+            raise GameError('card not found')
+        card = cards[card_name]
+        side = _get_side(card['orientation'])
+        overlays = card.setdefault('overlays', dict())
+        return side, overlays.setdefault(side, dict(version=0, edits=list()))
+
+    def _remove_edit_files(self, edit: list[dict]):
+        """remove the sticker files used by an edit"""
+        for op in edit:
+            if op['type'] == STICKER_OP:
+                self._assets.remove(op['path'], op.get('asset'))
+
+    def edit_card(self, card_name: str, ops: list[dict]):
+        """add an edit over the visible side of a card. the img file is not
+        modified, the edit is drawn when the card is shown. the sticker files
+        are copied, so that the stickers can be removed from the game
+
+        :card_name: identify the card
+        :ops: edit operations (see pycards.editing)
+
+        """
+        for op in ops:
+            if op.get('type') not in OP_TYPES:
+                raise GameError(f'unknown edit operation: {op.get("type")}')
+        with self.transaction('edit_card'):
+            self._touch_card(card_name)
+            side, overlay = self._get_overlay(card_name)
+            version = overlay['version'] + 1
+            edit = list()
+            for i, op in enumerate(ops):
+                op = dict(op)
+                if op['type'] == STICKER_OP:
+                    src = Path(op['path'])
+                    dst = self._overlays_folder / (
+                            f'{card_name}_{side}_{version}_{i}{src.suffix}')
+                    op['asset'] = self._assets.import_file(src, dst)
+                    op['path'] = dst.as_posix()
+                edit.append(op)
+            overlay['edits'].append(edit)
+            overlay['version'] = version
+
+    def undo_card_edit(self, card_name: str):
+        """remove the last edit of the visible side of a card
+
+        :card_name: identify the card
+
+        """
+        with self.transaction('undo_card_edit'):
+            self._touch_card(card_name)
+            _, overlay = self._get_overlay(card_name)
+            if not overlay['edits']:
+                raise GameError('this side of the card has no edit')
+            edit = overlay['edits'].pop()
+            overlay['version'] += 1
+            self._remove_edit_files(edit)
+
     def rotate_card(self, card_name):
         """rotate card  by 180 deg(progress)
 
@@ -720,11 +1814,12 @@ class Game(object):
         cards = self._check_card_in_game(card_name)
         if not cards:
             raise GameError('card not found')
-        card_dict: dict = cards[card_name]
-        orientation = card_dict['orientation']
-        new_orientation = 2 * (orientation // 2) + (orientation + 1) % 2
-        card_dict['orientation'] = new_orientation
-        self._varbox.save()
+        with self.transaction('rotate_card'):
+            self._touch_card(card_name)
+            card_dict: dict = cards[card_name]
+            orientation = card_dict['orientation']
+            new_orientation = 2 * (orientation // 2) + (orientation + 1) % 2
+            card_dict['orientation'] = new_orientation
 
     def flip_card(self, card_name):
         """flip recto-verso the card
@@ -735,11 +1830,12 @@ class Game(object):
         cards = self._check_card_in_game(card_name)
         if not cards:
             raise GameError('card not found')
-        card_dict: dict = cards[card_name]
-        orientation = card_dict['orientation']
-        new_orientation = 3 - orientation
-        card_dict['orientation'] = new_orientation
-        self._varbox.save()
+        with self.transaction('flip_card'):
+            self._touch_card(card_name)
+            card_dict: dict = cards[card_name]
+            orientation = card_dict['orientation']
+            new_orientation = 3 - orientation
+            card_dict['orientation'] = new_orientation
 
 
 if __name__ == '__main__':
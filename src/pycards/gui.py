@@ -1,16 +1,26 @@
+import queue
+import threading
 import tkinter
 from tkinter import simpledialog, filedialog, messagebox
 from tkinter import ttk
-from typing import Literal
+from typing import Literal, Callable, Sequence
 from pathlib import Path
-from io import BytesIO
 
 
-from PIL import Image, ImageTk, ImageFile
+from PIL import Image, ImageTk
+
+
+from pycards.images import thumbnail_cache
+from pycards.images import ImageDecoder, get_fitted_size, fit_size
+from pycards.layout import OccupancyGrid
+from pycards.search import PrefixIndex
+from pycards.editing import Overlay, line_op, sticker_op
 
 
 from pycards.interfaces import GUI, BaseTable, BaseCard
 from pycards.interfaces import IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME
+from pycards.interfaces import BOX_PILE_NAME, DRAW_PILE_NAME
+from pycards.interfaces import DISCARD_PILE_NAME
 
 
 class GUIError(Exception):
@@ -29,20 +39,26 @@ class EditorWindow(simpledialog.Dialog):
             rotated: bool,
             max_width: int,
             max_height: int,
+            overlay: Overlay | None = None,
             ):
         """
 
         :img_path: TODO
         :rotated: TODO
+        :overlay: edits already made, drawn on the preview
 
         """
         self._max_canvas_width = max_width
         self._max_canvas_height = max_height
         self._img_path = Path(img_path)
         self._rotated = rotated
+        self._overlay = overlay
         self._card_name = card_name
         self._save_img = False
         self._used_stickers = dict()
+        self._sticker_windows = dict()
+        # edits in coordinates of the img file, the canvas is a preview
+        self._ops: list[dict] = list()
 
         self._gui = parent
 
@@ -53,10 +69,12 @@ class EditorWindow(simpledialog.Dialog):
         frame = ttk.Labelframe(master, text=self._card_name)
         frame.pack()
 
-        img: ImageFile.ImageFile = Image.open(self._img_path)
+        self._img_size = get_fitted_size(self._img_path)
+        maxsize = (self._max_canvas_width, self._max_canvas_height)
+        img = thumbnail_cache.get(
+                self._img_path, maxsize, self._rotated, self._overlay)
         width, height = img.width, img.height
-        if self._rotated:
-            img = img.rotate(180)
+        self._scale = self._img_size[0] / width
         self._img = ImageTk.PhotoImage(img)
         canvas = tkinter.Canvas(
                 frame,
@@ -110,13 +128,17 @@ class EditorWindow(simpledialog.Dialog):
                 self._stickers_list.set('')
 
             img_path = self._stickers[sticker_name]
-            img: ImageFile.ImageFile = Image.open(img_path)
+            # shown at the scale of the preview
+            width, height = get_fitted_size(img_path)
+            maxsize = (width / self._scale, height / self._scale)
+            img = thumbnail_cache.get(img_path, maxsize)
             self._used_stickers[sticker_name] = ImageTk.PhotoImage(img)
             window_id = canvas.create_image(
                     (0, 0),
                     anchor=tkinter.NW,
                     image=self._used_stickers[sticker_name],
                     )
+            self._sticker_windows[sticker_name] = window_id
             canvas.tag_bind(
                     window_id,
                     "<ButtonPress-1>",
@@ -140,23 +162,31 @@ class EditorWindow(simpledialog.Dialog):
         y = self._coords0[1] + dy
         self._canvas.moveto(window_id, x=x, y=y)
 
+    def _to_img_coords(self, x: float, y: float) -> tuple[float, float]:
+        """position in the img file of a point of the canvas"""
+        x, y = x * self._scale, y * self._scale
+        if self._rotated:
+            width, height = self._img_size
+            x, y = width - x, height - y
+        return x, y
+
     def apply(self):
         canvas = self._canvas
-        path = self._img_path
-        width = self._img.width()
-        height = self._img.height()
-        eps = canvas.postscript(
-                colormode='color',
-                width=width,
-                height=height,
-                pagewidth=width,
-                pageheight=height,
-                )
-        img = Image.open(BytesIO(bytes(eps, 'ascii')))
-        img.save(path)
-        table: BaseTable = self._gui.table
-        for sticker_name in self._used_stickers:
-            table.delete_stickers(sticker_name)
+        ops = list(self._ops)
+        for sticker_name, window_id in self._sticker_windows.items():
+            x, y = canvas.coords(window_id)
+            img = self._used_stickers[sticker_name]
+            x1, y1 = self._to_img_coords(x, y)
+            x2, y2 = self._to_img_coords(x + img.width(), y + img.height())
+            box = [min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)]
+            ops.append(sticker_op(
+                self._stickers[sticker_name], box, self._rotated))
+        if ops:
+            self._gui.table.edit_card(
+                    self._card_name,
+                    ops,
+                    list(self._sticker_windows),
+                    )
 
     def _save_position(self, event):
         self._lastx, self._lasty = event.x, event.y
@@ -168,6 +198,8 @@ class EditorWindow(simpledialog.Dialog):
         y1 = self._lasty
         y2 = event.y
         canvas.create_line((x1, y1, x2, y2))
+        points = self._to_img_coords(x1, y1) + self._to_img_coords(x2, y2)
+        self._ops.append(line_op(points, max(1, round(self._scale))))
         self._save_position(event)
 
 
@@ -196,6 +228,167 @@ class LoadPrompt(simpledialog.Dialog):
         self.game_name = self._save_games_list.get()
 
 
+class CardList(ttk.Frame):
+
+    """list of card names with a search entry. the list can be long: only
+    the visible rows are put in the listbox, and they are rewritten when the
+    list is scrolled or filtered"""
+
+    _ROWS = 6
+
+    def __init__(
+            self,
+            master,
+            on_select: Callable[[str], None] | None = None,
+            rows: int = _ROWS,
+            ):
+        """
+
+        :master: parent widget
+        :on_select: called with the name of a card when it is selected
+        :rows: number of visible rows
+
+        """
+        super().__init__(master)
+        self._on_select = on_select
+        self._rows = rows
+        self._index = PrefixIndex()
+        self._filtered: Sequence[str] = ()
+        self._first = 0
+        self._selected = ''
+
+        self._search = tkinter.StringVar(self)
+        self._search.trace_add('write', lambda *args: self._filter())
+        entry = ttk.Entry(self, textvariable=self._search)
+        entry.grid(column=0, row=0, columnspan=2, sticky=tkinter.EW)
+        entry.bind('<Return>', self._select_first)
+        self._listbox = tkinter.Listbox(
+                self,
+                height=rows,
+                exportselection=False,
+                activestyle=tkinter.NONE,
+                )
+        self._listbox.grid(column=0, row=1, sticky=tkinter.EW)
+        self._scrollbar = ttk.Scrollbar(
+                self,
+                orient=tkinter.VERTICAL,
+                command=self._on_scrollbar,
+                )
+        self._scrollbar.grid(column=1, row=1, sticky=tkinter.NS)
+        self.columnconfigure(0, weight=1)
+        self._listbox.bind('<<ListboxSelect>>', self._on_listbox_select)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self._listbox.bind(sequence, self._on_wheel)
+
+    def get(self) -> str:
+        """name of the selected card, empty if none"""
+        return self._selected
+
+    def set_items(self, card_names: Sequence[str]):
+        """replace the list of names. the selection is cleared, the search
+        is kept
+
+        :card_names: in the order they are shown
+
+        """
+        self._index = PrefixIndex(card_names)
+        self._selected = ''
+        self._filter()
+
+    def update_items(
+            self,
+            removed: Sequence[str],
+            added: Sequence[tuple[int, str]],
+            ):
+        """delete and insert some names instead of replacing the whole list.
+        the search and the scroll position are kept
+
+        :removed: names to delete
+        :added: (position, name) to insert once the others are deleted, by
+        increasing position
+
+        """
+        for card_name in removed:
+            self._index.remove(card_name)
+        for position, card_name in added:
+            self._index.insert(position, card_name)
+        if self._selected in removed:
+            self._selected = ''
+        self._find()
+        last_first = max(0, len(self._filtered) - self._rows)
+        self._first = min(self._first, last_first)
+        self._render()
+
+    def _find(self):
+        """names matching the search. without search, the index itself is
+        shown, so that it is not copied"""
+        prefix = self._search.get()
+        if prefix:
+            self._filtered = self._index.search(prefix)
+        else:
+            self._filtered = self._index
+
+    def _filter(self):
+        self._find()
+        self._first = 0
+        self._render()
+
+    def _scroll_to(self, first: int):
+        last_first = max(0, len(self._filtered) - self._rows)
+        first = min(max(0, first), last_first)
+        if first != self._first:
+            self._first = first
+            self._render()
+
+    def _render(self):
+        """write the visible rows in the listbox"""
+        visible = self._filtered[self._first:self._first + self._rows]
+        listbox = self._listbox
+        listbox.delete(0, tkinter.END)
+        if visible:
+            listbox.insert(0, *visible)
+        if self._selected in visible:
+            listbox.selection_set(visible.index(self._selected))
+        total = len(self._filtered)
+        if total:
+            self._scrollbar.set(
+                    self._first / total,
+                    (self._first + len(visible)) / total,
+                    )
+        else:
+            self._scrollbar.set(0, 1)
+
+    def _on_scrollbar(self, action: str, value: str, unit: str = None):
+        if action == tkinter.MOVETO:
+            self._scroll_to(round(float(value) * len(self._filtered)))
+        elif action == tkinter.SCROLL:
+            step = self._rows if unit == tkinter.PAGES else 1
+            self._scroll_to(self._first + int(value) * step)
+
+    def _on_wheel(self, event: tkinter.Event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self._first - 1)
+        else:
+            self._scroll_to(self._first + 1)
+        return 'break'
+
+    def _on_listbox_select(self, event: tkinter.Event):
+        selection = self._listbox.curselection()
+        if selection:
+            self._select(self._filtered[self._first + selection[0]])
+
+    def _select_first(self, event: tkinter.Event):
+        if self._filtered:
+            self._select(self._filtered[0])
+            self._scroll_to(0)
+            self._render()
+
+    def _select(self, card_name: str):
+        self._selected = card_name
+        if self._on_select is not None:
+            self._on_select(card_name)
+
+
 class TkinterGUI(GUI, tkinter.Tk):
 
     """tkinter GUI for a pycards game"""
@@ -214,6 +407,11 @@ class TkinterGUI(GUI, tkinter.Tk):
     _PILE_KEY = 'pile'
     _WINDOW_ID_KEY = 'window_id'
     _EXTENDED_HEIGHT = 3  # for scroll region
+    _DECODER_POLL_MS = 20
+    _SCHEDULE_POLL_MS = 50
+    _TABLE_TARGET = 'table'
+    _INSPECTOR_TARGET = 'inspector'
+    _TOPCARD_TARGET = 'top_card'
 
     @property
     def table(self) -> BaseTable:
@@ -231,6 +429,14 @@ class TkinterGUI(GUI, tkinter.Tk):
         self._inspected_card = tkinter.StringVar(self)
         self._inspected_card.set(None)
         self._cards_on_table: dict[str, dict] = dict()
+        self._progress_window: tkinter.Toplevel | None = None
+        self._decoder = ImageDecoder()
+        self._polling_decoder = False
+        # callbacks scheduled from other threads, tk is only called from
+        # its own thread
+        self._scheduled: queue.SimpleQueue = queue.SimpleQueue()
+        self._placeholders: dict[tuple[int, int], tkinter.PhotoImage] = dict()
+        self._grids: dict[str, OccupancyGrid]
         self._gamezone_frame: tkinter.Frame
         self._permanent_frame: tkinter.Frame
         self._cardlist_frame: tkinter.Frame
@@ -247,6 +453,13 @@ class TkinterGUI(GUI, tkinter.Tk):
         self._gamezone_width = self._width * self._TABLE_WIDTH
         self._inspector_height = self._height * self._INSPECTOR_HEIGHT
         self._inspector_width = self._width * (1-self._TABLE_WIDTH)
+        card_width = self._gamezone_width / self._NCARDS_PER_TABLE
+        self._grids = {
+                IN_PLAY_PILE_NAME: OccupancyGrid(
+                    card_width, self._gamezone_height),
+                PERMANENT_PILE_NAME: OccupancyGrid(
+                    card_width, self._height - self._gamezone_height),
+                }
 
         self._left_pannel = ttk.Frame(self)
         self._right_pannel = ttk.Frame(self)
@@ -392,10 +605,7 @@ class TkinterGUI(GUI, tkinter.Tk):
                 text='box cards',
                 )
         box_cards_frame.pack(fill=tkinter.X)
-        self._boxcards_list = ttk.Combobox(
-                box_cards_frame,
-                state='readonly'
-                )
+        self._boxcards_list = CardList(box_cards_frame)
         self._boxcards_list.pack(
                 side=tkinter.LEFT,
                 fill=tkinter.X,
@@ -413,10 +623,7 @@ class TkinterGUI(GUI, tkinter.Tk):
                 text='draw pile',
                 )
         drawpile_frame.pack(fill=tkinter.X)
-        self._drawpile = ttk.Combobox(
-                drawpile_frame,
-                state='readonly',
-                )
+        self._drawpile = CardList(drawpile_frame)
         self._drawpile.grid(
                 column=0,
                 row=0,
@@ -443,14 +650,10 @@ class TkinterGUI(GUI, tkinter.Tk):
                 text='discard pile',
                 )
         discardpile_frame.pack(fill=tkinter.X)
-        self._discardpile = ttk.Combobox(
+        self._discardpile = CardList(
                 discardpile_frame,
-                state='readonly',
-                )
-        self._discardpile.bind(
-                '<<ComboboxSelected>>',
-                lambda event: self._table.inspect_card(
-                    self._discardpile.get()),
+                on_select=lambda card_name: self._table.inspect_card(
+                    card_name),
                 )
         self._discardpile.pack(fill=tkinter.X)
 
@@ -540,12 +743,19 @@ class TkinterGUI(GUI, tkinter.Tk):
                 command=lambda: self._table.prompt_editor(
                     self._inspected_card.get()),
                 ).grid(row=2, column=2)
+        ttk.Button(
+                buttons_frame,
+                text='undo edit',
+                command=lambda: self._table.undo_card_edit(
+                    self._inspected_card.get()),
+                ).grid(row=2, column=3)
 
     def prompt_editor(
             self,
             card_name: str,
             img_path: str,
-            rotated: bool,):
+            rotated: bool,
+            overlay: Overlay | None = None,):
         max_width = self.winfo_screenwidth() // 2
         max_height = self.winfo_screenheight() // 2
         EditorWindow(
@@ -554,68 +764,8 @@ class TkinterGUI(GUI, tkinter.Tk):
                 img_path,
                 rotated,
                 max_width,
-                max_height,)
-        self._table.inspect_card(card_name)
-        if self.is_card_on_table(card_name):
-            self.update_card_image(card_name, img_path, rotated)
-
-    def _create_gamezone_frame(self):
-        """ prepare zone where cards will be in play
-
-        """
-        self._gamezone_frame = ttk.LabelFrame(
-                self._right_pannel,
-                text='game zone')
-        canvas = tkinter.Canvas(
-                self._gamezone_frame,
-                bg='green',
-                height=self._gamezone_height,
-                width=self._gamezone_width,
-                scrollregion=(
-                    0,
-                    0,
-                    self._gamezone_width,
-                    self._EXTENDED_HEIGHT * self._gamezone_height),
-                )
-        vbar = ttk.Scrollbar(self._gamezone_frame, orient=tkinter.VERTICAL)
-        vbar.pack(side=tkinter.RIGHT, fill=tkinter.Y)
-        vbar.config(command=canvas.yview)
-        canvas.config(yscrollcommand=vbar.set)
-        canvas.pack(side=tkinter.LEFT)
-        self._canvas_gamezone = canvas
-
-    def _create_permanent_frame(self):
-        """prepare canvas where permanent cards are put
-
-        """
-        self._permanent_frame = ttk.LabelFrame(
-                self._right_pannel,
-                text='permanent cards')
-        width = self._gamezone_width
-        height = self._height - self._gamezone_height
-        canvas = tkinter.Canvas(
-                self._permanent_frame,
-                bg='blue',
-                height=height,
-                width=width,
-                scrollregion=(
-                    0,
-                    0,
-                    width,
-                    self._EXTENDED_HEIGHT * height),
-                )
-        vbar = ttk.Scrollbar(self._permanent_frame, orient=tkinter.VERTICAL)
-        vbar.pack(side=tkinter.RIGHT, fill=tkinter.Y)
-        vbar.config(command=canvas.yview)
-        canvas.config(yscrollcommand=vbar.set)
-        canvas.pack(side=tkinter.LEFT)
-        self._canvas_permanent = canvas
-
-    def showerror(self, msg: str):
-        tkinter.messagebox.showerror(
-                title='error',
-                message=msg,
-                )
+                max_height,
+                overlay,)
 
     def showinfo(self, msg: str):
         tkinter.messagebox.showinfo(
@@ -624,7 +774,91 @@ class TkinterGUI(GUI, tkinter.Tk):
                 )
 
     def run(self):
+        self.after(self._SCHEDULE_POLL_MS, self._poll_scheduled)
         self.mainloop()
+        self._decoder.shutdown()
+
+    def _load_image(
+            self,
+            target,
+            callback,
+            img_path: str,
+            maxsize: tuple[float, float] | None,
+            rotated: bool,
+            overlay: Overlay | None = None,
+            ):
+        """show an image decoded in the background. callback is called
+        with it now if it was already decoded, else later from the tk loop
+
+        :target: where the image is shown, a newer load of the same target
+        replaces this one
+
+        """
+        img = self._decoder.request(
+                target, callback, img_path, maxsize, rotated, overlay)
+        if img is not None:
+            callback(img)
+        elif not self._polling_decoder:
+            self._polling_decoder = True
+            self.after(self._DECODER_POLL_MS, self._poll_decoder)
+
+    def _poll_decoder(self):
+        self._decoder.poll()
+        if self._decoder.pending:
+            self.after(self._DECODER_POLL_MS, self._poll_decoder)
+        else:
+            self._polling_decoder = False
+
+    def _get_placeholder(self, width: int, height: int) -> tkinter.PhotoImage:
+        """blank image shown while a card is decoded"""
+        size = (width, height)
+        if size not in self._placeholders:
+            self._placeholders[size] = tkinter.PhotoImage(
+                    width=width, height=height)
+        return self._placeholders[size]
+
+    def _set_table_card_image(self, card_name: str, img: Image.Image):
+        card = self._cards_on_table.get(card_name)
+        if card:
+            card[self._IMG_KEY] = ImageTk.PhotoImage(img)
+            card[self._IMG_LABEL_KEY].configure(image=card[self._IMG_KEY])
+
+    def schedule(self, callback):
+        if threading.current_thread() is threading.main_thread():
+            self.after_idle(callback)
+        else:
+            self._scheduled.put(callback)
+
+    def _poll_scheduled(self):
+        while True:
+            try:
+                callback = self._scheduled.get_nowait()
+            except queue.Empty:
+                break
+            callback()
+        self.after(self._SCHEDULE_POLL_MS, self._poll_scheduled)
+
+    def show_progress(self, done: int, total: int):
+        if done >= total:
+            if self._progress_window is not None:
+                self._progress_window.destroy()
+                self._progress_window = None
+            return
+        if self._progress_window is None:
+            window = tkinter.Toplevel(self)
+            window.title('pycards')
+            window.transient(self)
+            ttk.Label(window, text='importing...').pack()
+            self._progress_bar = ttk.Progressbar(
+                    window,
+                    length=self._inspector_width,
+                    mode='determinate',
+                    )
+            self._progress_bar.pack()
+            self._progress_window = window
+        self._progress_bar['maximum'] = total
+        self._progress_bar['value'] = done
+        self._progress_window.update_idletasks()
 
     def place_card_on_table(
             self,
@@ -632,7 +866,9 @@ class TkinterGUI(GUI, tkinter.Tk):
             img_path: str,
             pile: Literal[
                 IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME] = IN_PLAY_PILE_NAME,
-            rotated: bool = False):
+            rotated: bool = False,
+            overlay: Overlay | None = None,
+            size: tuple[int, int] | None = None):
 
         current_pile = self.is_card_on_table(card_name)
         if current_pile:
@@ -656,15 +892,15 @@ class TkinterGUI(GUI, tkinter.Tk):
             raise GUIError('pile arg not known')
 
         maxsize = (card_width, card_height)
-        img: ImageFile.ImageFile = Image.open(img_path)
-        img.thumbnail(maxsize)
-        if rotated:
-            img = img.rotate(180)
-        placed_card[self._IMG_KEY] = ImageTk.PhotoImage(img)
-        card_width = img.width
-        card_height = img.height
+        if size is None:
+            size = get_fitted_size(img_path)
+        # the image is decoded later, a placeholder keeps its place
+        card_width, card_height = fit_size(size, maxsize)
+        placed_card[self._IMG_KEY] = self._get_placeholder(
+                card_width, card_height)
 
-        x, y = self._find_free_space(card_width, card_height, canvas)
+        x, y = self._find_free_space(card_width, card_height, pile)
+        self._grids[pile].add(card_name, x, y, card_width, card_height)
 
         placed_card[self._PILE_KEY] = pile
 
@@ -686,36 +922,25 @@ class TkinterGUI(GUI, tkinter.Tk):
         label.bind(
                 "<B1-Motion>",
                 lambda e: self._on_card_drop(e, card_name))
-
-    def _is_overlapping(
-            self,
-            canvas: tkinter.Canvas,
-            x: int,
-            y: int,
-            width: int,
-            height: int,
-            tolerance: int = 5) -> bool:
-        """check if there is already a card in this area of the table
-        assuming x and y are at NW
-
-        """
-        x1 = x + tolerance
-        x2 = x1 + width - tolerance
-        y1 = y + tolerance
-        y2 = y + height - tolerance
-        overlapping = canvas.find_overlapping(x1, y1, x2, y2)
-        return bool(overlapping)
+        self._load_image(
+                (self._TABLE_TARGET, card_name),
+                lambda img: self._set_table_card_image(card_name, img),
+                img_path,
+                maxsize,
+                rotated,
+                overlay,
+                )
 
     def _find_free_space(
             self,
             card_width,
             card_height,
-            canvas: tkinter.Canvas,
+            pile: Literal[IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME],
             ) -> tuple[int, int]:
         """find a position where the table is free of other cards
 
         """
-        if canvas == self._canvas_gamezone:
+        if pile == IN_PLAY_PILE_NAME:
             height = self._gamezone_height * self._EXTENDED_HEIGHT
         else:
             height = (
@@ -724,22 +949,12 @@ class TkinterGUI(GUI, tkinter.Tk):
         max_rows = int(height // card_height + 1)
         max_columns = int(
                 (self._gamezone_width + card_width / 4) // card_width)
-        for row in range(max_rows):
-            y = int(row * card_height)
-            for column in range(max_columns):
-                x = int(column * card_width)
-                overlapping = self._is_overlapping(
-                        canvas,
-                        x,
-                        y,
-                        card_width,
-                        card_height,
-                        )
-                if not overlapping:
-                    break
-            if not overlapping:
-                break
-        return x, y
+        return self._grids[pile].find_free_space(
+                card_width,
+                card_height,
+                max_columns,
+                max_rows,
+                )
 
     def _on_card_click(self, event: tkinter.Event, card_name: str):
         self._table.inspect_card(card_name)
@@ -761,6 +976,7 @@ class TkinterGUI(GUI, tkinter.Tk):
         dx = cursor_x - self._cursor_x0
         dy = cursor_y - self._cursor_y0
         canvas.move(window_id, dx, dy)
+        self._grids[pile].move(card_name, dx, dy)
 
     def inspect_card(self,
                      card_name: str,
@@ -768,19 +984,21 @@ class TkinterGUI(GUI, tkinter.Tk):
                      in_box: bool,
                      not_marked: bool,
                      not_permanent: bool,
-                     rotated: bool = False,):
+                     rotated: bool = False,
+                     overlay: Overlay | None = None,):
 
         self._inspected_card.set(card_name)
         self._inspect_frame['text'] = f'inspect: {card_name}'
 
-        label = self._inspected_card_label
-        img: ImageFile.ImageFile = Image.open(img_path)
         maxsize = (self._inspector_width, self._inspector_height)
-        img.thumbnail(maxsize)
-        if rotated:
-            img = img.rotate(180)
-        label.img = ImageTk.PhotoImage(img)
-        label['image'] = label.img
+        self._load_image(
+                self._INSPECTOR_TARGET,
+                self._set_inspected_image,
+                img_path,
+                maxsize,
+                rotated,
+                overlay,
+                )
 
         text = 'discover' if in_box else 'forget'
         self._discover_forget_button['text'] = text
@@ -789,7 +1007,13 @@ class TkinterGUI(GUI, tkinter.Tk):
         text = 'lock' if not_permanent else 'unlock'
         self._lock_unlock_button['text'] = text
 
+    def _set_inspected_image(self, img: Image.Image):
+        label = self._inspected_card_label
+        label.img = ImageTk.PhotoImage(img)
+        label['image'] = label.img
+
     def clean_inspect_area(self):
+        self._decoder.cancel(self._INSPECTOR_TARGET)
         self._inspected_card.set(None)
         self._inspect_frame['text'] = 'inspect:'
         self._inspected_card_label['image'] = None
@@ -811,17 +1035,21 @@ class TkinterGUI(GUI, tkinter.Tk):
         self.clean_inspect_area()
         self._canvas_gamezone.delete(tkinter.ALL)
         self._canvas_permanent.delete(tkinter.ALL)
+        for card_name in self._cards_on_table:
+            self._decoder.cancel((self._TABLE_TARGET, card_name))
         self._cards_on_table = dict()
+        for grid in self._grids.values():
+            grid.clear()
 
     def update_card_image(
             self,
             card_name: str,
             img_path: str,
-            rotated: bool = False):
+            rotated: bool = False,
+            overlay: Overlay | None = None):
         card: dict = self._cards_on_table.get(card_name)
         if not card:
             raise GUIError('card is not on table')
-        img: ImageFile.ImageFile = Image.open(img_path)
 
         pile = self.is_card_on_table(card_name)
         if pile == IN_PLAY_PILE_NAME:
@@ -831,19 +1059,23 @@ class TkinterGUI(GUI, tkinter.Tk):
         card_width = self._gamezone_width / self._NCARDS_PER_TABLE
 
         maxsize = (card_width, card_height)
-        img.thumbnail(maxsize)
-        if rotated:
-            img = img.rotate(180)
-        card[self._IMG_KEY] = ImageTk.PhotoImage(img)
-        label = card[self._IMG_LABEL_KEY]
-        label.configure(image=card[self._IMG_KEY])
+        self._load_image(
+                (self._TABLE_TARGET, card_name),
+                lambda img: self._set_table_card_image(card_name, img),
+                img_path,
+                maxsize,
+                rotated,
+                overlay,
+                )
 
     def remove_card(self, card_name: str):
+        self._decoder.cancel((self._TABLE_TARGET, card_name))
         card: dict = self._cards_on_table.pop(card_name)
         label: tkinter.Label = card[self._IMG_LABEL_KEY]
         label.destroy()
         window_id = card[self._WINDOW_ID_KEY]
         pile = card[self._PILE_KEY]
+        self._grids[pile].remove(card_name)
         if pile == IN_PLAY_PILE_NAME:
             canvas = self._canvas_gamezone
         elif pile == PERMANENT_PILE_NAME:
@@ -851,39 +1083,71 @@ class TkinterGUI(GUI, tkinter.Tk):
         window_id = card[self._WINDOW_ID_KEY]
         canvas.delete(window_id)
 
+    def remove_cards(self, card_names: list[str]):
+        window_ids = {
+                IN_PLAY_PILE_NAME: list(),
+                PERMANENT_PILE_NAME: list(),
+                }
+        for card_name in card_names:
+            self._decoder.cancel((self._TABLE_TARGET, card_name))
+            card: dict = self._cards_on_table.pop(card_name)
+            label: tkinter.Label = card[self._IMG_LABEL_KEY]
+            label.destroy()
+            window_ids[card[self._PILE_KEY]].append(card[self._WINDOW_ID_KEY])
+            self._grids[card[self._PILE_KEY]].remove(card_name)
+        if window_ids[IN_PLAY_PILE_NAME]:
+            self._canvas_gamezone.delete(*window_ids[IN_PLAY_PILE_NAME])
+        if window_ids[PERMANENT_PILE_NAME]:
+            self._canvas_permanent.delete(*window_ids[PERMANENT_PILE_NAME])
+
     def update_box_cards_list(self, card_names: list[str]):
-        self._boxcards_list.set('')
-        self._boxcards_list['values'] = card_names
+        self._boxcards_list.set_items(card_names)
 
     def update_deck_cards_list(self, card_names: list[str]):
         self._deckcards_list.set('')
         self._deckcards_list['values'] = card_names
 
-    def update_draw_pile(
+    def update_draw_pile(self, draw_pile: list[str]):
+        self._drawpile.set_items(draw_pile[-1::-1])
+
+    def apply_pile_delta(
             self,
-            draw_pile: list[str],
-            card: BaseCard | None,
+            pile: str,
+            removed: Sequence[str],
+            added: Sequence[tuple[int, str]],
             ):
-        self._drawpile.set('')
-        self._drawpile['values'] = draw_pile[-1::-1]
-        if draw_pile:
-            img: ImageFile.ImageFile = Image.open(card.path)
+        card_list = {
+                BOX_PILE_NAME: self._boxcards_list,
+                DRAW_PILE_NAME: self._drawpile,
+                DISCARD_PILE_NAME: self._discardpile,
+                }[pile]
+        card_list.update_items(removed, added)
+
+    def update_top_card(self, card: BaseCard | None):
+        if card is not None:
             width = self._width * self._TOPCARD_WIDTH
             height = self._height * self._TOPCARD_HEIGHT
             maxsize = (width, height)
-            img.thumbnail(maxsize)
-            if card.rotate:
-                img = img.rotate(180)
-            self._top_card_label.img = ImageTk.PhotoImage(img)
-            self._top_card_label['image'] = self._top_card_label.img
+            self._load_image(
+                    self._TOPCARD_TARGET,
+                    self._set_top_card_image,
+                    card.path,
+                    maxsize,
+                    card.rotate,
+                    card.overlay,
+                    )
         else:
+            self._decoder.cancel(self._TOPCARD_TARGET)
             self._top_card_label.img = None
             self._top_card_label['image'] = None
             self._top_card_label.update()
 
+    def _set_top_card_image(self, img: Image.Image):
+        self._top_card_label.img = ImageTk.PhotoImage(img)
+        self._top_card_label['image'] = self._top_card_label.img
+
     def update_discarded_pile(self, discarded: list[str]):
-        self._discardpile.set('')
-        self._discardpile['values'] = discarded
+        self._discardpile.set_items(discarded)
 
 
 if __name__ == '__main__':
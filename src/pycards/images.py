@@ -0,0 +1,476 @@
+import math
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Hashable
+
+
+from PIL import Image
+
+
+from pycards.editing import Overlay, draw_ops
+
+
+THUMBNAILS_FOLDER = 'thumbnails'
+# long edge, in pixels, of the thumbnails made at import. they cover the
+# table slots, the permanent zone, the top card of the draw pile and the
+# inspector
+THUMBNAIL_SIZES = (128, 256, 512, 1024)
+DECODE_WORKERS = 4
+# the image is reduced by an integer factor down to REDUCING_GAP times the
+# result before being resampled
+REDUCING_GAP = 2.0
+# thumbnails can be made again, they are saved fast rather than small
+_THUMBNAIL_SAVE_PARAMS = dict(PNG=dict(compress_level=1))
+
+
+class ThumbnailCache(object):
+
+    """LRU cache of decoded and resized card images, bounded by the memory
+    used by the images"""
+
+    def __init__(self, max_bytes: int = 128 * 2**20):
+        """
+
+        :max_bytes: maximum memory taken by the cached images
+
+        """
+        self._max_bytes = max_bytes
+        self._images: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _get_key(
+            path: Path | str,
+            maxsize: tuple[float, float] | None,
+            rotated: bool,
+            overlay: Overlay | None,
+            ) -> tuple:
+        """the modification time and the version of the overlay are part of
+        the key, so that an img file that was rewritten or edited is drawn
+        again"""
+        mtime = os.stat(path).st_mtime_ns
+        if maxsize is not None:
+            maxsize = (round(maxsize[0]), round(maxsize[1]))
+        version = None if overlay is None else overlay.version
+        return (Path(path).as_posix(), mtime, maxsize, bool(rotated), version)
+
+    @staticmethod
+    def _get_nbytes(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def get(
+            self,
+            path: Path | str,
+            maxsize: tuple[float, float] | None = None,
+            rotated: bool = False,
+            overlay: Overlay | None = None,
+            ) -> Image.Image:
+        """get a card image, from the cache if possible. the image must not
+        be modified
+
+        :path: img file
+        :maxsize: (width, height) the image must fit in. None to keep the
+        size of the file
+        :rotated: True to rotate by 180 deg
+        :overlay: edits drawn over the image
+
+        """
+        key = self._get_key(path, maxsize, rotated, overlay)
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+        img = load_image(path, maxsize, rotated, overlay)
+        nbytes = self._get_nbytes(img)
+        with self._lock:
+            if key not in self._images and nbytes <= self._max_bytes:
+                self._images[key] = img
+                self._bytes += nbytes
+                while self._bytes > self._max_bytes:
+                    _, old_img = self._images.popitem(last=False)
+                    self._bytes -= self._get_nbytes(old_img)
+        return img
+
+    def peek(
+            self,
+            path: Path | str,
+            maxsize: tuple[float, float] | None = None,
+            rotated: bool = False,
+            overlay: Overlay | None = None,
+            ) -> Image.Image | None:
+        """get a card image only if it is in the cache, never decode it
+
+        :path: img file
+        :maxsize: (width, height) the image must fit in
+        :rotated: True to rotate by 180 deg
+        :overlay: edits drawn over the image
+        :returns: the image, None if it is not in the cache
+
+        """
+        key = self._get_key(path, maxsize, rotated, overlay)
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+            return img
+
+    def clear(self):
+        """remove all images from the cache and reset the counters"""
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+
+def load_image(
+        path: Path | str,
+        maxsize: tuple[float, float] | None = None,
+        rotated: bool = False,
+        overlay: Overlay | None = None,
+        ) -> Image.Image:
+    """decode a card image, without cache. the smallest up to date
+    thumbnail large enough is decoded instead of the file when there is one
+
+    :path: img file
+    :maxsize: (width, height) the image must fit in. None to keep the size
+    of the file
+    :rotated: True to rotate by 180 deg
+    :overlay: edits drawn over the image, at its size
+
+    """
+    if overlay:
+        file_width = get_fitted_size(path)[0]
+    if maxsize is not None:
+        path = find_thumbnail(path, maxsize)
+    img = Image.open(path)
+    if maxsize is not None:
+        # a jpeg is decoded directly at 1/2, 1/4 or 1/8 of its size, the
+        # smallest one still larger than the result. other formats are
+        # reduced by an integer factor before resampling
+        img.draft(None, _get_draft_size(img.size, maxsize))
+        img.thumbnail(maxsize, reducing_gap=REDUCING_GAP)
+    else:
+        img.load()
+    if overlay:
+        img = draw_ops(img, overlay.ops, img.width / file_width)
+    if rotated:
+        # lossless, unlike rotate which resamples
+        img = img.transpose(Image.Transpose.ROTATE_180)
+    return img
+
+
+def _get_draft_size(
+        img_size: tuple[int, int],
+        maxsize: tuple[float, float],
+        ) -> tuple[int, int]:
+    """smallest size keeping the aspect of the image that covers the size it
+    will have once fitted in maxsize"""
+    width, height = img_size
+    scale = min(1, maxsize[0] / width, maxsize[1] / height)
+    return math.ceil(width * scale), math.ceil(height * scale)
+
+
+def get_fitted_size(
+        path: Path | str,
+        maxsize: tuple[float, float] | None = None,
+        ) -> tuple[int, int]:
+    """size an image will have once fitted in maxsize, read from the header
+    of the file without decoding it
+
+    :path: img file
+    :maxsize: (width, height) the image must fit in. None to keep the size
+    of the file
+
+    """
+    with Image.open(path) as img:
+        size = img.size
+    return fit_size(size, maxsize)
+
+
+def fit_size(
+        size: tuple[int, int],
+        maxsize: tuple[float, float] | None = None,
+        ) -> tuple[int, int]:
+    """size of an image once fitted in maxsize, when the size of its file is
+    already known
+
+    :size: (width, height) of the img file
+    :maxsize: (width, height) the image must fit in. None to keep the size
+
+    """
+    width, height = size
+    if maxsize is None:
+        return width, height
+    scale = min(1, maxsize[0] / width, maxsize[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def get_image_size(path: Path | str) -> tuple[int, int] | None:
+    """size of an img file, read from its header. None if it cannot be read
+
+    :path: img file
+
+    """
+    try:
+        return get_fitted_size(path)
+    except OSError:
+        return None
+
+
+class ImageDecoder(object):
+
+    """decode card images in worker threads. each request is made for a
+    target (a place where the image is shown) and only the last request of a
+    target is delivered. the results are delivered by poll, in the thread
+    that shows them"""
+
+    def __init__(
+            self,
+            cache: ThumbnailCache | None = None,
+            max_workers: int = DECODE_WORKERS,
+            ):
+        """
+
+        :cache: where decoded images are kept, the shared one by default
+        :max_workers: number of decoding threads
+
+        """
+        self._cache = thumbnail_cache if cache is None else cache
+        self._executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='pycards-decoder',
+                )
+        self._results = queue.SimpleQueue()
+        # last request id of each target still waiting for its image
+        self._requests: dict[Hashable, int] = dict()
+        self._next_request_id = 0
+
+    @property
+    def pending(self) -> bool:
+        """True if some requests were not delivered yet"""
+        return bool(self._requests)
+
+    def request(
+            self,
+            target: Hashable,
+            callback: Callable[[Image.Image], None],
+            path: Path | str,
+            maxsize: tuple[float, float] | None = None,
+            rotated: bool = False,
+            overlay: Overlay | None = None,
+            ) -> Image.Image | None:
+        """ask for a card image. a previous request of the same target is
+        cancelled
+
+        :target: where the image will be shown
+        :callback: called by poll with the decoded image
+        :path: img file
+        :maxsize: (width, height) the image must fit in
+        :rotated: True to rotate by 180 deg
+        :overlay: edits drawn over the image
+        :returns: the image if it was in the cache, then the callback is not
+        called. else None
+
+        """
+        img = self._cache.peek(path, maxsize, rotated, overlay)
+        if img is not None:
+            self.cancel(target)
+            return img
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        self._requests[target] = request_id
+        self._executor.submit(
+                self._decode,
+                target,
+                request_id,
+                callback,
+                path,
+                maxsize,
+                rotated,
+                overlay,
+                )
+        return None
+
+    def _decode(
+            self,
+            target: Hashable,
+            request_id: int,
+            callback: Callable[[Image.Image], None],
+            path: Path | str,
+            maxsize: tuple[float, float] | None,
+            rotated: bool,
+            overlay: Overlay | None,
+            ):
+        """run in a worker thread. an image that cannot be read is not
+        delivered"""
+        try:
+            img = self._cache.get(path, maxsize, rotated, overlay)
+        except OSError:
+            img = None
+        self._results.put((target, request_id, callback, img))
+
+    def cancel(self, target: Hashable):
+        """forget the request of a target, its image will not be delivered
+
+        :target:
+
+        """
+        self._requests.pop(target, None)
+
+    def poll(self) -> int:
+        """call the callbacks of the decoded images of the last requests
+
+        :returns: number of callbacks called
+
+        """
+        count = 0
+        while True:
+            try:
+                target, request_id, callback, img = self._results.get_nowait()
+            except queue.Empty:
+                return count
+            if self._requests.get(target) != request_id:
+                continue
+            del self._requests[target]
+            if img is not None:
+                callback(img)
+                count += 1
+
+    def shutdown(self):
+        """stop the worker threads, pending requests are dropped"""
+        self._requests.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_thumbnail_path(path: Path | str, size: int) -> Path:
+    """where the thumbnail of an img file is stored, next to it
+
+    :path: img file
+    :size: long edge of the thumbnail, one of THUMBNAIL_SIZES
+
+    """
+    path = Path(path)
+    return path.parent / THUMBNAILS_FOLDER / f'{path.stem}_{size}{path.suffix}'
+
+
+def _is_up_to_date(thumbnail_path: Path, mtime: int) -> bool:
+    try:
+        return thumbnail_path.stat().st_mtime_ns >= mtime
+    except FileNotFoundError:
+        return False
+
+
+def find_thumbnail(
+        path: Path | str,
+        maxsize: tuple[float, float],
+        ) -> Path:
+    """find the smallest thumbnail that can be downsized to maxsize. a
+    thumbnail older than the img file is ignored
+
+    :path: img file
+    :maxsize: (width, height) the image must fit in
+    :returns: path of the thumbnail, or path if there is none
+
+    """
+    mtime = os.stat(path).st_mtime_ns
+    long_edge = max(maxsize)
+    for size in THUMBNAIL_SIZES:
+        if size >= long_edge:
+            thumbnail_path = get_thumbnail_path(path, size)
+            if _is_up_to_date(thumbnail_path, mtime):
+                return thumbnail_path
+    return Path(path)
+
+
+def _get_thumbnail_sizes(img_size: tuple[int, int]) -> list[int]:
+    """sizes of the thumbnails of an image, those smaller than the image"""
+    return [size for size in THUMBNAIL_SIZES if size < max(img_size)]
+
+
+def has_thumbnails(path: Path | str) -> bool:
+    """True if all the thumbnails of an img file are up to date
+
+    :path: img file
+
+    """
+    mtime = os.stat(path).st_mtime_ns
+    try:
+        with Image.open(path) as img:
+            img_size = img.size
+    except OSError:
+        return True
+    return all(
+            _is_up_to_date(get_thumbnail_path(path, size), mtime)
+            for size in _get_thumbnail_sizes(img_size))
+
+
+def make_thumbnails(path: Path | str) -> list[Path]:
+    """write the thumbnails of an img file, each one downsized from the
+    previous larger one. the thumbnails are not needed to display a card, so
+    an img that cannot be decoded gets none
+
+    :path: img file
+    :returns: paths of the thumbnails written
+
+    """
+    path = Path(path)
+    try:
+        img = Image.open(path)
+        img_format = img.format
+        sizes = _get_thumbnail_sizes(img.size)
+        largest = max(THUMBNAIL_SIZES)
+        img.draft(None, _get_draft_size(img.size, (largest, largest)))
+        img.load()
+    except OSError:
+        return list()
+    folder = path.parent / THUMBNAILS_FOLDER
+    folder.mkdir(exist_ok=True)
+    thumbnail_paths = list()
+    for size in reversed(sizes):
+        img.thumbnail((size, size), reducing_gap=REDUCING_GAP)
+        thumbnail_path = get_thumbnail_path(path, size)
+        # written under another name and renamed, so that the gui never
+        # reads a partial file
+        fd, tmp_name = tempfile.mkstemp(dir=folder, suffix=path.suffix)
+        os.close(fd)
+        try:
+            img.save(
+                    tmp_name,
+                    format=img_format,
+                    **_THUMBNAIL_SAVE_PARAMS.get(img_format, dict()),
+                    )
+            os.replace(tmp_name, thumbnail_path)
+        except OSError:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        thumbnail_paths.append(thumbnail_path)
+    return thumbnail_paths
+
+
+def remove_thumbnails(path: Path | str):
+    """remove the thumbnails of an img file
+
+    :path: img file
+
+    """
+    for size in THUMBNAIL_SIZES:
+        get_thumbnail_path(path, size).unlink(missing_ok=True)
+
+
+thumbnail_cache = ThumbnailCache()
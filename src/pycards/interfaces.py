@@ -1,12 +1,17 @@
 from abc import ABCMeta, abstractmethod, abstractproperty
-from typing import Literal
+from typing import Literal, Callable, Sequence
 from pathlib import Path
 
 
+from pycards.editing import Overlay
+
+
 DRAW_PILE_NAME = 'draw'
 IN_PLAY_PILE_NAME = 'in_play'
 DISCARD_PILE_NAME = 'discard'
 PERMANENT_PILE_NAME = 'permanent'
+# not a pile of the deck, for the cards that are only in the box
+BOX_PILE_NAME = 'box'
 
 
 class BaseCard(metaclass=ABCMeta):
@@ -28,6 +33,16 @@ class BaseCard(metaclass=ABCMeta):
         """specify if img need to be rotated by 180 deg"""
         pass
 
+    @abstractproperty
+    def overlay(self) -> Overlay | None:
+        """edits to draw over the img file, None if there is none"""
+        pass
+
+    @abstractproperty
+    def size(self) -> tuple[int, int] | None:
+        """(width, height) of the img file, None if it is not known"""
+        pass
+
     @abstractmethod
     def __init__(
             self,
@@ -70,6 +85,11 @@ class BaseTable(object, metaclass=ABCMeta):
         """return the name of the active game"""
         pass
 
+    @abstractmethod
+    def close(self):
+        """save and release the active game, when the app exits"""
+        pass
+
     @abstractmethod
     def new_game(self, name: str):
         """create a new game and update gui with it
@@ -98,7 +118,8 @@ class BaseTable(object, metaclass=ABCMeta):
     @abstractmethod
     def import_cards(self, folder_path: str):
         """import ('buy') cards. folder needs to contain for each card 2 img
-        files
+        files. the import can end after the return, the progress is shown
+        by the gui
 
         :folder_path: contains the img file of the cards
 
@@ -312,6 +333,31 @@ class BaseTable(object, metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def edit_card(
+            self,
+            card_name: str,
+            ops: list[dict],
+            sticker_names: list[str],
+            ):
+        """add the edits made in the editor to the visible side of a card
+
+        :card_name:
+        :ops: edit operations (see pycards.editing)
+        :sticker_names: stickers used, removed from the game after
+
+        """
+        pass
+
+    @abstractmethod
+    def undo_card_edit(self, card_name: str):
+        """remove the last edit of the visible side of a card
+
+        :card_name:
+
+        """
+        pass
+
     @abstractmethod
     def inspect_obfuscated_card(self, obfuscated_name: str):
         """call inspect method of gui with card info to display
@@ -354,6 +400,18 @@ class GUI(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def schedule(self, callback: Callable[[], None]):
+        """call callback once the pending gui events are handled, for
+        example to update the gui once after several changes of the game.
+        it can be called from any thread, callback is called in the gui
+        thread. a gui without event loop can call it immediately
+
+        :callback: function without argument
+
+        """
+        pass
+
     @abstractmethod
     def showinfo(self, msg: str):
         """display a msg, for example from controller
@@ -372,6 +430,17 @@ class GUI(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def show_progress(self, done: int, total: int):
+        """show the progress of a long operation, for example an import.
+        the progress display is closed when done reaches total
+
+        :done: number of items already processed
+        :total: number of items to process
+
+        """
+        pass
+
     @abstractmethod
     def is_card_on_table(self, card_name) -> Literal[
             IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME] | bool:
@@ -389,7 +458,10 @@ class GUI(metaclass=ABCMeta):
             card_name: str,
             img_path: str,
             pile: Literal[IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME] = 'in_play',
-            rotated: bool = False):
+            rotated: bool = False,
+            overlay: Overlay | None = None,
+            size: tuple[int, int] | None = None,
+            ):
         """place the card on the table. if card is already present it will only
         move it without updating
         the image
@@ -399,6 +471,9 @@ class GUI(metaclass=ABCMeta):
         :is_locked: for permanent card
         :pile: one of 'in_play', 'permanent'
         :rotated: True if you want to rotate by 108 deg
+        :overlay: edits to draw over the image
+        :size: of the img file. if known, the card is placed without reading
+        the file, its image is decoded later
 
         """
         pass
@@ -410,7 +485,8 @@ class GUI(metaclass=ABCMeta):
                      in_box: bool,
                      not_marked: bool,
                      not_permanent: bool,
-                     rotated: bool = False,):
+                     rotated: bool = False,
+                     overlay: Overlay | None = None,):
         """display card in larger frame and allow operations on it
 
         :card_name: from file name withou recto or verso
@@ -419,6 +495,7 @@ class GUI(metaclass=ABCMeta):
         :not_marked: True if card is not marked
         :not_permanent: True if card is not permanent
         :rotated: True if you want to rotate by 108 deg
+        :overlay: edits to draw over the image
 
         """
         pass
@@ -428,12 +505,14 @@ class GUI(metaclass=ABCMeta):
             self,
             card_name: str,
             img_path: str,
-            rotated: bool,):
+            rotated: bool,
+            overlay: Overlay | None = None,):
         """open editor window
 
         :card_name: from file name withou recto or verso
         :img_path: path to card image
         :rotated: True if you want to rotate by 108 deg
+        :overlay: edits already made, shown in the editor
         """
         pass
 
@@ -467,12 +546,15 @@ class GUI(metaclass=ABCMeta):
             self,
             card_name: str,
             img_path: str,
-            rotated: bool = False):
+            rotated: bool = False,
+            overlay: Overlay | None = None,
+            ):
         """update a single card, for example when image is rotated
 
         :card_name: identify card
         :img_path: path to card image
         :rotated: True if you want to rotate by 108 deg
+        :overlay: edits to draw over the image
 
         """
         pass
@@ -488,16 +570,51 @@ class GUI(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def update_draw_pile(
+    def remove_cards(self, card_names: list[str]):
+        """remove several cards from table at once, for example when all
+        cards in play are discarded
+
+        :card_names: identify the cards
+
+        """
+        pass
+
+    @abstractmethod
+    def update_draw_pile(self, draw_pile: list[str]):
+        """replace the list of the draw pile. names are usually obfuscated.
+        called when a game is shown, then the pile is changed by
+        apply_pile_delta
+
+        :draw_pile: from bottom to top
+
+        """
+        pass
+
+    @abstractmethod
+    def apply_pile_delta(
             self,
-            draw_pile: list[str],
-            card: BaseCard | None,
+            pile: str,
+            removed: Sequence[str],
+            added: Sequence[tuple[int, str]],
             ):
-        """update the draw pile. names are usually obfuscated
+        """delete and insert rows of the list of the box, the draw pile or
+        the discard pile, instead of replacing the whole list
 
-        :draw_pile:
-        :card:
-        :returns:
+        :pile: BOX_PILE_NAME, DRAW_PILE_NAME or DISCARD_PILE_NAME
+        :removed: names of the rows to delete, obfuscated for the draw pile
+        :added: (position, name) of the rows to insert once the others are
+        deleted, by increasing position. the draw pile is counted from the
+        top
+
+        """
+        pass
+
+    @abstractmethod
+    def update_top_card(self, card: BaseCard | None):
+        """show the card on top of the draw pile. only called when it
+        changed
+
+        :card: None if the draw pile is empty
 
         """
         pass
@@ -1,4 +1,5 @@
-from pycards.apps import PycarApp
+from pycards.game import Game, GameError
+from pycards.storage import SqliteStorage
 
 
 def run_pycards():
@@ -6,5 +7,34 @@ def run_pycards():
     :returns: TODO
 
     """
+    # the gui (tkinter, Pillow) is only imported by the command that needs it
+    from pycards.apps import PycarApp
     app = PycarApp()
     app.start()
+
+
+def run_build_thumbnails():
+    """make the missing thumbnails of the cards of all saved games
+
+    """
+    for name in Game.get_saved_game():
+        game = Game(name)
+        count = game.build_thumbnails()
+        game.close()
+        print(f'{name}: thumbnails made for {count} img files')
+
+
+def run_migrate_to_sqlite():
+    """move the saved games to the sqlite storage. their varbox files are
+    removed once copied, older versions of pycards cannot open them anymore
+
+    """
+    for name in Game.get_saved_game():
+        game = Game(name)
+        try:
+            game.migrate_storage(SqliteStorage)
+        except GameError:
+            print(f'{name}: already saved in sqlite')
+        else:
+            print(f'{name}: moved to sqlite')
+        game.close()
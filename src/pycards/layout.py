@@ -0,0 +1,144 @@
+import math
+from typing import Hashable
+
+
+class OccupancyGrid(object):
+
+    """rectangles placed on a table, indexed by the cells of a grid they
+    cover. tells if an area is free without looking at the widgets"""
+
+    def __init__(self, cell_width: float, cell_height: float):
+        """
+
+        :cell_width: width of the cells of the index, about the size of an
+        item
+        :cell_height: height of the cells of the index
+
+        """
+        self._cell_width = cell_width
+        self._cell_height = cell_height
+        self._rects: dict[Hashable, tuple[float, float, float, float]] = dict()
+        self._cells: dict[tuple[int, int], set[Hashable]] = dict()
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._rects
+
+    def _get_cells(self, x1: float, y1: float, x2: float, y2: float):
+        """cells covered by a rectangle"""
+        column1 = math.floor(x1 / self._cell_width)
+        column2 = math.floor(x2 / self._cell_width)
+        row1 = math.floor(y1 / self._cell_height)
+        row2 = math.floor(y2 / self._cell_height)
+        for row in range(row1, row2 + 1):
+            for column in range(column1, column2 + 1):
+                yield column, row
+
+    def add(
+            self,
+            item: Hashable,
+            x: float,
+            y: float,
+            width: float,
+            height: float,
+            ):
+        """place an item. if it was already placed, it is moved
+
+        :item: identify the item
+        :x: left side
+        :y: top side
+        :width:
+        :height:
+
+        """
+        if item in self._rects:
+            self.remove(item)
+        rect = (x, y, x + width, y + height)
+        self._rects[item] = rect
+        for cell in self._get_cells(*rect):
+            self._cells.setdefault(cell, set()).add(item)
+
+    def move(self, item: Hashable, dx: float, dy: float):
+        """move an item by an offset
+
+        :item: a placed item
+        :dx:
+        :dy:
+
+        """
+        x1, y1, x2, y2 = self._rects[item]
+        self.add(item, x1 + dx, y1 + dy, x2 - x1, y2 - y1)
+
+    def remove(self, item: Hashable):
+        """remove an item, if placed
+
+        :item: identify the item
+
+        """
+        rect = self._rects.pop(item, None)
+        if rect is not None:
+            for cell in self._get_cells(*rect):
+                items = self._cells[cell]
+                items.discard(item)
+                if not items:
+                    del self._cells[cell]
+
+    def clear(self):
+        """remove all items"""
+        self._rects.clear()
+        self._cells.clear()
+
+    def is_free(self, x1: float, y1: float, x2: float, y2: float) -> bool:
+        """True if no item overlaps a rectangle (touching is overlapping)
+
+        :x1: left
+        :y1: top
+        :x2: right
+        :y2: bottom
+
+        """
+        checked = set()
+        for cell in self._get_cells(x1, y1, x2, y2):
+            for item in self._cells.get(cell, ()):
+                if item in checked:
+                    continue
+                checked.add(item)
+                ix1, iy1, ix2, iy2 = self._rects[item]
+                if ix1 <= x2 and x1 <= ix2 and iy1 <= y2 and y1 <= iy2:
+                    return False
+        return True
+
+    def find_free_space(
+            self,
+            width: float,
+            height: float,
+            columns: int,
+            rows: int,
+            tolerance: float = 5,
+            ) -> tuple[int, int]:
+        """find the first free slot of a grid of slots of the size of the
+        item, row by row
+
+        :width: of the item
+        :height: of the item
+        :columns: number of slots in a row
+        :rows: number of rows to look in
+        :tolerance: overlap allowed on each side
+        :returns: (x, y) of the free slot. the last slot if all are taken
+
+        """
+        x = y = 0
+        for row in range(rows):
+            y = int(row * height)
+            for column in range(columns):
+                x = int(column * width)
+                if self.is_free(
+                        x + tolerance,
+                        y + tolerance,
+                        x + width - tolerance,
+                        y + height - tolerance,
+                        ):
+                    return x, y
+        return x, y
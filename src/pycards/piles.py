@@ -0,0 +1,169 @@
+from collections import OrderedDict
+import random
+from typing import Iterable, Iterator
+
+
+class DrawPile(object):
+
+    """ordered pile of card names. the first name is at the bottom and the
+    last one on top. top and bottom operations and removal of any card are
+    O(1), the position of a card is found in O(log n)"""
+
+    _MIN_CAPACITY = 16
+
+    def __init__(self, card_names: Iterable[str] = ()):
+        """
+
+        :card_names: initial order, from bottom to top
+
+        """
+        self._rebuild(list(card_names))
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._order)
+
+    def __reversed__(self) -> Iterator[str]:
+        return reversed(self._order)
+
+    def __contains__(self, card_name: str) -> bool:
+        return card_name in self._slots
+
+    def _rebuild(self, card_names: list[str]):
+        """place all the names in the middle of a new slot array and rebuild
+        the fenwick tree counting the occupied slots
+
+        :card_names: from bottom to top
+
+        """
+        n = len(card_names)
+        capacity = 2 * n + self._MIN_CAPACITY
+        start = (capacity - n) // 2
+        self._capacity = capacity
+        self._lo = start
+        self._hi = start + n
+        self._order: OrderedDict[str, None] = OrderedDict()
+        self._slots: dict[str, int] = dict()
+        tree = [0] * (capacity + 1)
+        for i, card_name in enumerate(card_names):
+            if card_name in self._slots:
+                raise ValueError(f'{card_name} is twice in the pile')
+            slot = start + i
+            self._order[card_name] = None
+            self._slots[card_name] = slot
+            tree[slot + 1] += 1
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _add(self, slot: int, delta: int):
+        i = slot + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count(self, slot: int) -> int:
+        """number of cards in the slots up to slot (included)"""
+        i = slot + 1
+        count = 0
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def push_top(self, card_name: str):
+        """put a card on top. if already in the pile, it is moved
+
+        :card_name:
+
+        """
+        if card_name in self._slots:
+            self.remove(card_name)
+        if self._hi == self._capacity:
+            self._rebuild(list(self._order))
+        slot = self._hi
+        self._hi += 1
+        self._order[card_name] = None
+        self._slots[card_name] = slot
+        self._add(slot, 1)
+
+    def push_bottom(self, card_name: str):
+        """put a card at the bottom. if already in the pile, it is moved
+
+        :card_name:
+
+        """
+        if card_name in self._slots:
+            self.remove(card_name)
+        if self._lo == 0:
+            self._rebuild(list(self._order))
+        self._lo -= 1
+        slot = self._lo
+        self._order[card_name] = None
+        self._order.move_to_end(card_name, last=False)
+        self._slots[card_name] = slot
+        self._add(slot, 1)
+
+    def remove(self, card_name: str):
+        """remove a card from anywhere in the pile
+
+        :card_name:
+
+        """
+        slot = self._slots.pop(card_name)
+        del self._order[card_name]
+        self._add(slot, -1)
+
+    def top(self) -> str | None:
+        """name of the card on top, None if the pile is empty"""
+        if self._order:
+            return next(reversed(self._order))
+        else:
+            return None
+
+    def bottom(self) -> str | None:
+        """name of the card at the bottom, None if the pile is empty"""
+        if self._order:
+            return next(iter(self._order))
+        else:
+            return None
+
+    def pop_top(self) -> str:
+        """remove the card on top and return its name"""
+        card_name = self.top()
+        if card_name is None:
+            raise IndexError('pop from an empty pile')
+        self.remove(card_name)
+        return card_name
+
+    def index(self, card_name: str) -> int:
+        """position of a card, counted from the bottom (0)
+
+        :card_name:
+
+        """
+        slot = self._slots[card_name]
+        return self._count(slot) - 1
+
+    def shuffle(self):
+        """shuffle the whole pile"""
+        card_names = list(self._order)
+        random.shuffle(card_names)
+        self._rebuild(card_names)
+
+    def extend(self, card_names: Iterable[str]):
+        """put several cards on top, in the given order
+
+        :card_names:
+
+        """
+        for card_name in card_names:
+            self.push_top(card_name)
+
+    def to_list(self) -> list[str]:
+        """names from bottom to top, as they are saved"""
+        return list(self._order)
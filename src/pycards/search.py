@@ -0,0 +1,88 @@
+import bisect
+from typing import Sequence
+
+
+class PrefixIndex(object):
+
+    """list of card names, with a sorted index to find quickly the names
+    starting with a prefix (case is ignored). names can be inserted and
+    removed one by one without rebuilding the index"""
+
+    # larger than any character, ends the range of keys with a prefix
+    _MAX_CHAR = chr(0x10ffff)
+
+    def __init__(self, names: Sequence[str] = ()):
+        """
+
+        :names: in the order they are shown
+
+        """
+        self._names = list(names)
+        self._keys = sorted((name.casefold(), name) for name in self._names)
+        self._renumber()
+
+    def _renumber(self):
+        """give to each name an order key that follows the list. keys of the
+        names that are inserted later are taken between their neighbours,
+        so that the other keys do not change"""
+        self._order = {name: float(i) for i, name in enumerate(self._names)}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, i: int | slice) -> str | list[str]:
+        return self._names[i]
+
+    def insert(self, position: int, name: str):
+        """
+
+        :position: of the name in the list, once inserted
+        :name: not already in the list
+
+        """
+        names = self._names
+        before = self._order[names[position - 1]] if position > 0 else None
+        after = self._order[names[position]] if position < len(names) else None
+        if before is None and after is None:
+            order = 0.
+        elif before is None:
+            order = after - 1
+        elif after is None:
+            order = before + 1
+        else:
+            order = (before + after) / 2
+        names.insert(position, name)
+        bisect.insort(self._keys, (name.casefold(), name))
+        if order in (before, after):
+            # no float left between the neighbours
+            self._renumber()
+        else:
+            self._order[name] = order
+
+    def remove(self, name: str):
+        """
+
+        :name: in the list
+
+        """
+        position = bisect.bisect_left(
+                self._names, self._order[name], key=self._order.__getitem__)
+        del self._names[position]
+        del self._order[name]
+        key = (name.casefold(), name)
+        del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def search(self, prefix: str) -> Sequence[str]:
+        """names starting with a prefix
+
+        :prefix: empty to get all names
+        :returns: names in the order of the list
+
+        """
+        if not prefix:
+            return tuple(self._names)
+        key = prefix.casefold()
+        lo = bisect.bisect_left(self._keys, (key,))
+        hi = bisect.bisect_left(self._keys, (key + self._MAX_CHAR,))
+        names = [name for _, name in self._keys[lo:hi]]
+        return tuple(sorted(names, key=self._order.__getitem__))
@@ -0,0 +1,709 @@
+"""
+backends where the state of a game is saved.
+
+the state is a dict with the cards of the box and of the deck (one dict per
+card), and the other data of the game listed in STATE_KEYS. a card of the
+draw pile keeps its position and its obfuscated name in its own dict, so that
+moving one card in or out of the draw pile only changes that card.
+
+the name of the backend where a game is saved is written in STORAGE_FILE, in
+the folder of the game, so that the game is always loaded from it.
+
+the durability policy of a storage tells when its writes are synced on disk
+(fsync): after each operation (EVERY_OP), by a background thread every
+FLUSH_INTERVAL_MS (INTERVAL) or when the storage is closed (ON_EXIT). in all
+cases a crash does not leave a file half written.
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Callable
+import json
+import os
+import sqlite3
+import threading
+
+
+from varboxes import VarBox
+import xdg
+
+
+from pycards import config
+
+
+BOX_LOCATION = 'box'
+DECK_LOCATION = 'deck'
+LOCATIONS = (BOX_LOCATION, DECK_LOCATION)
+# data of a game that is not in the cards, with the value of a new game
+STATE_DEFAULTS = dict(
+        stickers=dict,
+        # draw pile saved as lists by older versions. they are emptied when
+        # the game is loaded, the cards then keep their place in the pile
+        draw_pile=list,
+        draw_cards_real_name=dict,
+        draw_cards_obfuscate_name=dict,
+        # saves from older versions: obfuscated names are renumbered when
+        # the game is loaded
+        draw_cards_next_id=lambda: None,
+        layout_version=lambda: 0,
+        )
+STATE_KEYS = tuple(STATE_DEFAULTS)
+SQLITE_FILE = 'game.sqlite3'
+SNAPSHOT_FILE = 'snapshot.json'
+JOURNAL_FILE = 'journal.jsonl'
+# name of the backend of a game
+STORAGE_FILE = 'storage.json'
+# number of journal entries after which a snapshot is written
+SNAPSHOT_INTERVAL = 100
+EVERY_OP = 'every_op'
+INTERVAL = 'interval'
+ON_EXIT = 'on_exit'
+DURABILITIES = (EVERY_OP, INTERVAL, ON_EXIT)
+FLUSH_INTERVAL_MS = 1000
+
+
+def get_default_state() -> dict:
+    """state of a new game"""
+    state = {location: dict() for location in LOCATIONS}
+    for key, default in STATE_DEFAULTS.items():
+        state[key] = default()
+    return state
+
+
+def get_varbox_path(name: str) -> Path:
+    """json file of the varbox where a game is saved, where VarBox writes it
+
+    :name: of the game
+
+    """
+    return Path(xdg.xdg_data_home()) / config.APP / f'varbox_{name}.json'
+
+
+def _fsync_folder(folder: Path):
+    """make the creation or the renaming of a file in a folder durable"""
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_file(path: Path):
+    """sync a file that was written, also from another file object"""
+    with open(path, 'rb') as file:
+        os.fsync(file.fileno())
+
+
+def write_json_atomic(path: Path, data, sync: bool = True):
+    """write a json file through a temporary file that replaces it, so that
+    it is never truncated by a crash
+
+    :path: of the json file
+    :data: to dump
+    :sync: wait that the file is on disk
+
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if sync:
+        _fsync_folder(path.parent)
+
+
+class Flusher(object):
+
+    """sync the writes of a storage on disk according to a durability
+    policy. with INTERVAL, a thread is started at the first write"""
+
+    def __init__(
+            self,
+            sync: Callable[[], None],
+            durability: str = INTERVAL,
+            interval_ms: int = FLUSH_INTERVAL_MS,
+            ):
+        """
+
+        :sync: make the writes done so far durable
+        :durability: one of DURABILITIES
+        :interval_ms: between two syncs, with INTERVAL
+
+        """
+        if durability not in DURABILITIES:
+            raise ValueError(f'unknown durability: {durability}')
+        self._sync = sync
+        self._durability = durability
+        self._interval = interval_ms / 1000
+        # held by the storage while it writes, and while syncing
+        self.lock = threading.Lock()
+        self._pending = False
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def durability(self) -> str:
+        return self._durability
+
+    @property
+    def pending(self) -> bool:
+        """True if some writes are not synced yet"""
+        return self._pending
+
+    def written(self):
+        """to be called by the storage after a write, with the lock held"""
+        if self._durability == EVERY_OP:
+            self._sync()
+            return
+        self._pending = True
+        if self._durability == INTERVAL and self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self.flush()
+
+    def flush(self):
+        """sync now what was written"""
+        with self.lock:
+            if self._pending:
+                self._pending = False
+                self._sync()
+
+    def close(self):
+        """stop the thread and sync what is left"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def discard(self):
+        """stop the thread without syncing, when the files are removed"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pending = False
+
+
+class GameStorage(ABC):
+
+    """where the state of one game is saved. the game keeps the whole state
+    in memory and tells which parts changed since the last save"""
+
+    @abstractmethod
+    def __init__(self, name: str, folder: Path, durability: str = INTERVAL):
+        """
+
+        :name: of the game
+        :folder: data folder of the game
+        :durability: when the writes are synced, one of DURABILITIES
+
+        """
+        pass
+
+    # saved in STORAGE_FILE
+    NAME: str
+
+    @classmethod
+    @abstractmethod
+    def is_saved(cls, name: str, folder: Path) -> bool:
+        """look for a game saved with this backend, without creating any
+        file
+
+        :name: of the game
+        :folder: data folder of the game
+
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def exists(self) -> bool:
+        """True if a game was already saved there"""
+        pass
+
+    @abstractmethod
+    def load(self) -> dict:
+        """read the whole state. missing data take their default value
+
+        :returns: state of the game
+
+        """
+        pass
+
+    @abstractmethod
+    def save(
+            self,
+            state: dict,
+            card_names: Iterable[str],
+            keys: Iterable[str],
+            operation: str | None = None,
+            ):
+        """write the changes of the state at once
+
+        :state: whole state of the game
+        :card_names: cards that were modified, added or removed since the
+        last save
+        :keys: other data of STATE_KEYS modified since the last save
+        :operation: name of what made the changes
+
+        """
+        pass
+
+    @abstractmethod
+    def flush(self):
+        """sync now what was written, whatever the durability"""
+        pass
+
+    @abstractmethod
+    def close(self):
+        """sync and release the files of the storage"""
+        pass
+
+    @abstractmethod
+    def delete(self):
+        """close and remove the saved game"""
+        pass
+
+
+class VarBoxStorage(GameStorage):
+
+    """state saved in the json file of a VarBox. the whole file is
+    rewritten on each save, whatever changed, through a temporary file"""
+
+    NAME = 'varbox'
+
+    def __init__(
+            self,
+            name: str,
+            folder: Path = None,
+            durability: str = INTERVAL,
+            ):
+        self._varbox = VarBox(project_name=config.APP, app_name=name)
+        # VarBox.get_path() is None until the file exists
+        self._path = get_varbox_path(name)
+        self._flusher = Flusher(self._sync, durability)
+
+    @classmethod
+    def is_saved(cls, name: str, folder: Path = None) -> bool:
+        return get_varbox_path(name).exists()
+
+    @property
+    def exists(self) -> bool:
+        return self._varbox.get_path() is not None
+
+    def load(self) -> dict:
+        state = get_default_state()
+        varbox_state = vars(self._varbox)
+        for key in state:
+            if key in varbox_state:
+                state[key] = varbox_state[key]
+        return state
+
+    def _sync(self):
+        _fsync_file(self._path)
+        _fsync_folder(self._path.parent)
+
+    def save(
+            self,
+            state: dict,
+            card_names: Iterable[str] = (),
+            keys: Iterable[str] = (),
+            operation: str | None = None,
+            ):
+        # VarBox itself would truncate the file before dumping it
+        with self._flusher.lock:
+            if self._flusher.durability == EVERY_OP:
+                # synced before the rename
+                write_json_atomic(self._path, state)
+            else:
+                write_json_atomic(self._path, state, sync=False)
+                self._flusher.written()
+
+    def flush(self):
+        self._flusher.flush()
+
+    def close(self):
+        self._flusher.close()
+
+    def delete(self):
+        self._flusher.discard()
+        self._path.unlink(missing_ok=True)
+
+
+class SqliteStorage(GameStorage):
+
+    """state saved in a sqlite database in WAL mode, with one row per card.
+    a save only writes the rows of the cards that changed"""
+
+    NAME = 'sqlite'
+
+    _SCHEMA = (
+            """CREATE TABLE IF NOT EXISTS cards (
+                name TEXT PRIMARY KEY,
+                location TEXT NOT NULL,
+                pile TEXT,
+                data TEXT NOT NULL)""",
+            """CREATE INDEX IF NOT EXISTS cards_pile
+                ON cards (location, pile)""",
+            """CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL)""",
+            )
+    _UPSERT_CARD = """INSERT INTO cards (name, location, pile, data)
+            VALUES (?, ?, ?, ?) ON CONFLICT (name) DO UPDATE
+            SET location = excluded.location,
+                pile = excluded.pile,
+                data = excluded.data"""
+    _UPSERT_STATE = """INSERT INTO state (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value"""
+
+    def __init__(self, name: str, folder: Path, durability: str = INTERVAL):
+        self._path = Path(folder) / SQLITE_FILE
+        self._exists = self._path.exists()
+        self._flusher = Flusher(self._checkpoint, durability)
+        # the flusher thread makes the checkpoints, with the lock held
+        self._connection = sqlite3.connect(
+                self._path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        if durability == EVERY_OP:
+            self._connection.execute('PRAGMA synchronous=FULL')
+        else:
+            # with WAL, a commit is still atomic but is synced at checkpoints
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            for statement in self._SCHEMA:
+                self._connection.execute(statement)
+
+    @classmethod
+    def is_saved(cls, name: str, folder: Path) -> bool:
+        return (Path(folder) / SQLITE_FILE).exists()
+
+    @property
+    def exists(self) -> bool:
+        return self._exists
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _checkpoint(self):
+        """sync the wal and copy it in the database"""
+        self._connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def load(self) -> dict:
+        state = get_default_state()
+        rows = self._connection.execute(
+                'SELECT name, location, data FROM cards ORDER BY name')
+        for card_name, location, data in rows:
+            state[location][card_name] = json.loads(data)
+        rows = self._connection.execute('SELECT key, value FROM state')
+        for key, value in rows:
+            state[key] = json.loads(value)
+        return state
+
+    def save(
+            self,
+            state: dict,
+            card_names: Iterable[str],
+            keys: Iterable[str],
+            operation: str | None = None,
+            ):
+        with self._flusher.lock:
+            self._save(state, card_names, keys)
+            if self._flusher.durability != EVERY_OP:
+                # else the commit was synced
+                self._flusher.written()
+
+    def _save(
+            self,
+            state: dict,
+            card_names: Iterable[str],
+            keys: Iterable[str],
+            ):
+        with self._connection:
+            for card_name in card_names:
+                for location in LOCATIONS:
+                    card = state[location].get(card_name)
+                    if card is not None:
+                        self._connection.execute(
+                                self._UPSERT_CARD,
+                                (
+                                    card_name,
+                                    location,
+                                    card.get('pile'),
+                                    json.dumps(card),
+                                    ))
+                        break
+                else:
+                    self._connection.execute(
+                            'DELETE FROM cards WHERE name = ?', (card_name,))
+            for key in keys:
+                self._connection.execute(
+                        self._UPSERT_STATE,
+                        (key, json.dumps(state[key])))
+
+    def flush(self):
+        self._flusher.flush()
+
+    def close(self):
+        self._flusher.close()
+        self._connection.close()
+
+    def delete(self):
+        self._flusher.discard()
+        self._connection.close()
+        for suffix in ('', '-wal', '-shm'):
+            path = self._path.with_name(self._path.name + suffix)
+            path.unlink(missing_ok=True)
+
+
+class JournalStorage(GameStorage):
+
+    """state saved as a snapshot and a journal. each save appends one line
+    to the journal with the operation and what it changed: the cards (with
+    their place in the draw pile) and the other data. every
+    snapshot_interval saves, and when the storage is closed, the whole state
+    is written in a new snapshot and the journal is emptied. loading
+    replays the journal over the snapshot"""
+
+    NAME = 'journal'
+
+    def __init__(
+            self,
+            name: str,
+            folder: Path,
+            durability: str = INTERVAL,
+            snapshot_interval: int = SNAPSHOT_INTERVAL,
+            ):
+        """
+
+        :snapshot_interval: number of journal entries between snapshots
+
+        """
+        folder = Path(folder)
+        self._flusher = Flusher(self._sync, durability)
+        self._snapshot_path = folder / SNAPSHOT_FILE
+        self._journal_path = folder / JOURNAL_FILE
+        self._snapshot_interval = snapshot_interval
+        self._exists = (
+                self._snapshot_path.exists() or self._journal_path.exists())
+        self._state: dict | None = None
+        self._journal = None
+        self._nentries = 0
+
+    @classmethod
+    def is_saved(cls, name: str, folder: Path) -> bool:
+        folder = Path(folder)
+        return (
+                (folder / SNAPSHOT_FILE).exists()
+                or (folder / JOURNAL_FILE).exists())
+
+    @property
+    def exists(self) -> bool:
+        return self._exists
+
+    def _read_journal(self, state: dict) -> int:
+        """apply the entries of the journal on a state. an entry that was
+        not completely written (crash while saving) is removed with the
+        ones after it
+
+        :state: from the snapshot
+        :returns: number of entries applied
+
+        """
+        if not self._journal_path.exists():
+            return 0
+        nentries = 0
+        with open(self._journal_path, 'rb+') as journal:
+            while line := journal.readline():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if entry is None or not line.endswith(b'\n'):
+                    journal.seek(-len(line), os.SEEK_CUR)
+                    journal.truncate()
+                    break
+                apply_entry(state, entry)
+                nentries += 1
+        return nentries
+
+    def load(self) -> dict:
+        state = get_default_state()
+        if self._snapshot_path.exists():
+            with open(self._snapshot_path) as snapshot:
+                state.update(json.load(snapshot))
+        self._nentries = self._read_journal(state)
+        self._state = state
+        return state
+
+    def save(
+            self,
+            state: dict,
+            card_names: Iterable[str],
+            keys: Iterable[str],
+            operation: str | None = None,
+            ):
+        self._state = state
+        entry = make_entry(state, card_names, keys, operation)
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._flusher.lock:
+            if self._journal is None:
+                self._journal = open(self._journal_path, 'a')
+            self._journal.write(line)
+            self._journal.flush()
+            self._nentries += 1
+            if self._nentries >= self._snapshot_interval:
+                self._write_snapshot()
+            else:
+                self._flusher.written()
+
+    def _sync(self):
+        if self._journal is not None:
+            os.fsync(self._journal.fileno())
+
+    def write_snapshot(self):
+        """write the whole state in the snapshot and empty the journal"""
+        with self._flusher.lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        if self._state is None:
+            return
+        # always synced, since the journal is emptied after
+        write_json_atomic(self._snapshot_path, self._state)
+        # a crash before the journal is emptied only replays entries that
+        # are already in the snapshot
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self._journal_path, 'w')
+        self._nentries = 0
+
+    def flush(self):
+        self._flusher.flush()
+
+    def close(self):
+        self._flusher.close()
+        if self._nentries:
+            self.write_snapshot()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def delete(self):
+        self._flusher.discard()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._state = None
+        self._nentries = 0
+        self._snapshot_path.unlink(missing_ok=True)
+        self._journal_path.unlink(missing_ok=True)
+
+
+STORAGE_CLASSES: tuple[type[GameStorage], ...] = (
+        SqliteStorage, JournalStorage, VarBoxStorage)
+
+
+def read_storage_class(folder: Path) -> type[GameStorage] | None:
+    """backend written in the folder of a game
+
+    :folder: data folder of the game
+    :returns: None if no backend was written, by older versions
+
+    """
+    path = Path(folder) / STORAGE_FILE
+    if not path.exists():
+        return None
+    name = json.loads(path.read_text())['storage']
+    for storage_class in STORAGE_CLASSES:
+        if storage_class.NAME == name:
+            return storage_class
+    raise ValueError(f'unknown storage: {name}')
+
+
+def write_storage_class(folder: Path, storage_class: type[GameStorage]):
+    """write in the folder of a game the backend where it is saved
+
+    :folder: data folder of the game
+    :storage_class: one of STORAGE_CLASSES
+
+    """
+    write_json_atomic(
+            Path(folder) / STORAGE_FILE, dict(storage=storage_class.NAME))
+
+
+def find_storage_class(
+        name: str,
+        folder: Path,
+        ) -> type[GameStorage] | None:
+    """look for the files of each backend, for a game saved before its
+    backend was written in its folder
+
+    :name: of the game
+    :folder: data folder of the game
+    :returns: None if the game was never saved
+
+    """
+    for storage_class in STORAGE_CLASSES:
+        if storage_class.is_saved(name, folder):
+            return storage_class
+    return None
+
+
+def make_entry(
+        state: dict,
+        card_names: Iterable[str],
+        keys: Iterable[str],
+        operation: str | None = None,
+        ) -> dict:
+    """journal entry with the changes of a save. a card moved in the draw
+    pile is journaled with its new position, the whole pile is only in the
+    snapshot
+
+    :state: whole state of the game
+    :card_names: cards that changed. removed cards are saved as None
+    :keys: other data that changed
+    :operation: what made the changes
+
+    """
+    cards = dict()
+    for card_name in card_names:
+        cards[card_name] = None
+        for location in LOCATIONS:
+            card = state[location].get(card_name)
+            if card is not None:
+                cards[card_name] = [location, card]
+                break
+    return dict(
+            op=operation,
+            cards=cards,
+            state={key: state[key] for key in keys},
+            )
+
+
+def apply_entry(state: dict, entry: dict):
+    """redo the changes of a journal entry on a state
+
+    :state: of the game before the entry
+    :entry: see make_entry
+
+    """
+    for card_name, location_card in entry['cards'].items():
+        for location in LOCATIONS:
+            state[location].pop(card_name, None)
+        if location_card is not None:
+            location, card = location_card
+            state[location][card_name] = card
+    state.update(entry['state'])
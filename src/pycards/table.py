@@ -1,16 +1,27 @@
+import threading
+from functools import partial
 from pathlib import Path
 
 
 from pycards.game import Game, GameError, Card
 from pycards.interfaces import GUI, BaseTable
 from pycards.interfaces import IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME
+from pycards.events import Event, GAME_CHANGED, CARD_TURNED, CARD_EDITED
+from pycards.events import PILE_CHANGED
 
 
 class Table(BaseTable):
 
+    _TOP_CARD = 'top_card'
+
     def __init__(self, gui: GUI):
         self._gui = gui
         self._game = Game()
+        # what was last pushed to the gui, to only push what changed
+        self._shown: dict = dict()
+        self._pending_events: list[Event] = list()
+        self._update_scheduled = False
+        self._game.events.subscribe(self._on_game_events)
 
     def get_saved_games(self) -> [str]:
         """get a list of saved games on disk
@@ -30,14 +41,7 @@ class Table(BaseTable):
         self._gui.clean_table()
         name = self._game.name
         self._gui.update_title(name)
-        box_cards_names = self._game.box_card_names
-        self._gui.update_box_cards_list(box_cards_names)
-        draw_pile = self._game.draw_pile_cards
-        top_card = self._game.get_draw_pile_top_card()
-        self._gui.update_draw_pile(draw_pile, top_card)
-        discarded = self._game.discarded_cards
-        discarded = list(discarded)
-        self._gui.update_discarded_pile(discarded)
+        self._refresh_piles()
         in_play_cards = self._game.in_play_cards
         for card_name, card in in_play_cards.items():
             card: Card
@@ -46,6 +50,8 @@ class Table(BaseTable):
                     img_path=card.path,
                     pile=IN_PLAY_PILE_NAME,
                     rotated=card.rotate,
+                    overlay=card.overlay,
+                    size=card.size,
                     )
         permanent_cards = self._game.permanent_cards
         for card_name, card in permanent_cards.items():
@@ -55,40 +61,171 @@ class Table(BaseTable):
                     img_path=card.path,
                     pile=PERMANENT_PILE_NAME,
                     rotated=card.rotate,
+                    overlay=card.overlay,
+                    size=card.size,
                     )
 
+    def _on_game_events(self, events: list[Event]):
+        """collect the events of the game. the gui is updated once for all
+        the events received before it is idle
+
+        """
+        self._pending_events.extend(events)
+        if not self._update_scheduled:
+            self._update_scheduled = True
+            self._gui.schedule(self._apply_game_events)
+
+    def _get_table_pile(self, card_name: str) -> str | None:
+        """pile of a card if it must be shown on the table, else None"""
+        if self._game.is_card_in_deck(card_name):
+            pile = self._game.get_card_pile(card_name)
+            if pile in (IN_PLAY_PILE_NAME, PERMANENT_PILE_NAME):
+                return pile
+        return None
+
+    def _apply_game_events(self):
+        """update the cards on the table and the piles after the events
+        collected since the last update
+
+        """
+        events = self._pending_events
+        self._pending_events = list()
+        self._update_scheduled = False
+        if any(event.kind == GAME_CHANGED for event in events):
+            self._update_gui_to_game()
+            return
+        # only the last state of each card is shown
+        turned_cards: dict[str, bool] = dict()
+        for event in events:
+            if event.kind == PILE_CHANGED:
+                # one after the other, the positions follow each change
+                self._gui.apply_pile_delta(
+                        event.pile, event.removed, event.added)
+            elif event.card_name is not None:
+                turned = event.kind in (CARD_TURNED, CARD_EDITED)
+                turned_cards[event.card_name] = (
+                        turned_cards.get(event.card_name, False) or turned)
+        removed = list()
+        for card_name, turned in turned_cards.items():
+            pile = self._get_table_pile(card_name)
+            current_pile = self._gui.is_card_on_table(card_name)
+            if pile is None:
+                if current_pile:
+                    removed.append(card_name)
+                continue
+            card = self._game.get_card(card_name)
+            if current_pile != pile:
+                self._gui.place_card_on_table(
+                        card.name,
+                        card.path,
+                        pile,
+                        rotated=card.rotate,
+                        overlay=card.overlay,
+                        size=card.size,
+                        )
+            elif turned:
+                self._gui.update_card_image(
+                        card_name,
+                        card.path,
+                        card.rotate,
+                        card.overlay,
+                        )
+        if removed:
+            self._gui.remove_cards(removed)
+        self._refresh_top_card()
+
+    def _has_changed(self, key: str, value) -> bool:
+        """compare a value with the one last shown in the gui and remember
+        it
+
+        :key: what is shown (the top card)
+        :value: state of the game
+        :returns: True if the gui must be updated
+
+        """
+        if key in self._shown and self._shown[key] == value:
+            return False
+        self._shown[key] = value
+        return True
+
+    def _refresh_piles(self):
+        """push the whole box list, draw pile, top card and discard pile to
+        the gui. after that, the lists are changed by the PILE_CHANGED
+        events
+
+        """
+        game = self._game
+        self._gui.update_box_cards_list(game.box_card_names)
+        self._gui.update_draw_pile(game.draw_pile_cards)
+        self._gui.update_discarded_pile(game.discarded_card_names)
+        self._shown = dict()
+        self._refresh_top_card()
+
+    def _refresh_top_card(self):
+        """update the card on top of the draw pile in the gui, if it changed
+        since the last update
+
+        """
+        top_card = self._game.get_draw_pile_top_card()
+        if top_card is None:
+            top = None
+        else:
+            top = (
+                    top_card.name,
+                    top_card.path,
+                    top_card.rotate,
+                    top_card.overlay,
+                    )
+        if self._has_changed(self._TOP_CARD, top):
+            self._gui.update_top_card(top_card)
+
+    def close(self):
+        self._game.close()
+
     def delete_game(self):
         try:
             self._game.delete_game()
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            self._update_gui_to_game()
 
     def new_game(self, name: str):
         try:
             self._game.new(name)
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            self._update_gui_to_game()
 
     def load_game(self, name: str):
         try:
             self._game.load(name)
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            self._update_gui_to_game()
 
     def import_cards(self, folder_path: Path):
+        """the img files are copied in a worker thread, so that the gui stays
+        responsive. the progress and the end of the import are scheduled in
+        the gui thread, where the cards are added to the game"""
+        def report(done: int, total: int):
+            self._gui.schedule(partial(self._gui.show_progress, done, total))
+
+        def run():
+            try:
+                imports = self._game.copy_cards_folder(folder_path, report)
+            except GameError as e:
+                self._gui.schedule(partial(self._import_failed, e))
+            else:
+                self._gui.schedule(partial(self._add_copied_cards, imports))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _add_copied_cards(self, imports: list[tuple]):
         try:
-            self._game.import_cards_folder(folder_path)
+            self._game.add_copied_cards(imports)
         except GameError as e:
-            self._gui.showerror(e)
-        else:
-            box_cards_names = self._game.box_card_names
-            self._gui.update_box_cards_list(box_cards_names)
+            self._import_failed(e)
+
+    def _import_failed(self, error: GameError):
+        self._gui.show_progress(0, 0)
+        self._gui.showerror(error)
 
     def import_stickers(self, folder_path: Path):
         try:
@@ -97,7 +234,7 @@ class Table(BaseTable):
             self._gui.showerror(e)
 
     def discover_or_forget(self, card_name):
-        if card_name in self._game.box_card_names:
+        if self._game.is_card_in_box(card_name):
             self.discover_card(card_name)
         else:
             self.forget_card(card_name)
@@ -108,14 +245,9 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            box_cards_names = self._game.box_card_names
-            self._gui.update_box_cards_list(box_cards_names)
-            discarded = self._game.discarded_cards
-            discarded = list(discarded)
-            self._gui.update_discarded_pile(discarded)
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             card = self._game.get_card(card_name)
             self._gui.inspect_card(
                     card_name,
@@ -124,6 +256,7 @@ class Table(BaseTable):
                     not_marked,
                     not_permanent,
                     card.rotate,
+                    card.overlay,
                     )
 
     def prompt_editor(self, card_name: str):
@@ -133,6 +266,7 @@ class Table(BaseTable):
                     card_name,
                     card.path,
                     card.rotate,
+                    card.overlay,
                     )
 
     def get_stickers(self):
@@ -150,16 +284,6 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            box_cards_names = self._game.box_card_names
-            self._gui.update_box_cards_list(box_cards_names)
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            if self._gui.is_card_on_table(card_name):
-                self._gui.remove_card(card_name)
             self._gui.clean_inspect_area()
 
     def rotate_card(self, card_name):
@@ -169,15 +293,9 @@ class Table(BaseTable):
             self._gui.showerror(e)
         else:
             card = self._game.get_card(card_name)
-            if self._gui.is_card_on_table(card_name):
-                self._gui.update_card_image(
-                        card_name,
-                        card.path,
-                        card.rotate,
-                        )
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             self._gui.inspect_card(
                     card_name,
                     card.path,
@@ -185,6 +303,7 @@ class Table(BaseTable):
                     not_marked,
                     not_permanent,
                     card.rotate,
+                    card.overlay,
                     )
 
     def flip(self, card_name):
@@ -194,22 +313,17 @@ class Table(BaseTable):
             self._gui.showerror(e)
         else:
             card = self._game.get_card(card_name)
-            if self._gui.is_card_on_table(card_name):
-                self._gui.update_card_image(
-                        card_name,
-                        card.path,
-                        card.rotate,
-                        )
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             self._gui.inspect_card(
                     card_name,
                     card.path,
                     in_box,
                     not_marked,
                     not_permanent,
-                    card.rotate)
+                    card.rotate,
+                    card.overlay)
 
     def forget_card(self, card_name: str):
         try:
@@ -217,20 +331,10 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            box_cards_names = self._game.box_card_names
-            self._gui.update_box_cards_list(box_cards_names)
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            if self._gui.is_card_on_table(card_name):
-                self._gui.remove_card(card_name)
             self._gui.clean_inspect_area()
 
     def lock_unlock(self, card_name):
-        if card_name in self._game.permanent_cards:
+        if self._game.is_card_permanent(card_name):
             self.unlock_card(card_name)
         else:
             self.lock_card(card_name)
@@ -241,22 +345,10 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
             card = self._game.get_card(card_name)
-            self._gui.place_card_on_table(
-                    card.name,
-                    card.path,
-                    PERMANENT_PILE_NAME,
-                    rotated=card.rotate,
-                    )
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             self._gui.inspect_card(
                     card_name,
                     card.path,
@@ -264,6 +356,7 @@ class Table(BaseTable):
                     not_marked,
                     not_permanent,
                     card.rotate,
+                    card.overlay,
                     )
 
     def unlock_card(self, card_name: str):
@@ -272,14 +365,10 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            self._gui.remove_card(card_name)
             card = self._game.get_card(card_name)
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             self._gui.inspect_card(
                     card_name,
                     card.path,
@@ -287,8 +376,32 @@ class Table(BaseTable):
                     not_marked,
                     not_permanent,
                     card.rotate,
+                    card.overlay,
                     )
 
+    def edit_card(
+            self,
+            card_name: str,
+            ops: list[dict],
+            sticker_names: list[str],
+            ):
+        try:
+            self._game.edit_card(card_name, ops)
+        except GameError as e:
+            self._gui.showerror(e)
+        else:
+            for sticker_name in sticker_names:
+                self.delete_stickers(sticker_name)
+            self.inspect_card(card_name)
+
+    def undo_card_edit(self, card_name: str):
+        try:
+            self._game.undo_card_edit(card_name)
+        except GameError as e:
+            self._gui.showerror(e)
+        else:
+            self.inspect_card(card_name)
+
     def inspect_card(self, card_name: str):
         if card_name:
             try:
@@ -296,16 +409,17 @@ class Table(BaseTable):
             except GameError as e:
                 self._gui.showerror(e)
             else:
-                in_box = card_name in self._game.box_card_names
+                in_box = self._game.is_card_in_box(card_name)
                 not_marked = not self._game.is_card_marked(card_name)
-                not_permanent = card_name not in self._game.permanent_cards
+                not_permanent = not self._game.is_card_permanent(card_name)
                 self._gui.inspect_card(
                         card_name,
                         card.path,
                         in_box,
                         not_marked,
                         not_permanent,
-                        card.rotate)
+                        card.rotate,
+                        card.overlay)
 
     def inspect_obfuscated_card(self, obfuscated_name: str):
         if obfuscated_name:
@@ -321,35 +435,12 @@ class Table(BaseTable):
             self._game.play_card(card_name)
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            card = self._game.get_card(card_name)
-            self._gui.place_card_on_table(
-                    card.name,
-                    card.path,
-                    IN_PLAY_PILE_NAME,
-                    rotated=card.rotate,
-                    )
 
     def discard(self, card_name: str):
         try:
             self._game.discard(card_name)
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            if self._gui.is_card_on_table(card_name):
-                self._gui.remove_card(card_name)
 
     def mark_or_unmark(self, card_name):
         try:
@@ -368,12 +459,9 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             card = self._game.get_card(card_name)
             self._gui.inspect_card(
                     card_name,
@@ -382,6 +470,7 @@ class Table(BaseTable):
                     not_marked,
                     not_permanent,
                     card.rotate,
+                    card.overlay,
                     )
 
     def unmark_card(self, card_name: str):
@@ -390,12 +479,9 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            in_box = card_name in self._game.box_card_names
+            in_box = self._game.is_card_in_box(card_name)
             not_marked = not self._game.is_card_marked(card_name)
-            not_permanent = card_name not in self._game.permanent_cards
+            not_permanent = not self._game.is_card_permanent(card_name)
             card = self._game.get_card(card_name)
             self._gui.inspect_card(
                     card_name,
@@ -404,6 +490,7 @@ class Table(BaseTable):
                     not_marked,
                     not_permanent,
                     card.rotate,
+                    card.overlay,
                     )
 
     def put_card_in_draw_pile(self, card_name: str, top: bool):
@@ -411,43 +498,18 @@ class Table(BaseTable):
             self._game.put_card_in_draw_pile(card_name, top=top)
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            if self._gui.is_card_on_table(card_name):
-                self._gui.remove_card(card_name)
 
     def discard_all(self):
-        for card_name in self._game.in_play_cards:
-            self._game.discard(card_name)
-            self._gui.remove_card(card_name)
-        discard_pile = self._game.discarded_cards
-        discard_pile = list(discard_pile)
-        self._gui.update_discarded_pile(discard_pile)
+        try:
+            self._game.discard_all_cards_in_play()
+        except GameError as e:
+            self._gui.showerror(e)
 
     def draw_card(self):
         try:
-            card_name = self._game.play_first_card()
+            self._game.play_first_card()
         except GameError as e:
             self._gui.showerror(e)
-        else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
-            card = self._game.get_card(card_name)
-            self._gui.place_card_on_table(
-                    card.name,
-                    card.path,
-                    IN_PLAY_PILE_NAME,
-                    rotated=card.rotate,
-                    )
 
     def shuffle_back(self):
         try:
@@ -455,12 +517,6 @@ class Table(BaseTable):
         except GameError as e:
             self._gui.showerror(e)
         else:
-            draw_pile = self._game.draw_pile_cards
-            top_card = self._game.get_draw_pile_top_card()
-            self._gui.update_draw_pile(draw_pile, top_card)
-            discard_pile = self._game.discarded_cards
-            discard_pile = list(discard_pile)
-            self._gui.update_discarded_pile(discard_pile)
             self._gui.clean_inspect_area()
 
 
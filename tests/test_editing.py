@@ -0,0 +1,50 @@
+"""
+test edition of card images
+"""
+
+import json
+import unittest
+from pathlib import Path
+
+
+from PIL import Image
+
+
+from pycards.editing import line_op, sticker_op, draw_ops
+
+
+TEST_FOLDER_PATH = Path(__file__).parent / 'cards'
+STICKER_FP = TEST_FOLDER_PATH / 'sticker_test.jpg'
+
+
+class TestEditing(unittest.TestCase):
+
+    def test_draw_ops(self):
+        img = Image.new('RGB', (100, 100), 'white')
+        ops = [
+                line_op([0, 50, 99, 50], width=3),
+                sticker_op(STICKER_FP, [10, 10, 30, 20]),
+                ]
+        self.assertEqual(json.loads(json.dumps(ops)), ops)
+        edited = draw_ops(img, ops)
+        self.assertEqual(edited.size, (100, 100))
+        self.assertEqual(edited.getpixel((80, 50)), (0, 0, 0))
+        self.assertEqual(edited.getpixel((80, 80)), (255, 255, 255))
+        with Image.open(STICKER_FP) as sticker:
+            expected = sticker.convert('RGB').resize((20, 10))
+        self.assertEqual(edited.getpixel((10, 10)), expected.getpixel((0, 0)))
+        self.assertEqual(img.getpixel((80, 50)), (255, 255, 255))
+        with self.assertRaises(ValueError):
+            draw_ops(img, [dict(type='unknown')])
+
+    def test_scale(self):
+        """operations are drawn at the size of a thumbnail"""
+        img = Image.new('RGB', (50, 50), 'white')
+        ops = [line_op([0, 50, 100, 50], width=4)]
+        edited = draw_ops(img, ops, scale=0.5)
+        self.assertEqual(edited.getpixel((40, 25)), (0, 0, 0))
+        self.assertEqual(edited.getpixel((40, 22)), (255, 255, 255))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,29 @@
 test game models
 """
 
+import json
 import unittest
+from unittest import mock
 from pathlib import Path
 
 
+from PIL import Image
+
+
+import pycards.game
 from pycards.game import Game, GameError, Card
-from pycards.game import BOX_FOLDER, DECK_FOLDER
+from pycards.game import BOX_FOLDER, DECK_FOLDER, CARDS_FOLDER
+from pycards.piles import DrawPile
+from pycards.search import PrefixIndex
+from pycards.events import Event, CARD_MOVED, CARD_TURNED, PILE_SHUFFLED
+from pycards.events import PILE_CHANGED
+from pycards.events import CARD_EDITED
+from pycards.editing import line_op, sticker_op
 from pycards.config import DATA_FOLDER
+from pycards.assets import ASSETS_FOLDER
+from pycards.images import THUMBNAIL_SIZES, get_thumbnail_path
+from pycards.storage import JournalStorage, JOURNAL_FILE, SQLITE_FILE
+from pycards.storage import SqliteStorage, get_varbox_path
 
 
 TESTNAME = 'test_game'
@@ -68,7 +84,7 @@ class TestGame(unittest.TestCase):
         game.import_card(**self._test_card)
         card_name = self._test_card['card_name']
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
+        folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
         suffix = Path(RECTO_CARD).suffix
         card_fn = f'{card_name}_recto{suffix}'
         path = folder / card_fn
@@ -80,6 +96,84 @@ class TestGame(unittest.TestCase):
 
         self.assertIn(card_name, game.box_card_names)
 
+    def test_shared_assets(self):
+        """img files and their thumbnails are stored once for all games and
+        freed with the last game using them
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        path = Path(game.get_card(card_name).path)
+        thumbnail_path = get_thumbnail_path(path, THUMBNAIL_SIZES[0])
+        asset_id = game._state['box'][card_name]['recto_asset']
+        other_game = Game(TESTNAME2)
+        try:
+            with mock.patch(
+                    'pycards.images.make_thumbnails') as make_thumbnails:
+                other_game.import_card(**self._test_card)
+            make_thumbnails.assert_not_called()
+            other_path = Path(other_game.get_card(card_name).path)
+            self.assertTrue(path.samefile(other_path))
+            self.assertEqual(path.stat().st_nlink, 3)
+            other_thumbnail_path = get_thumbnail_path(
+                    other_path, THUMBNAIL_SIZES[0])
+            self.assertTrue(thumbnail_path.samefile(other_thumbnail_path))
+        finally:
+            other_game.delete_game()
+        self.assertEqual(path.stat().st_nlink, 2)
+        game.destroy_card(card_name)
+        recto_bytes = (TEST_FOLDER_PATH / RECTO_CARD).read_bytes()
+        assets_folder = DATA_FOLDER / ASSETS_FOLDER
+        for fp in assets_folder.rglob('*'):
+            if fp.is_file():
+                self.assertNotEqual(fp.read_bytes(), recto_bytes)
+                self.assertFalse(fp.name.startswith(Path(asset_id).stem))
+
+    def test_thumbnails(self):
+        """thumbnails are made at import, rebuilt by build_thumbnails and
+        removed with the card
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        path = Path(game.get_card(card_name).path)
+        thumbnail_paths = [
+                get_thumbnail_path(path, size) for size in THUMBNAIL_SIZES]
+        for thumbnail_path in thumbnail_paths:
+            self.assertTrue(thumbnail_path.exists())
+        self.assertEqual(game.build_thumbnails(), 0)
+        thumbnail_paths[0].unlink()
+        progress = mock.Mock()
+        self.assertEqual(game.build_thumbnails(progress), 1)
+        progress.assert_called_once_with(1, 1)
+        self.assertTrue(thumbnail_paths[0].exists())
+        game.destroy_card(card_name)
+        for thumbnail_path in thumbnail_paths:
+            self.assertFalse(thumbnail_path.exists())
+
+    def test_card_size(self):
+        """the sizes of the img files are saved at import, or later by
+        build_thumbnails for older games
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        for side in ('recto', 'verso'):
+            path = self._test_card[f'{side}_path']
+            with Image.open(path) as img:
+                self.assertEqual(game.get_card(card_name).size, img.size)
+            game.flip_card(card_name)
+        game._state['box'][card_name]['recto_size'] = None
+        self.assertIsNone(game.get_card(card_name).size)
+        game.build_thumbnails()
+        same_game = Game(game.name)
+        self.assertEqual(
+                same_game.get_card(card_name).size,
+                game.get_card(card_name).size)
+
     def test_import_sticker(self):
         game = self._game
         sticker_name = 'sticker_test_name'
@@ -107,12 +201,88 @@ class TestGame(unittest.TestCase):
         game.import_cards_folder(folder)
         self.assertEqual(len(game.box_card_names), 1)
 
+    def test_import_folder_progress(self):
+        """progress is reported and nothing is copied on a name collision
+
+        """
+        game = self._game
+        folder = TEST_FOLDER_PATH
+        progress = mock.Mock()
+        game.import_cards_folder(folder, progress=progress)
+        progress.assert_called_once_with(1, 1)
+        card_name = game.box_card_names[0]
+        game.discover_card(card_name)
+
+        same_game = Game(game.name)
+        self.assertIn(card_name, same_game.deck_card_names)
+        files = set((DATA_FOLDER / TESTNAME / CARDS_FOLDER).iterdir())
+        with self.assertRaises(GameError):
+            game.import_cards_folder(folder)
+        self.assertEqual(
+                set((DATA_FOLDER / TESTNAME / CARDS_FOLDER).iterdir()), files)
+
+    def test_import_folder_error(self):
+        """the files already copied are removed on any error of the copy"""
+        game = self._game
+        folder = TEST_FOLDER_PATH
+        cards_folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
+        files = set(fp for fp in cards_folder.rglob('*') if fp.is_file())
+        import_files = pycards.game._import_files
+
+        def copy_then_fail(*args):
+            import_files(*args)
+            raise ValueError('not an OSError')
+
+        with mock.patch('pycards.game._import_files', copy_then_fail):
+            with self.assertRaises(GameError):
+                game.import_cards_folder(folder)
+        self.assertEqual(
+                set(fp for fp in cards_folder.rglob('*') if fp.is_file()),
+                files)
+        self.assertEqual(len(game.box_card_names), 0)
+
+    def test_import_folder_game_changed(self):
+        """the copied files are removed if another game is loaded before the
+        cards are added, and the cards can be imported again"""
+        game = self._game
+        folder = TEST_FOLDER_PATH
+        cards_folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
+        files = set(fp for fp in cards_folder.rglob('*') if fp.is_file())
+        imports = game.copy_cards_folder(folder)
+        game.new(TESTNAME2)
+        with self.assertRaises(GameError):
+            game.add_copied_cards(imports)
+        self.assertEqual(len(game.box_card_names), 0)
+        game.delete_game()
+        game.load(TESTNAME)
+        self.assertEqual(
+                set(fp for fp in cards_folder.rglob('*') if fp.is_file()),
+                files)
+        game.import_cards_folder(folder)
+        self.assertEqual(len(game.box_card_names), 1)
+
     def test_import_stickers_folder(self):
         game = self._game
         folder = TEST_FOLDER_PATH
         game.import_sticker_folders(folder)
         self.assertEqual(len(game.stickers), NIMAGES_IN_TEST_FOLDER)
 
+    def test_import_stickers_folder_refused(self):
+        """no file is copied when a sticker of the folder is refused, and
+        the folder can be imported once the other sticker is removed"""
+        game = self._game
+        folder = TEST_FOLDER_PATH
+        game.import_sticker(folder / VERSO_CARD)
+        box_folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
+        files = set(box_folder.iterdir())
+        with self.assertRaises(GameError):
+            game.import_sticker_folders(folder)
+        self.assertEqual(set(box_folder.iterdir()), files)
+        self.assertEqual(len(game.stickers), 1)
+        game.delete_sticker(Path(VERSO_CARD).stem)
+        game.import_sticker_folders(folder)
+        self.assertEqual(len(game.stickers), NIMAGES_IN_TEST_FOLDER)
+
     def test_getcard(self):
         """test get card
         :returns: TODO
@@ -124,7 +294,7 @@ class TestGame(unittest.TestCase):
         card = game.get_card(card_name)
         self.assertIsInstance(card, Card)
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
+        folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
         suffix = Path(RECTO_CARD).suffix
         card_fn = f'{card_name}_recto{suffix}'
         path = folder / card_fn
@@ -152,29 +322,15 @@ class TestGame(unittest.TestCase):
         game = self._game
         game.import_card(**self._test_card)
         card_name = self._test_card['card_name']
+        path = game.get_card(card_name).path
         game.discover_card(card_name)
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
-        suffix = Path(RECTO_CARD).suffix
-        card_fn = f'{card_name}_recto{suffix}'
-        path = folder / card_fn
-        self.assertFalse(path.exists())
-        suffix = Path(VERSO_CARD).suffix
-        card_fn = f'{card_name}_verso{suffix}'
-        path = folder / card_fn
-        self.assertFalse(path.exists())
         self.assertNotIn(card_name, game.box_card_names)
-
-        folder = DATA_FOLDER / TESTNAME / DECK_FOLDER
-        suffix = Path(RECTO_CARD).suffix
-        card_fn = f'{card_name}_recto{suffix}'
-        path = folder / card_fn
-        self.assertTrue(path.exists())
-        suffix = Path(VERSO_CARD).suffix
-        card_fn = f'{card_name}_verso{suffix}'
-        path = folder / card_fn
-        self.assertTrue(path.exists())
         self.assertIn(card_name, game.deck_card_names)
+        self.assertEqual(game.get_card(card_name).path, path)
+        self.assertTrue(Path(path).exists())
+        folder = DATA_FOLDER / TESTNAME / DECK_FOLDER
+        self.assertFalse(folder.exists())
 
     def test_permanent_cards(self):
         """test permanent property
@@ -273,30 +429,49 @@ class TestGame(unittest.TestCase):
         game = self._game
         game.import_card(**self._test_card)
         card_name = self._test_card['card_name']
+        path = game.get_card(card_name).path
         game.discover_card(card_name)
         game.forget_card(card_name)
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
-        suffix = Path(RECTO_CARD).suffix
-        card_fn = f'{card_name}_recto{suffix}'
-        path = folder / card_fn
-        self.assertTrue(path.exists())
-        suffix = Path(VERSO_CARD).suffix
-        card_fn = f'{card_name}_verso{suffix}'
-        path = folder / card_fn
-        self.assertTrue(path.exists())
         self.assertIn(card_name, game.box_card_names)
-
-        folder = DATA_FOLDER / TESTNAME / DECK_FOLDER
-        suffix = Path(RECTO_CARD).suffix
-        card_fn = f'{card_name}_recto{suffix}'
-        path = folder / card_fn
-        self.assertFalse(path.exists())
-        suffix = Path(VERSO_CARD).suffix
-        card_fn = f'{card_name}_verso{suffix}'
-        path = folder / card_fn
-        self.assertFalse(path.exists())
         self.assertNotIn(card_name, game.deck_card_names)
+        self.assertEqual(game.get_card(card_name).path, path)
+        self.assertTrue(Path(path).exists())
+
+    def test_migrate_layout(self):
+        """img files of an older save are moved in the cards folder
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        game.import_card(
+                self._test_card['recto_path'],
+                self._test_card['verso_path'],
+                'other_card')
+        game.discover_card(card_name)
+        game_folder = DATA_FOLDER / TESTNAME
+        old_folders = dict(box=game_folder / BOX_FOLDER,
+                           deck=game_folder / DECK_FOLDER)
+        old_folders['deck'].mkdir()
+        state = game._state
+        card_names = list()
+        for cards_name, folder in old_folders.items():
+            for other_name, card in state[cards_name].items():
+                card_names.append(other_name)
+                for key in ('recto_path', 'verso_path'):
+                    path = Path(card[key])
+                    card[key] = path.rename(folder / path.name).as_posix()
+        state['layout_version'] = 0
+        game._storage.save(state, card_names, ['layout_version'])
+
+        same_game = Game(game.name)
+        for other_name in (card_name, 'other_card'):
+            path = Path(same_game.get_card(other_name).path)
+            self.assertEqual(path.parent, game_folder / CARDS_FOLDER)
+            self.assertTrue(path.exists())
+        self.assertFalse(old_folders['deck'].exists())
+        self.assertEqual(list(old_folders['box'].iterdir()), [])
 
     def test_delete_sticker(self):
         game = self._game
@@ -320,7 +495,7 @@ class TestGame(unittest.TestCase):
         card_name = self._test_card['card_name']
         game.destroy_card(card_name)
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
+        folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
         suffix = Path(RECTO_CARD).suffix
         card_fn = f'{card_name}_recto{suffix}'
         path = folder / card_fn
@@ -342,7 +517,7 @@ class TestGame(unittest.TestCase):
         card = game.get_card(card_name)
         self.assertTrue(card.rotate)
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
+        folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
         suffix = Path(RECTO_CARD).suffix
         card_fn = f'{card_name}_recto{suffix}'
         path = folder / card_fn
@@ -359,7 +534,7 @@ class TestGame(unittest.TestCase):
         card = game.get_card(card_name)
         self.assertFalse(card.rotate)
 
-        folder = DATA_FOLDER / TESTNAME / BOX_FOLDER
+        folder = DATA_FOLDER / TESTNAME / CARDS_FOLDER
         suffix = Path(VERSO_CARD).suffix
         card_fn = f'{card_name}_verso{suffix}'
         path = folder / card_fn
@@ -400,6 +575,68 @@ class TestGame(unittest.TestCase):
         with self.assertRaises(GameError):
             same_game.get_card(card_name)
 
+    def test_journal_storage(self):
+        """a game saved in a journal is found again, also before the
+        snapshot is written
+
+        """
+        game = Game(TESTNAME2, storage_class=JournalStorage)
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        game.discover_card(card_name)
+        game.play_card(card_name)
+        game.rotate_card(card_name)
+        same_game = Game(TESTNAME2, storage_class=JournalStorage)
+        self.assertEqual(same_game.get_card_pile(card_name), 'in_play')
+        self.assertTrue(same_game.get_card(card_name).rotate)
+        game.discard(card_name)
+        game.close()
+        same_game = Game(TESTNAME2, storage_class=JournalStorage)
+        self.assertEqual(same_game.get_card_pile(card_name), 'discard')
+        same_game.put_card_in_draw_pile(card_name)
+        same_game.play_first_card()
+        journal_path = DATA_FOLDER / TESTNAME2 / JOURNAL_FILE
+        entry = json.loads(journal_path.read_text().splitlines()[-1])
+        self.assertEqual(entry['op'], 'play_card')
+        self.assertEqual(list(entry['cards']), [card_name])
+        _, card = entry['cards'][card_name]
+        self.assertEqual(card['pile'], 'in_play')
+        self.assertNotIn('draw_position', card)
+        same_game.delete_game()
+
+    def test_storage_kept(self):
+        """a game is loaded from the backend it was saved in
+
+        """
+        game = Game(TESTNAME2, storage_class=JournalStorage)
+        game.import_card(**self._test_card)
+        game.close()
+        same_game = Game(TESTNAME2)
+        self.assertEqual(len(same_game.box_card_names), 1)
+        self.assertFalse((DATA_FOLDER / TESTNAME2 / SQLITE_FILE).exists())
+        same_game.delete_game()
+
+    def test_migrate_storage(self):
+        """a game moved to another backend is loaded from it, its former
+        files are removed
+
+        """
+        game = Game(TESTNAME2)
+        game.import_card(**self._test_card)
+        varbox_path = get_varbox_path(TESTNAME2)
+        self.assertTrue(varbox_path.exists())
+        game.migrate_storage(SqliteStorage)
+        self.assertFalse(varbox_path.exists())
+        with self.assertRaises(GameError):
+            game.migrate_storage(SqliteStorage)
+        card_name = self._test_card['card_name']
+        game.discover_card(card_name)
+        game.close()
+        same_game = Game(TESTNAME2)
+        self.assertEqual(same_game.deck_card_names, (card_name,))
+        self.assertFalse(varbox_path.exists())
+        same_game.delete_game()
+
     def test_get_saved_games(self):
         """test get saved games
 
@@ -498,6 +735,464 @@ class TestGame(unittest.TestCase):
         real_card_name = game.get_real_card_name(obf)
         self.assertEqual(card_name, real_card_name)
 
+    def test_shuffle_all_bulk(self):
+        """shuffle back many cards with a single write
+
+        """
+        game = self._game
+        card_names = [f'card{i}' for i in range(20)]
+        with game.transaction():
+            for card_name in card_names:
+                game.import_card(
+                        self._test_card['recto_path'],
+                        self._test_card['verso_path'],
+                        card_name,
+                        )
+                game.discover_card(card_name)
+        game.put_card_in_draw_pile(card_names[0])
+        with mock.patch.object(game, '_write', wraps=game._write) as write:
+            moved = game.shuffle_back_all_discarded()
+            self.assertEqual(write.call_count, 1)
+        self.assertCountEqual(moved, card_names[1:])
+        self.assertEqual(game.discarded_card_names, ())
+        draw_pile = game.draw_pile_cards
+        self.assertEqual(len(draw_pile), len(card_names))
+        real_names = [game.get_real_card_name(obf) for obf in draw_pile]
+        self.assertCountEqual(real_names, card_names)
+        self.assertTrue(game.check_pile_index())
+
+    def test_transaction(self):
+        """several mutations in a transaction are written only once
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        game.discover_card(card_name)
+        with mock.patch.object(game, '_write', wraps=game._write) as write:
+            with game.transaction():
+                game.play_card(card_name)
+                game.rotate_card(card_name)
+                game.put_card_in_draw_pile(card_name)
+                game.flip_card(card_name)
+            self.assertEqual(write.call_count, 1)
+        same_game = Game(game.name)
+        self.assertEqual(same_game.get_card_pile(card_name), 'draw')
+        self.assertEqual(same_game.get_card(card_name).path,
+                         game.get_card(card_name).path)
+
+    def test_transaction_rollback(self):
+        """in-memory state is restored if a GameError is raised
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        game.discover_card(card_name)
+        with self.assertRaises(GameError):
+            with game.transaction():
+                game.put_card_in_draw_pile(card_name)
+                game.rotate_card(card_name)
+                game.lock_card(card_name)
+                game.lock_card(card_name)
+        self.assertEqual(game.get_card_pile(card_name), 'discard')
+        self.assertFalse(game.get_card(card_name).rotate)
+        self.assertEqual(len(game.draw_pile_cards), 0)
+
+    def test_rollback_keeps_order(self):
+        """a rollback restores the order of the discard pile and of the deck
+
+        """
+        game = self._game
+        for card_name in ('c', 'b', 'a'):
+            game.import_card(**dict(self._test_card, card_name=card_name))
+            game.discover_card(card_name)
+        game.import_card(**dict(self._test_card, card_name='box_card'))
+        game.lock_card('b')
+        game.unlock_card('b')
+        discarded = game.discarded_card_names
+        self.assertEqual(discarded, ('c', 'a', 'b'))
+        deck = game.deck_card_names
+
+        with self.assertRaises(GameError):
+            game.move_cards(['a', 'c', 'box_card'], 'in_play')
+        self.assertEqual(game.discarded_card_names, discarded)
+        with self.assertRaises(GameError):
+            game.undo_card_edit('a')
+        self.assertEqual(game.discarded_card_names, discarded)
+        with self.assertRaises(GameError):
+            with game.transaction():
+                game.forget_card('c')
+                game.discover_card('box_card')
+                game.undo_card_edit('a')
+        self.assertEqual(game.discarded_card_names, discarded)
+        self.assertEqual(game.deck_card_names, deck)
+        self.assertEqual(list(game._deck), ['c', 'b', 'a'])
+        self.assertTrue(game.check_pile_index())
+
+    def test_events(self):
+        """events are published once per transaction, not after a rollback
+
+        """
+        game = self._game
+        batches = list()
+        game.events.subscribe(batches.append)
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        self.assertEqual(batches.pop(), [
+            Event(CARD_MOVED, card_name, None, 'box'),
+            Event(PILE_CHANGED, pile='box', added=((0, card_name),)),
+            ])
+        with game.transaction():
+            game.discover_card(card_name)
+            game.play_card(card_name)
+            game.rotate_card(card_name)
+        self.assertEqual(batches.pop(), [
+            Event(CARD_MOVED, card_name, 'box', 'in_play'),
+            Event(CARD_TURNED, card_name, 'in_play', 'in_play'),
+            Event(PILE_CHANGED, pile='box', removed=(card_name,)),
+            ])
+        with self.assertRaises(GameError):
+            with game.transaction():
+                game.discard(card_name)
+                game.discard(card_name)
+        self.assertEqual(batches, [])
+        game.discard(card_name)
+        batches.clear()
+        game.shuffle_back_all_discarded()
+        self.assertEqual(batches.pop(), [
+            Event(CARD_MOVED, card_name, 'discard', 'draw'),
+            Event(PILE_CHANGED, pile='draw', added=((0, '0'),)),
+            Event(PILE_CHANGED, pile='discard', removed=(card_name,)),
+            Event(PILE_SHUFFLED, pile='draw'),
+            ])
+        game.events.unsubscribe(batches.append)
+
+    def test_pile_events(self):
+        """the PILE_CHANGED events keep a copy of the ordered piles up to
+        date
+
+        """
+        game = self._game
+        piles = dict(box=PrefixIndex(), draw=PrefixIndex(),
+                     discard=PrefixIndex())
+
+        def apply(events):
+            for event in events:
+                if event.kind == PILE_CHANGED:
+                    for name in event.removed:
+                        piles[event.pile].remove(name)
+                    for position, name in event.added:
+                        piles[event.pile].insert(position, name)
+
+        game.events.subscribe(apply)
+        card_names = [f'card{i}' for i in range(5)]
+        with game.transaction():
+            for card_name in reversed(card_names):
+                game.import_card(
+                        self._test_card['recto_path'],
+                        self._test_card['verso_path'],
+                        card_name,
+                        )
+        for card_name in card_names[::2] + card_names[1::2]:
+            game.discover_card(card_name)
+        game.forget_card(card_names[2])
+        game.put_card_in_draw_pile(card_names[0])
+        game.put_card_in_draw_pile(card_names[1], top=False)
+        game.move_cards(card_names[3:], 'draw')
+        game.put_card_in_draw_pile(card_names[0], top=False)
+        game.play_first_card()
+        game.set_always_visible(card_names[1])
+        game.discard(card_names[1])
+        game.put_card_in_draw_pile(card_names[1])
+        game.shuffle_back_all_discarded()
+        game.destroy_card(card_names[0])
+        game.events.unsubscribe(apply)
+        self.assertEqual(piles['box'][:], list(game.box_card_names))
+        self.assertEqual(
+                piles['draw'][:], list(reversed(game.draw_pile_cards)))
+        self.assertEqual(
+                piles['discard'][:], list(game.discarded_card_names))
+
+    def test_edit_card(self):
+        """edits are kept per side with a version, the img file is not
+        modified and the stickers are copied
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        card = game.get_card(card_name)
+        self.assertIsNone(card.overlay)
+        content = Path(card.path).read_bytes()
+        sticker_name = 'sticker_test_name'
+        game.import_sticker(STICKER_FP, sticker_name)
+        batches = list()
+        game.events.subscribe(batches.append)
+        game.edit_card(card_name, [
+            line_op((0, 0, 10, 10), 2),
+            sticker_op(game.stickers[sticker_name], (0, 0, 5, 5), False),
+            ])
+        self.assertEqual(batches.pop(), [
+            Event(CARD_EDITED, card_name, 'box', 'box')])
+        game.events.unsubscribe(batches.append)
+        game.delete_sticker(sticker_name)
+        card = game.get_card(card_name)
+        self.assertEqual(Path(card.path).read_bytes(), content)
+        self.assertEqual(card.overlay.version, 1)
+        line, sticker = card.overlay.ops
+        self.assertEqual(line['points'], [0, 0, 10, 10])
+        self.assertTrue(Path(sticker['path']).exists())
+        game.flip_card(card_name)
+        self.assertIsNone(game.get_card(card_name).overlay)
+        game.flip_card(card_name)
+        game.undo_card_edit(card_name)
+        card = game.get_card(card_name)
+        self.assertIsNone(card.overlay)
+        self.assertFalse(Path(sticker['path']).exists())
+        with self.assertRaises(GameError):
+            game.undo_card_edit(card_name)
+        with self.assertRaises(GameError):
+            game.edit_card(card_name, [dict(type='erase')])
+
+    def test_pile_index(self):
+        """the pile index follows the cards and can be checked
+
+        """
+        game = self._game
+        game.import_card(**self._test_card)
+        card_name = self._test_card['card_name']
+        game.discover_card(card_name)
+        self.assertEqual(game.discarded_card_names, (card_name,))
+        game.lock_card(card_name)
+        self.assertTrue(game.is_card_permanent(card_name))
+        self.assertEqual(game.discarded_card_names, ())
+        game.unlock_card(card_name)
+        game.put_card_in_draw_pile(card_name)
+        self.assertFalse(game.is_card_permanent(card_name))
+        self.assertTrue(game.check_pile_index())
+        game.forget_card(card_name)
+        self.assertTrue(game.check_pile_index())
+
+        game.discover_card(card_name)
+        game._piles['in_play'][card_name] = None
+        self.assertFalse(game.check_pile_index())
+        self.assertNotIn(card_name, game.in_play_cards)
+        self.assertTrue(game.check_pile_index())
+
+    def test_discard_order_saved(self):
+        """the discard pile keeps the order of the discards when the game is
+        loaded again
+
+        """
+        game = self._game
+        for card_name in ('a', 'b', 'c', 'd'):
+            game.import_card(**dict(self._test_card, card_name=card_name))
+            game.discover_card(card_name)
+            game.play_card(card_name)
+        for card_name in ('b', 'd', 'a', 'c'):
+            game.discard(card_name)
+        game.lock_card('d')
+        game.unlock_card('d')
+        self.assertEqual(game.discarded_card_names, ('b', 'a', 'c', 'd'))
+        game.close()
+        same_game = Game(TESTNAME)
+        self.assertEqual(
+                same_game.discarded_card_names, ('b', 'a', 'c', 'd'))
+        same_game.close()
+
+    def test_sorted_names(self):
+        """the sorted names follow the cards between box and deck
+
+        """
+        game = self._game
+        for card_name in ('b', 'c', 'a'):
+            game.import_card(
+                    self._test_card['recto_path'],
+                    self._test_card['verso_path'],
+                    card_name,
+                    )
+        self.assertSequenceEqual(game.box_card_names, ('a', 'b', 'c'))
+        game.discover_card('c')
+        game.discover_card('a')
+        self.assertSequenceEqual(game.box_card_names, ('b',))
+        self.assertSequenceEqual(game.deck_card_names, ('a', 'c'))
+        self.assertTrue(game.is_card_in_deck('a'))
+        self.assertFalse(game.is_card_in_box('a'))
+        game.forget_card('c')
+        game.destroy_card('a')
+        self.assertSequenceEqual(game.box_card_names, ('b', 'c'))
+        self.assertSequenceEqual(game.deck_card_names, ())
+
+    def test_draw_pile_position(self):
+        """top, bottom and position in the draw pile
+
+        """
+        game = self._game
+        for card_name in ('a', 'b', 'c'):
+            game.import_card(
+                    self._test_card['recto_path'],
+                    self._test_card['verso_path'],
+                    card_name,
+                    )
+            game.discover_card(card_name)
+        game.put_card_in_draw_pile('a')
+        game.put_card_in_draw_pile('b')
+        game.put_card_in_draw_pile('c', top=False)
+        self.assertEqual(game.get_draw_pile_position('b'), 0)
+        self.assertEqual(game.get_draw_pile_position('a'), 1)
+        self.assertEqual(game.get_draw_pile_position('c'), 2)
+        game.put_card_in_draw_pile('c')
+        self.assertEqual(len(game.draw_pile_cards), 3)
+        self.assertEqual(game.get_draw_pile_top_card().name, 'c')
+        self.assertEqual(game.play_first_card(), 'c')
+        with self.assertRaises(GameError):
+            game.get_draw_pile_position('c')
+
+        same_game = Game(game.name)
+        self.assertEqual(same_game.get_draw_pile_position('b'), 0)
+        self.assertEqual(same_game.get_draw_pile_position('a'), 1)
+
+    def test_draw_saves_one_card(self):
+        """the draw pile is saved in its cards: drawing a card only saves
+        that card, putting it back also saves the counter of obfuscated names
+
+        """
+        game = self._game
+        card_names = [f'card{i}' for i in range(4)]
+        with game.transaction():
+            for card_name in card_names:
+                game.import_card(
+                        self._test_card['recto_path'],
+                        self._test_card['verso_path'],
+                        card_name,
+                        )
+                game.discover_card(card_name)
+            game.move_cards(card_names, 'draw')
+        storage = game._storage
+        saves = list()
+
+        def save(state, card_names, keys, *args):
+            saves.append((set(card_names), set(keys)))
+            storage.save(state, card_names, keys, *args)
+
+        with mock.patch.object(game, '_storage') as mock_storage:
+            mock_storage.save.side_effect = save
+            self.assertEqual(game.play_first_card(), card_names[-1])
+            game.put_card_in_draw_pile(card_names[-1], top=False)
+        self.assertEqual(saves, [
+            ({card_names[-1]}, set()),
+            ({card_names[-1]}, {'draw_cards_next_id'}),
+            ])
+        same_game = Game(game.name)
+        self.assertEqual(same_game.draw_pile_cards, game.draw_pile_cards)
+        self.assertEqual(same_game.get_draw_pile_position(card_names[-1]), 3)
+
+    def test_migrate_draw_pile(self):
+        """a draw pile saved as lists by an older version is moved in its
+        cards
+
+        """
+        game = self._game
+        card_names = ['a', 'b', 'c']
+        with game.transaction():
+            for card_name in card_names:
+                game.import_card(
+                        self._test_card['recto_path'],
+                        self._test_card['verso_path'],
+                        card_name,
+                        )
+                game.discover_card(card_name)
+            game.move_cards(card_names, 'draw')
+        draw_pile = game.draw_pile_cards
+        state = game._state
+        for obfuscated in draw_pile:
+            card_name = game.get_real_card_name(obfuscated)
+            state['draw_cards_real_name'][obfuscated] = card_name
+            state['draw_cards_obfuscate_name'][card_name] = obfuscated
+            del state['deck'][card_name]['draw_position']
+            del state['deck'][card_name]['draw_name']
+        state['draw_pile'] = list(draw_pile)
+        game._storage.save(
+                state,
+                card_names,
+                ['draw_pile', 'draw_cards_real_name',
+                 'draw_cards_obfuscate_name'],
+                )
+
+        same_game = Game(game.name)
+        self.assertEqual(same_game.draw_pile_cards, draw_pile)
+        self.assertEqual(same_game.get_draw_pile_position('c'), 0)
+        self.assertEqual(same_game._state['draw_pile'], [])
+        other_game = Game(game.name)
+        self.assertEqual(other_game.draw_pile_cards, draw_pile)
+
+    def test_move_cards(self):
+        """move several cards at once, all or nothing
+
+        """
+        game = self._game
+        card_names = [f'card{i}' for i in range(5)]
+        with game.transaction():
+            for card_name in card_names:
+                game.import_card(
+                        self._test_card['recto_path'],
+                        self._test_card['verso_path'],
+                        card_name,
+                        )
+                game.discover_card(card_name)
+        moved = game.move_cards(card_names, 'in_play')
+        self.assertEqual(moved, tuple(card_names))
+        game.lock_card(card_names[0])
+        with self.assertRaises(GameError):
+            game.move_cards(card_names, 'draw')
+        self.assertEqual(len(game.in_play_cards), 4)
+        self.assertEqual(game.draw_pile_cards, ())
+
+        with mock.patch.object(game, '_write', wraps=game._write) as write:
+            discarded = game.discard_all_cards_in_play()
+            self.assertEqual(write.call_count, 1)
+        self.assertEqual(discarded, tuple(card_names[1:]))
+        self.assertEqual(game.discarded_card_names, tuple(card_names[1:]))
+        self.assertEqual(game.in_play_cards, dict())
+
+    def test_obfuscated_names(self):
+        """obfuscated names are unique, persistent and can be compacted
+
+        """
+        game = self._game
+        card_names = [f'card{i}' for i in range(6)]
+        with game.transaction():
+            for card_name in card_names:
+                game.import_card(
+                        self._test_card['recto_path'],
+                        self._test_card['verso_path'],
+                        card_name,
+                        )
+                game.discover_card(card_name)
+        for card_name in card_names:
+            game.put_card_in_draw_pile(card_name)
+        game.play_card(card_names[1])
+        game.play_card(card_names[3])
+        game.put_card_in_draw_pile(card_names[1])
+        draw_pile = game.draw_pile_cards
+        self.assertEqual(len(set(draw_pile)), len(draw_pile))
+        self.assertEqual(draw_pile[-1], '6')
+
+        same_game = Game(game.name)
+        same_game.put_card_in_draw_pile(card_names[3])
+        self.assertEqual(same_game.draw_pile_cards[-1], '7')
+
+        same_game.set_always_visible(card_names[0])
+        same_game.play_card(card_names[0])
+        same_game.put_card_in_draw_pile(card_names[0], top=False)
+        same_game.compact_obfuscated_names()
+        draw_pile = same_game.draw_pile_cards
+        self.assertEqual(draw_pile, (card_names[0], '0', '1', '2', '3', '4'))
+        real_names = [same_game.get_real_card_name(obf) for obf in draw_pile]
+        self.assertEqual(
+                real_names, [card_names[i] for i in (0, 2, 4, 5, 1, 3)])
+
 
 class TestCard(unittest.TestCase):
 
@@ -531,6 +1226,52 @@ class TestCard(unittest.TestCase):
         self.assertFalse(card.rotate)
 
 
+class TestDrawPile(unittest.TestCase):
+
+    """all test concerning DrawPile. """
+
+    def test_push_pop(self):
+        """test top and bottom operations"""
+        pile = DrawPile(['b', 'c'])
+        pile.push_top('d')
+        pile.push_bottom('a')
+        self.assertEqual(pile.to_list(), ['a', 'b', 'c', 'd'])
+        self.assertEqual(pile.top(), 'd')
+        self.assertEqual(pile.pop_top(), 'd')
+        pile.remove('b')
+        self.assertEqual(pile.to_list(), ['a', 'c'])
+        self.assertNotIn('b', pile)
+        pile.push_bottom('c')
+        self.assertEqual(pile.to_list(), ['c', 'a'])
+        self.assertEqual(pile.pop_top(), 'a')
+        self.assertEqual(pile.pop_top(), 'c')
+        self.assertIsNone(pile.top())
+        with self.assertRaises(IndexError):
+            pile.pop_top()
+
+    def test_index(self):
+        """test position after many operations (and regrowth)"""
+        pile = DrawPile()
+        expected = list()
+        for i in range(100):
+            name = str(i)
+            if i % 3:
+                pile.push_top(name)
+                expected.append(name)
+            else:
+                pile.push_bottom(name)
+                expected.insert(0, name)
+            if i % 7 == 0:
+                pile.remove(expected.pop(len(expected) // 2))
+        self.assertEqual(pile.to_list(), expected)
+        for position, name in enumerate(expected):
+            self.assertEqual(pile.index(name), position)
+        pile.shuffle()
+        self.assertCountEqual(pile.to_list(), expected)
+        for position, name in enumerate(pile):
+            self.assertEqual(pile.index(name), position)
+
+
 """ script tests """
 
 
@@ -0,0 +1,174 @@
+"""
+test image cache
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from pathlib import Path
+
+
+from PIL import Image
+
+
+from pycards.images import ThumbnailCache, THUMBNAIL_SIZES
+from pycards.images import make_thumbnails, find_thumbnail, has_thumbnails
+from pycards.images import ImageDecoder, get_fitted_size, load_image
+
+
+TEST_FOLDER_PATH = Path(__file__).parent / 'cards'
+RECTO_CARD = 'carreau.png'
+VERSO_CARD = 'pic.png'
+
+
+class TestThumbnailCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ThumbnailCache()
+        self.recto_path = TEST_FOLDER_PATH / RECTO_CARD
+        self.verso_path = TEST_FOLDER_PATH / VERSO_CARD
+
+    def test_get(self):
+        img = self.cache.get(self.recto_path, (50, 50))
+        self.assertLessEqual(img.width, 50)
+        self.assertLessEqual(img.height, 50)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertIs(self.cache.get(self.recto_path, (50, 50)), img)
+        self.assertEqual(self.cache.hits, 1)
+        self.cache.get(self.recto_path, (50, 50), rotated=True)
+        self.cache.get(self.recto_path)
+        self.assertEqual(self.cache.misses, 3)
+        self.assertEqual(len(self.cache), 3)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_modified_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder) / RECTO_CARD
+            shutil.copy(self.recto_path, path)
+            self.cache.get(path, (50, 50))
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.cache.get(path, (50, 50))
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_eviction(self):
+        img = self.cache.get(self.recto_path, (50, 50))
+        nbytes = img.width * img.height * len(img.getbands())
+        cache = ThumbnailCache(max_bytes=nbytes)
+        cache.get(self.recto_path, (50, 50))
+        cache.get(self.verso_path, (50, 50))
+        self.assertEqual(len(cache), 1)
+        cache.get(self.recto_path, (50, 50))
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 3)
+
+
+class TestLoadImage(unittest.TestCase):
+
+    def test_rotated(self):
+        """rotation does not resample the image"""
+        path = TEST_FOLDER_PATH / RECTO_CARD
+        img = load_image(path, rotated=True)
+        with Image.open(path) as expected:
+            expected = expected.transpose(Image.Transpose.ROTATE_180)
+            self.assertEqual(img.tobytes(), expected.tobytes())
+
+    def test_jpeg(self):
+        path = TEST_FOLDER_PATH / 'sticker_test.jpg'
+        with Image.open(path) as img:
+            width, height = img.size
+        maxsize = (width / 5, height / 3)
+        img = load_image(path, maxsize)
+        self.assertLessEqual(img.width, maxsize[0])
+        self.assertLessEqual(img.height, maxsize[1])
+        self.assertEqual(
+                max(img.size), max(get_fitted_size(path, maxsize)))
+
+
+class TestThumbnails(unittest.TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.path = Path(self._folder.name) / RECTO_CARD
+        shutil.copy(TEST_FOLDER_PATH / RECTO_CARD, self.path)
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def test_make(self):
+        self.assertFalse(has_thumbnails(self.path))
+        self.assertEqual(find_thumbnail(self.path, (50, 50)), self.path)
+        thumbnail_paths = make_thumbnails(self.path)
+        self.assertEqual(len(thumbnail_paths), len(THUMBNAIL_SIZES))
+        self.assertTrue(has_thumbnails(self.path))
+        thumbnail_path = find_thumbnail(self.path, (200, 100))
+        self.assertIn(thumbnail_path, thumbnail_paths)
+        with Image.open(thumbnail_path) as img:
+            self.assertEqual(max(img.size), 256)
+        self.assertEqual(find_thumbnail(self.path, (2000, 2000)), self.path)
+        img = ThumbnailCache().get(self.path, (200, 100))
+        self.assertLessEqual(img.width, 200)
+        self.assertLessEqual(img.height, 100)
+
+    def test_outdated(self):
+        make_thumbnails(self.path)
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertFalse(has_thumbnails(self.path))
+        self.assertEqual(find_thumbnail(self.path, (50, 50)), self.path)
+
+
+class TestImageDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ThumbnailCache()
+        self.decoder = ImageDecoder(self.cache)
+        self.recto_path = TEST_FOLDER_PATH / RECTO_CARD
+        self.verso_path = TEST_FOLDER_PATH / VERSO_CARD
+
+    def tearDown(self):
+        self.decoder.shutdown()
+
+    def _wait(self):
+        for _ in range(500):
+            self.decoder.poll()
+            if not self.decoder.pending:
+                return
+            time.sleep(0.01)
+        self.fail('images not decoded')
+
+    def test_request(self):
+        callback = mock.Mock()
+        img = self.decoder.request('a', callback, self.recto_path, (50, 50))
+        self.assertIsNone(img)
+        self._wait()
+        callback.assert_called_once()
+        img = callback.call_args.args[0]
+        self.assertEqual(img.size, get_fitted_size(self.recto_path, (50, 50)))
+        cached = self.decoder.request('a', callback, self.recto_path, (50, 50))
+        self.assertIs(cached, img)
+        self.assertEqual(callback.call_count, 1)
+
+    def test_last_request(self):
+        """only the last request of a target is delivered"""
+        old_callback = mock.Mock()
+        callback = mock.Mock()
+        cancelled_callback = mock.Mock()
+        self.decoder.request('a', old_callback, self.recto_path, (50, 50))
+        self.decoder.request('a', callback, self.verso_path, (50, 50))
+        self.decoder.request('b', cancelled_callback, self.verso_path)
+        self.decoder.cancel('b')
+        self._wait()
+        old_callback.assert_not_called()
+        cancelled_callback.assert_not_called()
+        callback.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
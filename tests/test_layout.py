@@ -0,0 +1,56 @@
+"""
+test table layout
+"""
+
+import unittest
+
+
+from pycards.layout import OccupancyGrid
+
+
+class TestOccupancyGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = OccupancyGrid(100, 150)
+
+    def test_find_free_space(self):
+        grid = self.grid
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (0, 0))
+        grid.add('a', 0, 0, 100, 150)
+        grid.add('b', 100, 0, 100, 150)
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (200, 0))
+        grid.add('c', 200, 0, 100, 150)
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (0, 150))
+        grid.remove('b')
+        self.assertEqual(len(grid), 2)
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (100, 0))
+        grid.clear()
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (0, 0))
+
+    def test_full(self):
+        grid = self.grid
+        grid.add('a', 0, 0, 200, 300)
+        self.assertEqual(grid.find_free_space(100, 150, 2, 2), (100, 150))
+
+    def test_move(self):
+        """a card dragged across several cells frees its first slot"""
+        grid = self.grid
+        grid.add('a', 0, 0, 100, 150)
+        grid.move('a', 250, 400)
+        self.assertIn('a', grid)
+        self.assertTrue(grid.is_free(0, 0, 240, 390))
+        self.assertFalse(grid.is_free(300, 500, 310, 510))
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (0, 0))
+
+    def test_tolerance(self):
+        """a slot slightly covered by a moved card is still free"""
+        grid = self.grid
+        grid.add('a', 0, 0, 100, 150)
+        grid.move('a', 3, 0)
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (100, 0))
+        grid.move('a', 10, 0)
+        self.assertEqual(grid.find_free_space(100, 150, 3, 2), (200, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+test search of card names
+"""
+
+import unittest
+
+
+from pycards.search import PrefixIndex
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def test_search(self):
+        index = PrefixIndex(['lot_b', 'Lot_a', 'other', 'lot', '12', '1'])
+        self.assertEqual(len(index), 6)
+        self.assertEqual(index[1], 'Lot_a')
+        self.assertEqual(index.search('lot'), ('lot_b', 'Lot_a', 'lot'))
+        self.assertEqual(index.search('LOT_'), ('lot_b', 'Lot_a'))
+        self.assertEqual(index.search('1'), ('12', '1'))
+        self.assertEqual(index.search('x'), ())
+        self.assertEqual(len(index.search('')), 6)
+
+    def test_insert_remove(self):
+        """the index follows the names inserted and removed"""
+        index = PrefixIndex(['b', 'd'])
+        index.insert(0, 'a')
+        index.insert(2, 'c')
+        index.insert(4, 'e')
+        self.assertEqual(index[:], ['a', 'b', 'c', 'd', 'e'])
+        index.remove('b')
+        index.remove('e')
+        self.assertEqual(index[:], ['a', 'c', 'd'])
+        index.insert(2, 'cc')
+        self.assertEqual(index.search('c'), ('c', 'cc'))
+        for i in range(100):
+            # keys are taken between the same neighbours until renumbered
+            index.insert(1, f'x{i}')
+        index.remove('x50')
+        self.assertEqual(index.search('x'), tuple(
+            f'x{i}' for i in range(99, -1, -1) if i != 50))
+        self.assertEqual(index[-3:], ['c', 'cc', 'd'])
+
+    def test_empty(self):
+        index = PrefixIndex()
+        self.assertEqual(index.search('a'), ())
+        self.assertEqual(index.search(''), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+test that importing pycards is light and has no side effect
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+HEAVY_MODULES = ('tkinter', 'PIL', 'filetype')
+
+
+class TestStartup(unittest.TestCase):
+
+    """all test concerning the import of pycards. """
+
+    def test_import(self):
+        """the model and the launchers load neither the gui nor Pillow, and
+        write nothing on disk"""
+        script = (
+                'import sys\n'
+                'import pycards.game, pycards.launchers\n'
+                f'print(*(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+                )
+        with tempfile.TemporaryDirectory() as folder:
+            env = dict(os.environ, XDG_DATA_HOME=folder)
+            result = subprocess.run(
+                    [sys.executable, '-c', script],
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    )
+            self.assertEqual(result.stdout.split(), [])
+            self.assertEqual(list(Path(folder).iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
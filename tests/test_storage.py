@@ -0,0 +1,269 @@
+"""
+test the storages of the game state
+"""
+
+import json
+import time
+import unittest
+import sqlite3
+import tempfile
+from unittest import mock
+from pathlib import Path
+
+
+from pycards.storage import SqliteStorage, VarBoxStorage, SQLITE_FILE
+from pycards.storage import get_default_state, STATE_KEYS
+from pycards.storage import JournalStorage, JOURNAL_FILE, SNAPSHOT_FILE
+from pycards.storage import Flusher, write_json_atomic
+from pycards.storage import EVERY_OP, INTERVAL, ON_EXIT
+from pycards.storage import read_storage_class, write_storage_class
+from pycards.storage import find_storage_class, STORAGE_FILE
+
+
+TESTNAME = 'test_storage'
+
+
+class TestFlusher(unittest.TestCase):
+
+    """all test concerning Flusher and the atomic writes. """
+
+    def test_every_op(self):
+        sync = mock.Mock()
+        flusher = Flusher(sync, EVERY_OP)
+        flusher.written()
+        flusher.written()
+        self.assertEqual(sync.call_count, 2)
+        flusher.close()
+        self.assertEqual(sync.call_count, 2)
+
+    def test_interval(self):
+        """several writes are synced once by the thread"""
+        sync = mock.Mock()
+        flusher = Flusher(sync, INTERVAL, interval_ms=10)
+        with flusher.lock:
+            flusher.written()
+            flusher.written()
+        sync.assert_not_called()
+        for _ in range(100):
+            if sync.called:
+                break
+            time.sleep(0.01)
+        sync.assert_called_once()
+        flusher.close()
+        sync.assert_called_once()
+
+    def test_on_exit(self):
+        sync = mock.Mock()
+        flusher = Flusher(sync, ON_EXIT)
+        flusher.written()
+        flusher.written()
+        sync.assert_not_called()
+        flusher.close()
+        sync.assert_called_once()
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            Flusher(mock.Mock(), 'never')
+
+    def test_write_json_atomic(self):
+        """a failed write leaves the previous file, and no temporary file"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder) / 'state.json'
+            write_json_atomic(path, dict(a=1))
+            with self.assertRaises(TypeError):
+                write_json_atomic(path, dict(a=object()), sync=False)
+            self.assertEqual(json.loads(path.read_text()), dict(a=1))
+            self.assertEqual(list(Path(folder).iterdir()), [path])
+
+
+class TestVarBoxStorage(unittest.TestCase):
+
+    """all test concerning VarBoxStorage. """
+
+    def test_save_load(self):
+        state = get_default_state()
+        state['box']['a'] = dict(orientation=0)
+        for durability in (EVERY_OP, INTERVAL, ON_EXIT):
+            storage = VarBoxStorage(TESTNAME, durability=durability)
+            storage.save(state)
+            storage.close()
+            storage = VarBoxStorage(TESTNAME)
+            self.assertTrue(storage.exists)
+            self.assertEqual(storage.load(), state)
+            self.assertEqual(storage._path, Path(storage._varbox.get_path()))
+            storage.delete()
+            self.assertFalse(VarBoxStorage(TESTNAME).exists)
+
+
+class TestSqliteStorage(unittest.TestCase):
+
+    """all test concerning SqliteStorage. """
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self._path = Path(self._folder.name)
+        self._state = get_default_state()
+        self._state['box']['a'] = dict(orientation=0)
+        self._state['deck']['b'] = dict(orientation=1, pile='draw')
+        self._state['draw_pile'] = ['0']
+        self._storage = SqliteStorage(TESTNAME, self._path)
+
+    def tearDown(self):
+        self._storage.close()
+        self._folder.cleanup()
+
+    def test_new(self):
+        self.assertFalse(self._storage.exists)
+        self.assertEqual(self._storage.load(), get_default_state())
+        self.assertTrue(SqliteStorage(TESTNAME, self._path).exists)
+        mode = self._storage._connection.execute(
+                'PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_save_load(self):
+        storage = self._storage
+        storage.save(self._state, ['a', 'b'], STATE_KEYS)
+        other = SqliteStorage(TESTNAME, self._path)
+        self.assertEqual(other.load(), self._state)
+        other.close()
+
+    def test_save_changes(self):
+        """only the given cards and keys are written"""
+        storage = self._storage
+        state = self._state
+        storage.save(state, ['a', 'b'], STATE_KEYS)
+        state['deck']['a'] = state['box'].pop('a')
+        state['deck']['a']['pile'] = 'in_play'
+        del state['deck']['b']
+        state['draw_pile'] = []
+        storage.save(state, ['a'], [])
+        loaded = storage.load()
+        self.assertEqual(loaded['box'], {})
+        self.assertEqual(loaded['deck']['a'], state['deck']['a'])
+        self.assertIn('b', loaded['deck'])
+        self.assertEqual(loaded['draw_pile'], ['0'])
+        storage.save(state, ['b'], ['draw_pile'])
+        self.assertEqual(storage.load(), state)
+        row = storage._connection.execute(
+                'SELECT location, pile FROM cards WHERE name = ?',
+                ('a',)).fetchone()
+        self.assertEqual(row, ('deck', 'in_play'))
+
+    def test_delete(self):
+        storage = self._storage
+        storage.save(self._state, ['a', 'b'], STATE_KEYS)
+        storage.delete()
+        self.assertEqual(list(self._path.iterdir()), [])
+        with self.assertRaises(sqlite3.ProgrammingError):
+            storage.load()
+        self._storage = SqliteStorage(TESTNAME, self._path)
+        self.assertFalse(self._storage.exists)
+
+
+class TestJournalStorage(unittest.TestCase):
+
+    """all test concerning JournalStorage. """
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self._path = Path(self._folder.name)
+        self._state = get_default_state()
+        self._state['box']['a'] = dict(orientation=0)
+        self._state['deck']['b'] = dict(orientation=1, pile='draw')
+        self._storage = JournalStorage(
+                TESTNAME, self._path, snapshot_interval=3)
+        self._storage.load()
+
+    def tearDown(self):
+        self._storage.close()
+        self._folder.cleanup()
+
+    def _reload(self) -> dict:
+        return JournalStorage(TESTNAME, self._path).load()
+
+    def test_replay(self):
+        """the journal is replayed over the snapshot"""
+        storage = self._storage
+        state = self._state
+        storage.save(state, ['a', 'b'], STATE_KEYS, 'import_card')
+        state['deck']['a'] = state['box'].pop('a')
+        state['deck']['a']['pile'] = 'in_play'
+        del state['deck']['b']
+        state['draw_pile'] = ['1', '0']
+        storage.save(state, ['a', 'b'], ['draw_pile'], 'play_card')
+        self.assertFalse((self._path / SNAPSHOT_FILE).exists())
+        lines = (self._path / JOURNAL_FILE).read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"op":"play_card"', lines[1])
+        self.assertEqual(self._reload(), state)
+
+    def test_snapshot(self):
+        """a snapshot is written every snapshot_interval saves and when the
+        storage is closed"""
+        storage = self._storage
+        state = self._state
+        for orientation in range(3):
+            state['box']['a']['orientation'] = orientation
+            storage.save(state, ['a'], [])
+        self.assertTrue((self._path / SNAPSHOT_FILE).exists())
+        self.assertEqual((self._path / JOURNAL_FILE).read_text(), '')
+        storage.save(state, ['b'], [])
+        storage.close()
+        self.assertEqual((self._path / JOURNAL_FILE).read_text(), '')
+        self.assertEqual(self._reload(), state)
+
+    def test_torn_entry(self):
+        """an entry not completely written is dropped"""
+        storage = self._storage
+        state = self._state
+        storage.save(state, ['a', 'b'], STATE_KEYS)
+        journal_path = self._path / JOURNAL_FILE
+        with open(journal_path, 'a') as journal:
+            journal.write('{"op":"discard","cards":{"b":')
+        self.assertEqual(self._reload(), state)
+        self.assertEqual(len(journal_path.read_text().splitlines()), 1)
+
+    def test_delete(self):
+        storage = self._storage
+        storage.save(self._state, ['a', 'b'], STATE_KEYS)
+        storage.write_snapshot()
+        storage.delete()
+        self.assertEqual(list(self._path.iterdir()), [])
+        self.assertFalse(JournalStorage(TESTNAME, self._path).exists)
+
+
+class TestStorageClass(unittest.TestCase):
+
+    """all test concerning the backend written in the folder of a game. """
+
+    def test_read_write(self):
+        with tempfile.TemporaryDirectory() as folder:
+            folder = Path(folder)
+            self.assertIsNone(read_storage_class(folder))
+            write_storage_class(folder, JournalStorage)
+            self.assertIs(read_storage_class(folder), JournalStorage)
+            (folder / STORAGE_FILE).write_text('{"storage": "other"}')
+            with self.assertRaises(ValueError):
+                read_storage_class(folder)
+
+    def test_find(self):
+        """the files of each backend are found, none is created"""
+        with tempfile.TemporaryDirectory() as folder:
+            folder = Path(folder)
+            self.assertIsNone(find_storage_class(TESTNAME, folder))
+            self.assertEqual(list(folder.iterdir()), [])
+            storage = JournalStorage(TESTNAME, folder)
+            storage.save(get_default_state(), [], STATE_KEYS)
+            storage.close()
+            self.assertIs(find_storage_class(TESTNAME, folder), JournalStorage)
+            self.assertFalse((folder / SQLITE_FILE).exists())
+            storage.delete()
+
+            storage = VarBoxStorage(TESTNAME)
+            storage.save(get_default_state())
+            self.assertIs(find_storage_class(TESTNAME, folder), VarBoxStorage)
+            storage.delete()
+
+
+if __name__ == '__main__':
+    unittest.main()
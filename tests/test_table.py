@@ -0,0 +1,147 @@
+"""
+test table, with a mock gui
+"""
+
+import queue
+import threading
+import unittest
+from unittest import mock
+from pathlib import Path
+
+
+from pycards.table import Table
+from pycards.interfaces import GUI
+
+
+TESTNAME = 'test_table'
+TEST_FOLDER_PATH = Path(__file__).parent / 'cards'
+RECTO_CARD = 'carreau.png'
+VERSO_CARD = 'pic.png'
+
+
+class TestTable(unittest.TestCase):
+
+    def setUp(self):
+        self._gui = mock.create_autospec(GUI, instance=True)
+        self._gui.is_card_on_table.return_value = False
+        self._gui.schedule.side_effect = lambda callback: callback()
+        self._table = Table(self._gui)
+        self._table.new_game(TESTNAME)
+        self._game = self._table._game
+        for card_name in ('card1', 'card2'):
+            self._game.import_card(
+                    TEST_FOLDER_PATH / RECTO_CARD,
+                    TEST_FOLDER_PATH / VERSO_CARD,
+                    card_name,
+                    )
+            self._game.discover_card(card_name)
+        self._table.load_game(TESTNAME)
+        self._gui.reset_mock()
+
+    def tearDown(self):
+        self._table.delete_game()
+
+    def test_refresh_changed_piles(self):
+        """only the rows that changed are pushed to the gui"""
+        gui = self._gui
+        self._table.put_card_in_draw_pile('card1', True)
+        obfuscated = self._game.draw_pile_cards[-1]
+        self.assertEqual(gui.apply_pile_delta.call_args_list, [
+            mock.call('draw', (), ((0, obfuscated),)),
+            mock.call('discard', ('card1',), ()),
+            ])
+        gui.update_top_card.assert_called_once()
+        gui.update_draw_pile.assert_not_called()
+        gui.update_discarded_pile.assert_not_called()
+        gui.update_box_cards_list.assert_not_called()
+        gui.reset_mock()
+
+        self._table.put_card_in_draw_pile('card2', False)
+        obfuscated = self._game.draw_pile_cards[0]
+        self.assertEqual(gui.apply_pile_delta.call_args_list, [
+            mock.call('draw', (), ((1, obfuscated),)),
+            mock.call('discard', ('card2',), ()),
+            ])
+        gui.update_top_card.assert_not_called()
+        gui.reset_mock()
+
+        self._table.inspect_card('card1')
+        self._table.mark_card('card2')
+        gui.update_top_card.assert_not_called()
+        gui.apply_pile_delta.assert_not_called()
+
+    def test_refresh_on_load(self):
+        """loading a game pushes everything again, the cards on the table are
+        placed with their saved size"""
+        self._table.play_card('card1')
+        self._gui.reset_mock()
+        self._table.load_game(TESTNAME)
+        gui = self._gui
+        gui.place_card_on_table.assert_called_once()
+        _, kwargs = gui.place_card_on_table.call_args
+        self.assertEqual(kwargs['size'], self._game.get_card('card1').size)
+        self.assertIsNotNone(kwargs['size'])
+        gui.update_box_cards_list.assert_called_once_with(())
+        gui.update_draw_pile.assert_called_once_with(())
+        gui.update_top_card.assert_called_once_with(None)
+        gui.update_discarded_pile.assert_called_once()
+
+    def test_coalesced_updates(self):
+        """the gui is updated once for all the events before it is idle"""
+        gui = self._gui
+        scheduled = list()
+        gui.schedule.side_effect = scheduled.append
+        self._table.play_card('card1')
+        self._table.play_card('card2')
+        self._table.rotate_card('card2')
+        self.assertEqual(len(scheduled), 1)
+        gui.place_card_on_table.assert_not_called()
+        scheduled.pop()()
+        self.assertEqual(gui.place_card_on_table.call_count, 2)
+        gui.update_card_image.assert_not_called()
+        self.assertEqual(gui.apply_pile_delta.call_args_list, [
+            mock.call('discard', ('card1',), ()),
+            mock.call('discard', ('card2',), ()),
+            ])
+
+        gui.is_card_on_table.side_effect = (
+                lambda card_name: 'in_play')
+        self._table.discard_all()
+        scheduled.pop()()
+        gui.remove_cards.assert_called_once_with(['card1', 'card2'])
+        gui.remove_card.assert_not_called()
+
+    def _run_scheduled(self, scheduled: queue.SimpleQueue, ncallbacks: int):
+        """call in this thread the callbacks scheduled by other threads"""
+        for _ in range(ncallbacks):
+            scheduled.get(timeout=10)()
+
+    def test_import_cards(self):
+        """the files are copied out of the gui thread, the cards are added
+        in the gui thread"""
+        gui = self._gui
+        scheduled = queue.SimpleQueue()
+        threads = list()
+
+        def schedule(callback):
+            threads.append(threading.current_thread())
+            scheduled.put(callback)
+
+        gui.schedule.side_effect = schedule
+        self._table.import_cards(TEST_FOLDER_PATH)
+        # progress, then the end of the import, then the refresh of the gui
+        self._run_scheduled(scheduled, 3)
+        self.assertNotIn(threading.current_thread(), threads[:2])
+        gui.show_progress.assert_called_once_with(1, 1)
+        self.assertEqual(len(self._game.box_card_names), 1)
+        gui.apply_pile_delta.assert_called_once()
+        gui.showerror.assert_not_called()
+
+        self._table.import_cards(TEST_FOLDER_PATH)
+        self._run_scheduled(scheduled, 1)
+        gui.showerror.assert_called_once()
+        self.assertEqual(len(self._game.box_card_names), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()